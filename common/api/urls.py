@@ -11,5 +11,6 @@ import common.api.views as v
 
 urlpatterns = [
     path('export/tables/', v.ExportableTablesView.as_view(), name='export-tables'),
+    path('jobs/<int:job_id>/', v.JobStatusView.as_view(), name='job-status'),
     path('import/', bdcf.BoggingRingsView.as_view(), name='bdcf-bog'),
 ]
@@ -2,6 +2,8 @@ from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
+from common.models import Job
+
 
 class ExportableTablesView(APIView):
     """
@@ -12,3 +14,32 @@ class ExportableTablesView(APIView):
         print("ExportableTablesView GET method called")
         # Logic to export tables
         return Response({"message": "Exportable tables"})
+
+
+class JobStatusView(APIView):
+    """
+    Status and progress of a queued job, polled by the client after an upload.
+    Users see their own jobs, staff see every job.
+    """
+
+    def get(self, request, job_id, *args, **kwargs):
+        jobs = Job.objects.all()
+        if not request.user.is_staff:
+            # Someone else's job is reported as missing, not forbidden
+            jobs = jobs.filter(owner=request.user)
+        try:
+            job = jobs.get(job_id=job_id)
+        except Job.DoesNotExist:
+            return Response({'msg': {'body': 'Job not found', 'type': 'error'}}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            'job_id': job.job_id,
+            'name': job.name,
+            'status': job.status,
+            'progress': job.progress,
+            'result': job.result,
+            'error': job.error,
+            'created_at': job.created_at,
+            'started_at': job.started_at,
+            'finished_at': job.finished_at,
+        }, status=status.HTTP_200_OK)
@@ -4,8 +4,7 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.settings import api_settings
 
-from django.contrib.auth import get_user_model
-from users.utils import get_or_create_remote_user
+from users.cache import remote_users
 
 import jwt, datetime
 from django.utils import timezone
@@ -14,6 +13,7 @@ class JWTAuthenticationFetchUser(JWTAuthentication):
     """
     Custom JWTAuthentication that, if a token's user_id is not found in RemoteUser,
     will fetch from the Auth server and create the local row.
+    Users are kept in the process's RemoteUserCache between requests.
     """
 
     def get_user(self, validated_token, raw_token):
@@ -28,20 +28,13 @@ class JWTAuthenticationFetchUser(JWTAuthentication):
             raise AuthenticationFailed(
                 'Token contained no user identification', 'invalid_token')
 
-        # get UserModel (should be RemoteUser)
-        UserModel = get_user_model()
-
-        # Try the standard lookup. If not found, fetch from Auth server:
-        try:
-            return UserModel.objects.get(pk=user_id)
-        except UserModel.DoesNotExist:
-            # Fetch‐and‐create logic:
-            remote_user = get_or_create_remote_user(user_id, raw_token)
-            if remote_user is None:
-                # If the Auth server did not return a valid user, fail:
-                raise AuthenticationFailed(
-                    'User not found on Auth server', 'user_not_found')
-            return remote_user
+        # Cached, else the local row, else fetched from the Auth server
+        remote_user = remote_users.get(user_id, raw_token)
+        if remote_user is None:
+            # If the Auth server did not return a valid user, fail:
+            raise AuthenticationFailed(
+                'User not found on Auth server', 'user_not_found')
+        return remote_user
 
     def authenticate(self, request):
         """
@@ -0,0 +1,248 @@
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from django.apps import apps
+from django.db import connection
+
+from common.functions.block_adjacency import BlockAdjacencyFunctions
+from common.functions.jobs import result_error
+from common.functions.shkey import Shkey
+from settings.models import ProjectSetting
+from users.models import RemoteUser
+
+import csv
+import io
+import os
+import prod_actual.models as pm
+import prod_concept.models as pcm
+import tempfile
+import time
+
+
+@contextmanager
+def throwaway_database(verbosity=0):
+    '''
+    Swaps the default connection to a new test database for the duration,
+    so benchmarks can fill and change it freely. Dropped on the way out.
+    '''
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+class QueryCounter():
+    # execute_wrapper counting every statement, however many there are
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class BenchmarkSuite():
+    '''
+    Times the heavy entry points on a SyntheticMine: the read only reports
+    first, then the uploads and runs that change the data. The upload
+    files are made from the mine itself, so every run does the same work.
+    Each case records seconds and database statements.
+    '''
+    CASES = ['level_status', 'fired_rings', 'remap_mine', 'concept_upload',
+             'dupe_upload', 'run_scenario']
+
+    CONCEPT_HEADERS = {
+        'id': 'Blastsolid', 'name': 'Name', 'level': 'Level', 'heading': 'Heading',
+        'drive': 'Drive', 'loc': 'Loc', 'x': 'X', 'y': 'Y', 'z': 'Z',
+        'tonnes': 'Tonnes', 'draw_zone': 'DrawZone', 'density': 'Density',
+        'au': 'Au', 'cu': 'Cu', 'successors': 'Successors', 'predecessors': 'Predecessors',
+    }
+    SCHEDULE_HEADERS = {'id': 'Blastsolid', 'name': 'Name', 'level': 'Level',
+                        'start': 'Start', 'finish': 'Finish'}
+    DUPE_STATUS = {'Designed': 'MarkUp', 'Bogging': 'Curr', 'Complete': 'Comp'}
+
+    def __init__(self, mine, workers=1):
+        self.mine = mine
+        # Scenario worker processes would connect to the configured
+        # database, not the throwaway one, so levels run in turn by default
+        self.workers = workers
+        self.user = None
+        self.results = {}
+
+    def setup(self):
+        self.user, _ = RemoteUser.objects.get_or_create(
+            id=1, defaults={'email': 'benchmark@localhost', 'first_name': 'Bench',
+                            'last_name': 'Mark', 'initials': 'BM'})
+        ProjectSetting.objects.update_or_create(
+            key='concept_csv_headers', defaults={'value': self.CONCEPT_HEADERS})
+        ProjectSetting.objects.update_or_create(
+            key='drill_scenario_file_headers', defaults={'value': self.SCHEDULE_HEADERS})
+
+    def run(self, cases=None):
+        self.setup()
+        for name in cases or self.CASES:
+            if name == 'run_scenario' and not apps.is_installed('whatif'):
+                self.results[name] = {'skipped': 'whatif is not in INSTALLED_APPS'}
+                continue
+            self.results[name] = self.time(getattr(self, f'case_{name}'))
+        return self.results
+
+    def time(self, case):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = case()
+        result = {'seconds': round(time.perf_counter() - started, 3), 'queries': counter.count}
+        error = self.get_error(response)
+        if error:
+            # Timings of a run that stopped early aren't comparable
+            result['error'] = error
+        return result
+
+    def get_error(self, response):
+        return result_error(response)
+
+    def case_level_status(self):
+        from report.api.views.level_status import LevelStatusReport
+
+        LevelStatusReport().list_active_rings()
+
+    def case_fired_rings(self):
+        # What FiredRings returns, for every level
+        from prod_actual.api.views.bdcf import BDCFRings
+
+        for level in self.mine.levels:
+            bdcf = BDCFRings()
+            args = {'create_from': 'Charged', 'level': level}
+            bdcf.add_orphan_status(bdcf.get_rings_of_status_on_level(args))
+            args['create_from'] = 'Bogging'
+            bdcf.get_fired_ring_detail(bdcf.get_rings_of_status_on_level(args))
+
+    def case_remap_mine(self):
+        BlockAdjacencyFunctions().remap_mine()
+
+    def case_concept_upload(self):
+        from prod_concept.api.views.upload_concept import ConceptRingsFileHandler
+
+        return ConceptRingsFileHandler().handle_flow_concept_file(self.user, self.concept_file())
+
+    def case_dupe_upload(self):
+        from prod_actual.api.views.upload_dupe import DupeFileHandler
+
+        return DupeFileHandler().handle_dupe_file(self.dupe_file(), date.today().isoformat())
+
+    def case_run_scenario(self):
+        from whatif.api.views.drilling_scenario import ScheduleFileHandler
+
+        sfh = ScheduleFileHandler(workers=self.workers)
+        handle, sfh.filename = tempfile.mkstemp(suffix='.csv')
+        os.close(handle)
+        try:
+            return sfh.handle_schedule_file(self.user, self.schedule_file(), 'benchmark')
+        finally:
+            os.remove(sfh.filename)
+
+    def concept_file(self):
+        '''
+        The mine's blocks with a tenth of the grades revised and a drive
+        on a new level below, to be created and remapped
+        '''
+        h = self.CONCEPT_HEADERS
+        rows = []
+        links = {}
+        for link in pcm.BlockLink.objects.filter(block__level__in=self.mine.levels).values_list(
+                'block__blastsolids_id', 'linked__blastsolids_id', 'direction'):
+            links.setdefault((link[0], link[2]), []).append(link[1])
+
+        blocks = pcm.FlowModelConceptRing.objects.filter(
+            level__in=self.mine.levels).order_by('location_id')
+        for i, block in enumerate(blocks):
+            au = block.modelled_au * 2 if i % 10 == 0 else block.modelled_au
+            successors = ';'.join(links.get((block.blastsolids_id, 'S'), []))
+            predecessors = ';'.join(links.get((block.blastsolids_id, 'P'), []))
+            rows.append({h['id']: block.blastsolids_id, h['name']: block.description,
+                         h['level']: block.level, h['heading']: block.heading,
+                         h['drive']: block.drive, h['loc']: block.loc,
+                         h['x']: block.x, h['y']: block.y, h['z']: block.z,
+                         h['tonnes']: block.pgca_modelled_tonnes, h['draw_zone']: block.draw_zone,
+                         h['density']: block.density, h['au']: au, h['cu']: block.modelled_cu,
+                         h['successors']: successors, h['predecessors']: predecessors})
+
+        # Kept off the mine's levels, the scenario has no mining direction for it
+        level = self.mine.levels[-1] + 25
+        d = 1
+        count = self.mine.rings_per_drive // self.mine.RINGS_PER_BLOCK
+        for n in range(count):
+            name = f'BS_{level}_OD{d}_'
+            rows.append({h['id']: f'{name}{n + 1}', h['name']: f'{level}_OD{d}',
+                         h['successors']: f'{name}{n + 2}' if n + 1 < count else '',
+                         h['predecessors']: f'{name}{n}' if n else '',
+                         h['level']: level, h['heading']: 'N', h['drive']: d, h['loc']: n + 1,
+                         h['x']: 1000 + (d - 1) * self.mine.DRIVE_SPACING,
+                         h['y']: 2000 + n * self.mine.RING_SPACING * self.mine.RINGS_PER_BLOCK,
+                         h['z']: level, h['tonnes']: 3000, h['draw_zone']: 1,
+                         h['density']: 2.75, h['au']: 1.2, h['cu']: 0.4})
+        return self.csv_file(list(h.values()), rows)
+
+    def dupe_file(self):
+        '''
+        The mine's rings as the dupe has them, with every tenth designed
+        ring drilled and every fifth drilled ring charged since
+        '''
+        today = date.today().isoformat()
+        rows = []
+        rings = pm.ProductionRing.objects.filter(
+            level__in=self.mine.levels).order_by('location_id')
+        for i, ring in enumerate(rings):
+            drilled, charged = ring.drill_complete_shift, ring.charge_shift
+            status = ring.status
+            if status == 'Designed' and i % 10 == 0:
+                status, drilled = 'Drilled', Shkey.generate_shkey(today)
+            elif status == 'Drilled' and i % 5 == 0:
+                status, charged = 'Charged', Shkey.generate_shkey(today)
+
+            rows.append({
+                'Inactive': 'False', 'Level': ring.level, 'Drive': ring.oredrive,
+                'Ring': ring.ring_number_txt, 'Number of Holes': 12,
+                'Metres Designed': ring.drill_meters, 'Draw Ratio': 1,
+                'Design Tonnes (100%)': ring.designed_tonnes,
+                'Drilling Complete Date': self.shkey_date(drilled),
+                'Date Charge Completed': self.shkey_date(charged), 'FireBy': '',
+                'Date Fired': self.shkey_date(ring.fired_shift),
+                'Shift Fired': ('Night' if ring.fired_shift[9] == '2' else 'Day') if ring.fired_shift else '',
+                'Status': self.DUPE_STATUS.get(status, status), 'IsMFGroup': '',
+                'Total Actual Tonnes': ring.bogged_tonnes,
+                'BogComplete': self.shkey_date(ring.bog_complete_shift),
+                'DesignCollarX': ring.x, 'DesignCollarY': ring.y, 'DesignCollarZ': ring.z,
+            })
+        return self.csv_file(list(rows[0].keys()) if rows else [], rows)
+
+    def schedule_file(self):
+        '''
+        Bogging of the blocks ahead of each drive's bogging front, one
+        block per drive every three days
+        '''
+        h = self.SCHEDULE_HEADERS
+        start = datetime.combine(date.today(), datetime.min.time())
+        rows = []
+        for (level, oredrive), blocks in self.mine.blocks.items():
+            bogging = pm.ProductionRing.objects.filter(
+                level=level, oredrive=oredrive, status='Bogging').order_by('location_id').first()
+            first = blocks.index(bogging.concept_ring) if bogging and bogging.concept_ring in blocks else 0
+            for n, block in enumerate(blocks[first:]):
+                day = start + timedelta(days=3 * n)
+                rows.append({h['id']: block.blastsolids_id, h['name']: block.description,
+                             h['level']: level, h['start']: day.strftime('%d/%m/%Y %H:%M'),
+                             h['finish']: (day + timedelta(days=3)).strftime('%d/%m/%Y %H:%M')})
+        return self.csv_file(list(h.values()), rows)
+
+    def shkey_date(self, shkey):
+        return f'{shkey[:4]}-{shkey[4:6]}-{shkey[6:8]}' if shkey else ''
+
+    def csv_file(self, headers, rows):
+        text = io.StringIO()
+        writer = csv.DictWriter(text, fieldnames=headers)
+        writer.writeheader()
+        writer.writerows(rows)
+        return io.BytesIO(text.getvalue().encode('utf-8'))
@@ -1,12 +1,17 @@
+from django.db import transaction
 from rest_framework import generics
 import prod_concept.models as m
 import prod_concept.api.serializers as s
 
+from common.functions.block_grid import BlockGrid
+from common.functions.constants import BULK_BATCH_SIZE
+
 import math
+import time
 
 
 class BlockAdjacencyFunctions():
-    def __init__(self) -> None:
+    def __init__(self, batch_size=BULK_BATCH_SIZE, graph=None) -> None:
         self.opposite_direction = {'N': 'S', 'NE': 'SW', 'E': 'W',
                                    'SE': 'NW', 'S': 'N', 'SW': 'NE', 'W': 'E', 'NW': 'SE'}
         self.dir_tolerance = {
@@ -20,25 +25,117 @@ class BlockAdjacencyFunctions():
             'NW': ['W', 'NW', 'N']
         }
         self.search_radius = 20
+        self.batch_size = batch_size
+        # Optional DriveGraph, the stepping methods use it for the blocks it holds
+        self.graph = graph
 
     def remap_mine(self):
         levels_list = m.FlowModelConceptRing.objects.filter(
             is_active=True).values_list('level', flat=True).distinct()
-        self.remap_levels(levels_list)
+        return self.remap_levels(levels_list)
 
     def remap_levels(self, levels_list):
         # prod_concept/.. upload_concept.py calls this method after upload
+        stats = []
         for level in levels_list:
             print("remapping", level)
-            self.remap_level(level)
+            level_stats = self.remap_level(level)
+            print(f"remapped {level}: {level_stats['blocks']} blocks, "
+                  f"{level_stats['links']} links in {level_stats['seconds']}s")
+            stats.append(level_stats)
+        return stats
 
     def remap_level(self, level):
-        self.remove_links_on_level(level)
-        blocks = m.FlowModelConceptRing.objects.filter(
-            is_active=True, level=level)
+        '''
+        Rebuilds the BlockAdjacency rows of a level in one transaction.
+        The links are worked out in memory and written with bulk_create.
+        Returns the block and link counts and how long it took.
+        '''
+        started = time.perf_counter()
+        blocks = list(m.FlowModelConceptRing.objects.filter(
+            is_active=True, level=level))
+
+        # Only compare each block against its grid neighbours
+        grid = BlockGrid(blocks, self.search_radius)
+        links = []
         for block in blocks:
-            adjacent_blocks = self.find_adjacent_blocks(block, blocks)
-            self.create_links(block, adjacent_blocks)
+            nearby = grid.near(block.x, block.y, self.search_radius)
+            adjacent_blocks = self.find_adjacent_blocks(block, nearby)
+            links.extend(self.build_links(block, adjacent_blocks))
+
+        with transaction.atomic():
+            self.remove_links_on_level(level)
+            m.BlockAdjacency.objects.bulk_create(
+                links, batch_size=self.batch_size)
+
+        return {
+            'level': level,
+            'blocks': len(blocks),
+            'links': len(links),
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+
+    def remap_blocks(self, changed_ids):
+        '''
+        Incremental remap_level. Only the blocks whose links can differ are
+        recomputed, every other BlockAdjacency row is left alone.
+        changed_ids: location ids of blocks added, moved, reactivated or deactivated
+
+        A block's links depend only on the blocks within search_radius of it,
+        so the affected blocks are the changed ones, the blocks with a link
+        to a changed block (its old position) and the blocks within
+        search_radius of a changed block's new position.
+        '''
+        started = time.perf_counter()
+        changed_ids = sorted(set(changed_ids))
+
+        changed = []
+        pointing = []
+        for i in range(0, len(changed_ids), self.batch_size):
+            chunk = changed_ids[i:i + self.batch_size]
+            changed.extend(
+                m.FlowModelConceptRing.objects.filter(location_id__in=chunk))
+            pointing.extend(m.BlockAdjacency.objects.filter(
+                adjacent_block_id__in=chunk).values_list('block_id', 'block__level'))
+
+        affected = set(changed_ids)
+        affected.update(block_id for block_id, _ in pointing)
+        levels = set(level for _, level in pointing)
+        levels.update(b.level for b in changed if b.is_active)
+
+        links = []
+        for level in sorted(levels):
+            blocks = list(m.FlowModelConceptRing.objects.filter(
+                is_active=True, level=level))
+            grid = BlockGrid(blocks, self.search_radius)
+
+            # Blocks that now have a changed block within reach
+            for b in changed:
+                if b.is_active and b.level == level:
+                    for near in grid.near(b.x, b.y, self.search_radius):
+                        if self.is_adjacent(b, near):
+                            affected.add(near.location_id)
+
+            for block in blocks:
+                if block.location_id in affected:
+                    nearby = grid.near(block.x, block.y, self.search_radius)
+                    adjacent_blocks = self.find_adjacent_blocks(block, nearby)
+                    links.extend(self.build_links(block, adjacent_blocks))
+
+        affected = sorted(affected)
+        with transaction.atomic():
+            for i in range(0, len(affected), self.batch_size):
+                m.BlockAdjacency.objects.filter(
+                    block_id__in=affected[i:i + self.batch_size]).delete()
+            m.BlockAdjacency.objects.bulk_create(
+                links, batch_size=self.batch_size)
+
+        return {
+            'changed': len(changed_ids),
+            'blocks': len(affected),
+            'links': len(links),
+            'seconds': round(time.perf_counter() - started, 3),
+        }
 
     def remove_links_on_level(self, level):
         # Step 1: Identify all blocks on the level to be remapped (e.g., level 3)
@@ -54,7 +151,8 @@ class BlockAdjacencyFunctions():
     def find_adjacent_blocks(self, block, blocks):
         '''
         block: This block
-        blocks: All the blocks on the level
+        blocks: Candidate blocks, either all the blocks on the level
+                or the ones a BlockGrid found near this block
         '''
         direction = {'N': {}, 'NE': {}, 'E': {}, 'SE': {},
                      'S': {}, 'SW': {}, 'W': {}, 'NW': {}}
@@ -125,14 +223,23 @@ class BlockAdjacencyFunctions():
         else:
             return None
 
-    def create_links(self, block, adjacent_blocks):
+    def build_links(self, block, adjacent_blocks):
+        '''
+        Returns unsaved BlockAdjacency rows for the output of find_adjacent_blocks
+        '''
+        links = []
         for bearing, data in adjacent_blocks.items():
             if data:  # Check if there's an adjacent block stored in this direction
-                m.BlockAdjacency.objects.create(
+                links.append(m.BlockAdjacency(
                     block=block,
                     adjacent_block=data['block'],
                     direction=bearing
-                )
+                ))
+        return links
+
+    def create_links(self, block, adjacent_blocks):
+        m.BlockAdjacency.objects.bulk_create(
+            self.build_links(block, adjacent_blocks), batch_size=self.batch_size)
 
     def get_opposite_direction(self, direction):
         return self.opposite_direction[direction]
@@ -145,6 +252,9 @@ class BlockAdjacencyFunctions():
         :param mining_direction: Mining direction (e.g., 'N', 'NE').
         :return: The block with the greatest distance in the opposite direction of mining.
         """
+        if self.graph and self.graph.has_drive(concept_desc):
+            return self.graph.find_first_block(concept_desc, mining_direction)
+
         blocks = m.FlowModelConceptRing.objects.filter(
             is_active=True, description=concept_desc)
 
@@ -169,6 +279,8 @@ class BlockAdjacencyFunctions():
         Takes a step in direction of successor
         Returns next block or None.
         '''
+        if self.graph and self.graph.has_block(this_block):
+            return self.graph.step_using_successor_method(this_block)
 
         this_block_desc = this_block.description
         successors = m.BlockLink.objects.filter(
@@ -186,6 +298,8 @@ class BlockAdjacencyFunctions():
         Will check general direction for blocks in the same drive
         Returns next block or None.
         '''
+        if self.graph and self.graph.has_block(this_block):
+            return self.graph.step_using_mining_direction(this_block, mining_direction)
 
         this_block_desc = this_block.description
         tolerated_directions = self.dir_tolerance.get(mining_direction, [])
@@ -227,6 +341,9 @@ class BlockAdjacencyFunctions():
 
 
     def step_dist_using_mining_direction(self, this_block, mining_direction, distance):
+        if self.graph and self.graph.has_block(this_block):
+            return self.graph.step_dist_using_mining_direction(this_block, mining_direction, distance)
+
         last_under_dist = None
         last_dist_under_dist = 0
         first_over_dist = None
@@ -265,6 +382,8 @@ class BlockAdjacencyFunctions():
         return reference_block
 
     def get_last_block_in_drive(self, drive_name, mining_direction):
+        if self.graph and self.graph.has_drive(drive_name):
+            return self.graph.get_last_block_in_drive(drive_name, mining_direction)
         queryset = m.FlowModelConceptRing.objects.filter(
             description=drive_name)
         last_block = self.get_last_block_in_set(queryset, mining_direction)
@@ -282,6 +401,8 @@ class BlockAdjacencyFunctions():
         Input: A concept block
         Output: A list of adjacent drives names to the given block
         '''
+        if self.graph and self.graph.has_block(block):
+            return self.graph.get_adjacent_drives(block)
         adjacent_blocks = m.BlockAdjacency.objects.filter(
             block=block).exclude(adjacent_block__description=block.description)
         distinct_descriptions = adjacent_blocks.values_list(
@@ -290,6 +411,8 @@ class BlockAdjacencyFunctions():
         return list(distinct_descriptions)
 
     def get_block_from_adj_named_od(self, this_block, that_drive):
+        if self.graph and self.graph.has_block(this_block):
+            return self.graph.get_block_from_adj_named_od(this_block, that_drive)
         # Filter BlockAdjacency to find the record where 'this_block' has an adjacent block with description 'that_drive'
         adjacency = m.BlockAdjacency.objects.filter(
             block=this_block,
@@ -0,0 +1,43 @@
+from collections import defaultdict
+
+import math
+
+
+class BlockGrid():
+    '''
+    Uniform grid over the x/y of a set of concept blocks.
+
+    Blocks are bucketed once into square cells, so a radius search only
+    looks at the handful of cells around a point instead of every block
+    on the level.
+    '''
+
+    def __init__(self, blocks, cell_size):
+        self.blocks = list(blocks)
+        self.cell_size = float(cell_size)
+        self.cells = defaultdict(list)
+
+        for index, block in enumerate(self.blocks):
+            self.cells[self.cell_of(block.x, block.y)].append(index)
+
+    def cell_of(self, x, y):
+        return (math.floor(float(x) / self.cell_size),
+                math.floor(float(y) / self.cell_size))
+
+    def near(self, x, y, radius):
+        '''
+        Returns the blocks in every cell touching the square of side
+        2 * radius centred on x/y. Blocks come back in the order they
+        were given, so callers break ties the same way a full scan would.
+        '''
+        x = float(x)
+        y = float(y)
+        min_i, min_j = self.cell_of(x - radius, y - radius)
+        max_i, max_j = self.cell_of(x + radius, y + radius)
+
+        indexes = []
+        for i in range(min_i, max_i + 1):
+            for j in range(min_j, max_j + 1):
+                indexes.extend(self.cells.get((i, j), ()))
+
+        return [self.blocks[index] for index in sorted(indexes)]
@@ -1,5 +1,5 @@
 from django.core.exceptions import ObjectDoesNotExist
-import settings.models as sm
+from settings.api.functions.project_settings import project_settings
 import logging
 
 
@@ -8,16 +8,7 @@ class CommonMethods(object):
         self.logger = logging.getLogger(__name__)
 
     def get_setting(self, key):
-        settings = sm.ProjectSetting.objects.filter(key=key)
-
-        if not settings.exists():
-            return None
-
-        if settings.count() > 1:
-            self.logger.warning(
-                f"There are multiple settings with the key: {key}")
-
-        return settings.first().value
+        return project_settings.get(key)
 
     def number_fix(self, cell):
         if isinstance(cell, str):
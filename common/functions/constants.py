@@ -1,3 +1,7 @@
+# Rows per bulk_create / bulk_update call and per IN (...) lookup.
+# Kept under the 2100 parameter limit of SQL Server.
+BULK_BATCH_SIZE = 500
+
 MANDATORY_RING_STATES = [
     {"pri_state": "Abandoned", "sec_state": None},
     {"pri_state": "Bogging", "sec_state": None},
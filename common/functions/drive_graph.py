@@ -0,0 +1,274 @@
+from django.db.models import Q
+
+import numpy as np
+import prod_concept.models as m
+
+from common.functions.block_adjacency import BlockAdjacencyFunctions
+from common.functions.constants import BULK_BATCH_SIZE
+
+
+class DriveGraph():
+    '''
+    Concept blocks, their BlockLink and BlockAdjacency rows, loaded once.
+
+    Offers the stepping methods of BlockAdjacencyFunctions as in-memory
+    calls, returning the same FlowModelConceptRing instances every time.
+    Build it with for_levels() or for_scenario(), then either call it
+    directly or hand it to BlockAdjacencyFunctions(graph=...).
+
+    Blocks outside the filter that links or adjacencies point at are
+    loaded as edge blocks: they can be stepped to, but their own links
+    aren't loaded, so has_block() is False for them and their drive isn't
+    held. Stepping from one goes to the database.
+    '''
+    DIRECTIONS = np.array(['E', 'NE', 'N', 'NW', 'W', 'SW', 'S', 'SE'])
+
+    def __init__(self, blocks, batch_size=BULK_BATCH_SIZE):
+        self.baf = BlockAdjacencyFunctions(batch_size)
+        self.batch_size = batch_size
+
+        self.blocks = []
+        self.index = {}
+        self.by_drive = {}
+        self.links = []
+        self.successors = []
+        self.adjacent = []
+        self.add_blocks(blocks)
+        # Blocks from here on are edge blocks
+        self.held = len(self.blocks)
+
+        # Links and adjacencies can point at blocks outside the filter
+        links = self.fetch_rows(m.BlockLink.objects.order_by('id'),
+                                'block_id', 'linked_id', 'direction')
+        adjacencies = self.fetch_rows(m.BlockAdjacency.objects.order_by('id'),
+                                      'block_id', 'adjacent_block_id', 'direction')
+        missing = set(row[1] for row in links + adjacencies) - set(self.index)
+        if missing:
+            self.add_blocks(self.fetch_blocks(sorted(missing)), edge=True)
+
+        for block_id, linked_id, direction in links:
+            self.links[self.index[block_id]].append(
+                (direction, self.index[linked_id]))
+            if direction == 'S':
+                self.successors[self.index[block_id]].append(self.index[linked_id])
+        for block_id, adjacent_id, direction in adjacencies:
+            self.adjacent[self.index[block_id]].append(
+                (direction, self.index[adjacent_id]))
+
+        self.x = np.array([float(b.x) for b in self.blocks])
+        self.y = np.array([float(b.y) for b in self.blocks])
+        self.active = np.array([bool(b.is_active) for b in self.blocks])
+        self.drive_index = {drive: np.array(indexes)
+                            for drive, indexes in self.by_drive.items()}
+
+    @classmethod
+    def for_levels(cls, levels):
+        return cls(m.FlowModelConceptRing.objects.filter(
+            level__in=list(levels)).order_by('location_id'))
+
+    @classmethod
+    def for_scenario(cls, scenario):
+        from whatif.models import SchedSim
+
+        sched = SchedSim.objects.filter(scenario=scenario)
+        return cls.for_schedule(
+            sched.values_list('level', flat=True),
+            sched.exclude(description__isnull=True).values_list('description', flat=True))
+
+    @classmethod
+    def for_schedule(cls, levels, drives):
+        '''
+        Every block on the levels of a schedule, plus any other block
+        in a drive the schedule names
+        '''
+        return cls(m.FlowModelConceptRing.objects.filter(
+            Q(level__in=set(levels)) | Q(description__in=set(drives))).order_by('location_id'))
+
+    def add_blocks(self, blocks, edge=False):
+        for block in blocks:
+            if block.location_id in self.index:
+                continue
+            self.index[block.location_id] = len(self.blocks)
+            if not edge:
+                self.by_drive.setdefault(block.description, []).append(len(self.blocks))
+            self.blocks.append(block)
+            self.links.append([])
+            self.successors.append([])
+            self.adjacent.append([])
+
+    def fetch_blocks(self, location_ids):
+        blocks = []
+        for i in range(0, len(location_ids), self.batch_size):
+            blocks.extend(m.FlowModelConceptRing.objects.filter(
+                location_id__in=location_ids[i:i + self.batch_size]).order_by('location_id'))
+        return blocks
+
+    def fetch_rows(self, queryset, *fields):
+        block_ids = sorted(self.index)
+        rows = []
+        for i in range(0, len(block_ids), self.batch_size):
+            rows.extend(queryset.filter(
+                block_id__in=block_ids[i:i + self.batch_size]).values_list('id', *fields))
+        # Keep database order across the chunks
+        rows.sort()
+        return [row[1:] for row in rows]
+
+    def has_block(self, block):
+        # Only the blocks whose links are loaded, not edge blocks
+        return block is not None and self.index.get(block.location_id, self.held) < self.held
+
+    def has_drive(self, drive_name):
+        return drive_name in self.by_drive
+
+    # ============== STEPPING =====================
+
+    def step_next_block(self, this_block, mining_direction):
+        next_block = self.step_using_successor_method(this_block)
+        if next_block:
+            return next_block
+        return self.step_using_mining_direction(this_block, mining_direction)
+
+    def step_using_successor_method(self, this_block):
+        if not self.has_block(this_block):
+            return self.baf.step_using_successor_method(this_block)
+        i = self.index[this_block.location_id]
+        for j in self.successors[i]:
+            if self.blocks[j].description == this_block.description:
+                return self.blocks[j]
+        return None
+
+    def step_using_mining_direction(self, this_block, mining_direction):
+        if not self.has_block(this_block):
+            return self.baf.step_using_mining_direction(this_block, mining_direction)
+        tolerated_directions = self.baf.dir_tolerance.get(mining_direction, [])
+        i = self.index[this_block.location_id]
+        for direction, j in self.adjacent[i]:
+            if direction in tolerated_directions and self.blocks[j].description == this_block.description:
+                return self.blocks[j]
+        return None
+
+    def step_dist(self, this_block, mining_direction, distance):
+        block = self.step_dist_using_successor_method(this_block, distance)
+        if block == this_block:
+            block = self.step_dist_using_mining_direction(
+                this_block, mining_direction, distance)
+        return block
+
+    def step_dist_using_successor_method(self, this_block, distance):
+        dist = 0
+        final_block = this_block
+
+        while dist < distance:
+            next_block = self.step_using_successor_method(final_block)
+            if next_block:
+                final_block = next_block
+                dist = self.baf.get_dist_to_block(this_block, next_block)
+            else:
+                return final_block
+
+        return final_block
+
+    def step_dist_using_mining_direction(self, this_block, mining_direction, distance):
+        '''
+        Closest block in the drive beyond distance, otherwise the farthest
+        one within it, looking only in the general mining direction
+        '''
+        if not self.has_block(this_block):
+            return self.baf.step_dist_using_mining_direction(this_block, mining_direction, distance)
+        i = self.index[this_block.location_id]
+        drive = self.drive_index.get(this_block.description)
+        if drive is None:
+            return None
+        drive = drive[drive != i]
+
+        dist = np.hypot(self.x[i] - self.x[drive], self.y[i] - self.y[drive])
+        directions = self.directions(i, drive)
+        ahead = np.isin(directions, self.tolerated_by(mining_direction))
+
+        over = ahead & (dist > distance) & (dist < 10000)
+        if over.any():
+            candidates = np.flatnonzero(over)
+            return self.blocks[drive[candidates[np.argmin(dist[candidates])]]]
+
+        under = ahead & (dist < distance) & (dist > 0)
+        if under.any():
+            candidates = np.flatnonzero(under)
+            return self.blocks[drive[candidates[np.argmax(dist[candidates])]]]
+        return None
+
+    def get_links(self, block):
+        '''
+        [(direction, linked block), ...] from the block's BlockLink rows,
+        both successors and predecessors
+        '''
+        i = self.index[block.location_id]
+        return [(direction, self.blocks[j]) for direction, j in self.links[i]]
+
+    def get_adjacent(self, block):
+        # [(direction, adjacent block), ...] from the block's BlockAdjacency rows
+        i = self.index[block.location_id]
+        return [(direction, self.blocks[j]) for direction, j in self.adjacent[i]]
+
+    # ============== DRIVE ENDS =====================
+
+    def find_first_block(self, concept_desc, mining_direction):
+        indexes = [i for i in self.by_drive.get(concept_desc, []) if self.active[i]]
+        if not indexes:
+            return None
+        opposite_direction = self.baf.get_opposite_direction(mining_direction)
+        return self.blocks[self.last_in(indexes, opposite_direction)]
+
+    def get_last_block_in_drive(self, drive_name, mining_direction):
+        indexes = self.by_drive.get(drive_name, [])
+        if not indexes:
+            return None
+        return self.blocks[self.last_in(indexes, mining_direction)]
+
+    def last_in(self, indexes, mining_direction):
+        # Same walk as get_last_block_in_set
+        tolerated = self.tolerated_by(mining_direction)
+        reference = indexes[0]
+        for i in indexes[1:]:
+            if self.direction(reference, i) in tolerated:
+                reference = i
+        return reference
+
+    # ============== NEIGHBOURS =====================
+
+    def get_adjacent_drives(self, block):
+        i = self.index[block.location_id]
+        drives = []
+        for _, j in self.adjacent[i]:
+            description = self.blocks[j].description
+            if description != block.description and description not in drives:
+                drives.append(description)
+        return drives
+
+    def get_block_from_adj_named_od(self, this_block, that_drive):
+        i = self.index[this_block.location_id]
+        for _, j in self.adjacent[i]:
+            if self.blocks[j].description == that_drive:
+                return self.blocks[j]
+        return None
+
+    # ============== GEOMETRY =====================
+
+    def directions(self, i, others):
+        '''
+        Bearing names from block i to each of others, the same sectors as
+        BlockAdjacencyFunctions.determine_direction
+        '''
+        angle = np.degrees(np.arctan2(self.y[others] - self.y[i], self.x[others] - self.x[i]))
+        angle = (angle + 360) % 360
+        sector = np.select(
+            [angle < 22.5, angle < 67.5, angle < 112.5, angle < 157.5,
+             angle < 202.5, angle < 247.5, angle < 292.5, angle < 337.5],
+            [0, 1, 2, 3, 4, 5, 6, 7], default=0)
+        return self.DIRECTIONS[sector]
+
+    def direction(self, i, j):
+        return self.directions(i, np.array([j]))[0]
+
+    def tolerated_by(self, mining_direction):
+        # Bearings that count as heading in mining_direction
+        return [d for d, tolerated in self.baf.dir_tolerance.items() if mining_direction in tolerated]
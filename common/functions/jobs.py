@@ -0,0 +1,150 @@
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from common.models import Job
+
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_job(task, name, user=None, files=None, **params):
+    '''
+    Creates a Job, saves any uploaded files to storage so the worker can
+    read them, and enqueues task(job_id). Returns the Job.
+    files: {'file': UploadedFile, ...}
+    params: JSON serialisable arguments the task reads from job.params
+    '''
+    saved = {}
+    for key, f in (files or {}).items():
+        if f:
+            saved[key] = default_storage.save(
+                f'jobs/{uuid.uuid4().hex}_{f.name}', f)
+
+    job = Job.objects.create(
+        name=name,
+        owner=user if user and user.is_authenticated else None,
+        files=saved,
+        params=params,
+    )
+    result = task.enqueue(job.job_id)
+    job.task_result_id = str(result.id)
+    job.save(update_fields=['task_result_id'])
+    return job
+
+
+def result_error(result):
+    '''
+    The error message of a handler's result, None unless it reports one.
+    Handlers answer {'msg': {'type', 'body'}} or {'msg', 'msg_type'}.
+    '''
+    if not isinstance(result, dict):
+        return None
+    msg = result.get('msg')
+    if isinstance(msg, dict):
+        return msg.get('body') or '' if msg.get('type') == 'error' else None
+    return msg or '' if result.get('msg_type') == 'error' else None
+
+
+def queued_response(job, body):
+    return {
+        'msg': {'body': body, 'type': 'success'},
+        'job_id': job.job_id,
+    }
+
+
+class JobTracker():
+    '''
+    Used by a task to keep its Job row up to date.
+    Handlers call snapshot() as they go, it copies their counters
+    (rings_created, rings_updated, ...) into job.progress.
+    '''
+    COUNTERS = ['rings_created', 'rings_updated', 'rings_orphaned',
+                'rows_processed', 'links_created', 'blocks_remapped']
+
+    def __init__(self, job_id, min_interval=1.0):
+        self.job = Job.objects.get(job_id=job_id)
+        self.min_interval = min_interval
+        self.last_saved = 0
+
+    @property
+    def user(self):
+        return self.job.owner
+
+    @property
+    def params(self):
+        return self.job.params
+
+    def open_file(self, key):
+        path = self.job.files.get(key)
+        return default_storage.open(path, 'rb') if path else None
+
+    def start(self):
+        self.job.status = 'running'
+        self.job.started_at = timezone.now()
+        self.job.save(update_fields=['status', 'started_at'])
+
+    def snapshot(self, handler, stage, force=False, **extra):
+        progress = {'stage': stage}
+        for counter in self.COUNTERS:
+            if hasattr(handler, counter):
+                progress[counter] = getattr(handler, counter)
+        progress.update(extra)
+        self.update(progress, force)
+
+    def update(self, progress, force=False):
+        self.job.progress = progress
+        # Rows are saved at most once a second unless forced
+        now = time.monotonic()
+        if force or now - self.last_saved >= self.min_interval:
+            self.job.save(update_fields=['progress'])
+            self.last_saved = now
+
+    def finish(self, result):
+        # Handlers report most failures as an error message, not an exception
+        error = result_error(result)
+        if error is not None:
+            self.job.status = 'failed'
+            self.job.error = error
+        else:
+            self.job.status = 'complete'
+        self.job.result = result
+        self.job.finished_at = timezone.now()
+        self.job.save(update_fields=[
+                      'status', 'result', 'error', 'progress', 'finished_at'])
+
+    def fail(self, error):
+        self.job.status = 'failed'
+        self.job.error = error
+        self.job.finished_at = timezone.now()
+        self.job.save(update_fields=[
+                      'status', 'error', 'progress', 'finished_at'])
+
+    def remove_files(self):
+        for path in self.job.files.values():
+            try:
+                default_storage.delete(path)
+            except OSError:
+                logger.warning(f"Could not remove job file {path}")
+
+
+def run_job(job_id, work):
+    '''
+    Runs work(tracker) for a queued Job, recording the result or the
+    error. A result whose msg is an error fails the job as well. The
+    exception is re-raised so the task result shows it too.
+    '''
+    tracker = JobTracker(job_id)
+    tracker.start()
+    try:
+        result = work(tracker)
+        tracker.finish(result)
+        return result
+    except Exception as e:
+        logger.exception(f"Job {job_id} ({tracker.job.name}) failed")
+        tracker.fail(str(e))
+        raise
+    finally:
+        tracker.remove_files()
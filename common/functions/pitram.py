@@ -1,28 +1,93 @@
+import json
 import logging
-from django.http import JsonResponse
+import time
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
 from django.db import connections
 
 
 class Pitram(object):
+    '''
+    Queries against the Pitram database (the readonly connection).
 
-    def __init__(self):
+    Statements are always parameterised and rows are fetched fetch_size at
+    a time, so an extract is never held in memory whole. The connection is
+    persistent and health checked, see CONN_MAX_AGE in settings. Row counts
+    and timings of every query are logged and kept in self.stats.
+    '''
+    ALIAS = 'readonly'
+
+    def __init__(self, alias=ALIAS, fetch_size=None):
         self.logger = logging.getLogger(__name__)
+        self.alias = alias
+        self.fetch_size = fetch_size or getattr(settings, 'PITRAM_FETCH_SIZE', 2000)
+        # of the last query: rows, seconds to the first row and in all
+        self.stats = {}
 
-    def pitram_query_json(self, query_string, params=None):
-        with connections['pitram'].cursor() as cursor:
-            cursor.execute(query_string)
-            results = cursor.fetchall()
+    def iter_batches(self, query_string, params=None):
+        '''
+        Yields (columns, rows) for every fetch_size rows of the result
+        '''
+        if query_string.lstrip().split(None, 1)[0].upper() not in ('SELECT', 'WITH'):
+            raise ValueError("Only SELECT statements can be run against Pitram")
 
-        # You can convert them to a list of dictionaries or any desired format
-        data = [dict(zip([column[0] for column in cursor.description], row))
-                for row in results]
+        started = time.perf_counter()
+        self.stats = {'rows': 0, 'first_row_seconds': None, 'seconds': None}
+        # chunked_cursor is server side where the backend has one
+        with connections[self.alias].chunked_cursor() as cursor:
+            cursor.execute(query_string, params or [])
+            columns = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(self.fetch_size)
+                if not rows:
+                    break
+                if self.stats['first_row_seconds'] is None:
+                    self.stats['first_row_seconds'] = round(time.perf_counter() - started, 3)
+                self.stats['rows'] += len(rows)
+                yield columns, rows
 
-        # Return the data as JSON
-        return JsonResponse(data, safe=False)
+        self.stats['seconds'] = round(time.perf_counter() - started, 3)
+        self.logger.info(
+            f"Pitram query: {self.stats['rows']} rows in {self.stats['seconds']}s "
+            f"(first row {self.stats['first_row_seconds'] or 0}s): {query_string[:200]}")
 
-    def pitram_query_rs(self, query_string, params=None):
-        with connections['pitram'].cursor() as cursor:
-            cursor.execute(query_string, params)
-            results = cursor.fetchall()
+    def iter_rows(self, query_string, params=None):
+        # Rows as dicts of column: value
+        for columns, rows in self.iter_batches(query_string, params):
+            for row in rows:
+                yield dict(zip(columns, row))
+
+    def pitram_query_json(self, query_string, params=None, ndjson=False):
+        '''
+        Streams the result to the client as a JSON array, or one JSON
+        object per line with ndjson
+        '''
+        if ndjson:
+            content = self.stream_ndjson(query_string, params)
+            content_type = 'application/x-ndjson'
+        else:
+            content = self.stream_json(query_string, params)
+            content_type = 'application/json'
+        return StreamingHttpResponse(content, content_type=content_type)
 
+    def stream_json(self, query_string, params=None):
+        yield '['
+        first = True
+        for columns, rows in self.iter_batches(query_string, params):
+            chunk = ','.join(json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder)
+                             for row in rows)
+            yield chunk if first else ',' + chunk
+            first = False
+        yield ']'
+
+    def stream_ndjson(self, query_string, params=None):
+        for columns, rows in self.iter_batches(query_string, params):
+            yield ''.join(json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
+                          for row in rows)
+
+    def pitram_query_rs(self, query_string, params=None):
+        results = []
+        for _, rows in self.iter_batches(query_string, params):
+            results.extend(rows)
         return results
@@ -0,0 +1,207 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from common.functions.constants import BULK_BATCH_SIZE, MANDATORY_RING_STATES
+from common.functions.shkey import Shkey
+from prod_actual.api.functions.bogging_ledger import BoggingLedger
+from report.api.functions.shift_rollup import ShiftRollup
+
+import prod_actual.models as pm
+import prod_concept.models as pcm
+import random
+
+
+class SyntheticMine():
+    '''
+    Generates a made up mine for benchmarks: levels of parallel ore drives
+    running north, each a chain of flow model concept blocks with the
+    production rings laid over them. Rings run from mined out at the start
+    of the drive to designed at the end, with the shifts, state changes
+    and bogging a real drive has.
+
+    Meant for throwaway or development databases, see benchmark_queries,
+    benchmark_suite and generate_synthetic_mine.
+    '''
+    # Share of each drive's rings in each status, from the start of the drive
+    PROFILE = [('Complete', 0.33), ('Abandoned', 0.02), ('Bogging', 0.05), ('Charged', 0.05),
+               ('Drilled', 0.15), ('Designed', 0.40)]
+
+    # metres between drives and between rings, two rings to a concept block
+    DRIVE_SPACING = 15
+    RING_SPACING = 2.5
+    RINGS_PER_BLOCK = 2
+
+    def __init__(self, levels=10, drives=12, rings=60, days=365, seed=1):
+        self.levels = [1000 + 25 * i for i in range(levels)]
+        self.drives = [f'OD{i + 1}' for i in range(drives)]
+        self.rings_per_drive = rings
+        self.size = {'levels': levels, 'drives': drives, 'rings': rings, 'days': days}
+        # (level, oredrive): concept blocks in mining order
+        self.blocks = {}
+        self.days = days
+        self.random = random.Random(seed)
+        self.today = date.today()
+
+    def shkey(self, days_ago):
+        day = self.today - timedelta(days=days_ago)
+        return Shkey.generate_shkey(day, self.random.choice('DN'))
+
+    def statuses(self):
+        statuses = []
+        for status, share in self.PROFILE:
+            statuses.extend([status] * round(share * self.rings_per_drive))
+        statuses.extend(['Designed'] * (self.rings_per_drive - len(statuses)))
+        return statuses[:self.rings_per_drive]
+
+    def create_states(self):
+        states = {}
+        for state in MANDATORY_RING_STATES:
+            obj, _ = pm.RingState.objects.get_or_create(**state)
+            states[(obj.pri_state, obj.sec_state)] = obj
+        return states
+
+    def drive_name(self, level, oredrive):
+        return f'{level}_{oredrive}'
+
+    def create_concept(self):
+        blocks = []
+        count = -(-self.rings_per_drive // self.RINGS_PER_BLOCK)
+        for level in self.levels:
+            for d, oredrive in enumerate(self.drives):
+                # Grades drift along the drive, as they would through an orebody
+                au = self.random.uniform(0.3, 2.5)
+                for n in range(count):
+                    au = min(max(au + self.random.uniform(-0.15, 0.15), 0.05), 9.9)
+                    blocks.append(pcm.FlowModelConceptRing(
+                        blastsolids_id=f'BS_{level}_{oredrive}_{n + 1}',
+                        description=self.drive_name(level, oredrive),
+                        level=level,
+                        heading='N',
+                        drive=d + 1,
+                        loc=str(n + 1),
+                        prod_dev_code='c',
+                        x=Decimal(1000 + d * self.DRIVE_SPACING),
+                        y=Decimal(str(2000 + n * self.RING_SPACING * self.RINGS_PER_BLOCK)),
+                        z=Decimal(level),
+                        pgca_modelled_tonnes=Decimal(self.random.randint(2000, 4500)),
+                        draw_zone=n // 10 + 1,
+                        density=Decimal('2.75'),
+                        modelled_au=Decimal(str(round(au, 3))),
+                        modelled_cu=Decimal(str(round(self.random.uniform(0.1, 1.2), 3))),
+                    ))
+        pcm.FlowModelConceptRing.objects.bulk_create(blocks, batch_size=BULK_BATCH_SIZE)
+
+        for block in pcm.FlowModelConceptRing.objects.filter(
+                level__in=self.levels).order_by('location_id'):
+            key = (block.level, block.description.split('_', 1)[1])
+            self.blocks.setdefault(key, []).append(block)
+        return sum(len(b) for b in self.blocks.values())
+
+    def create_links(self):
+        # Each block's predecessor and successor in its drive, and the direction drives are mined
+        links = []
+        directions = []
+        for (level, oredrive), blocks in self.blocks.items():
+            for block, successor in zip(blocks, blocks[1:]):
+                links.append(pcm.BlockLink(block=block, linked=successor, direction='S'))
+                links.append(pcm.BlockLink(block=successor, linked=block, direction='P'))
+            directions.append(pcm.MiningDirection(
+                description=self.drive_name(level, oredrive), mining_direction='N',
+                first_block=blocks[0], last_block=blocks[-1]))
+        pcm.BlockLink.objects.bulk_create(links, batch_size=BULK_BATCH_SIZE)
+        pcm.MiningDirection.objects.bulk_create(directions, batch_size=BULK_BATCH_SIZE)
+        return len(links)
+
+    def create_rings(self):
+        rings = []
+        statuses = self.statuses()
+        for level in self.levels:
+            for d, oredrive in enumerate(self.drives):
+                blocks = self.blocks.get((level, oredrive), [])
+                for n, status in enumerate(statuses):
+                    ring = pm.ProductionRing(
+                        level=level,
+                        oredrive=oredrive,
+                        ring_number_txt=str(n + 1),
+                        alias=f'{level}_{oredrive}_{n + 1}',
+                        description=self.drive_name(level, oredrive),
+                        concept_ring=blocks[n // self.RINGS_PER_BLOCK] if blocks else None,
+                        prod_dev_code='p',
+                        status=status,
+                        x=Decimal(1000 + d * self.DRIVE_SPACING),
+                        y=Decimal(str(2000 + n * self.RING_SPACING)),
+                        z=Decimal(level),
+                        designed_tonnes=Decimal(self.random.randint(800, 2500)),
+                        draw_percentage=Decimal(100),
+                        drill_meters=Decimal(self.random.randint(150, 400)),
+                    )
+                    self.add_shifts(ring, n)
+                    rings.append(ring)
+        pm.ProductionRing.objects.bulk_create(rings, batch_size=BULK_BATCH_SIZE)
+        # bulk_create only returns keys on some databases
+        return list(pm.ProductionRing.objects.filter(
+            level__in=self.levels).order_by('location_id'))
+
+    def add_shifts(self, ring, n):
+        # Rings further along the drive were worked on more recently
+        age = max(1, int(self.days * (1 - n / self.rings_per_drive)))
+        if ring.status in ('Drilled', 'Charged', 'Bogging', 'Complete', 'Abandoned'):
+            ring.drilled_meters = ring.drill_meters
+            ring.drill_complete_shift = self.shkey(age)
+        if ring.status in ('Charged', 'Bogging', 'Complete'):
+            ring.charge_shift = self.shkey(max(0, age - 3))
+        if ring.status in ('Bogging', 'Complete'):
+            ring.fired_shift = self.shkey(max(0, age - 5))
+        if ring.status in ('Complete', 'Abandoned'):
+            ring.bog_complete_shift = self.shkey(max(0, age - 10))
+
+    def create_history(self, rings, states):
+        changes = []
+        bogging = []
+        for ring in rings:
+            for shift, pri_state in ((ring.drill_complete_shift, 'Drilled'),
+                                     (ring.charge_shift, 'Charged'),
+                                     (ring.fired_shift, 'Bogging')):
+                if shift:
+                    changes.append(pm.RingStateChange(
+                        prod_ring=ring, shkey=shift, state=states[(pri_state, None)],
+                        is_active=True))
+            if ring.status == 'Abandoned':
+                changes.append(pm.RingStateChange(
+                    prod_ring=ring, shkey=ring.bog_complete_shift,
+                    state=states[('Abandoned', None)], is_active=True))
+            if ring.status == 'Drilled' and self.random.random() < 0.2:
+                changes.append(pm.RingStateChange(
+                    prod_ring=ring, shkey=ring.drill_complete_shift,
+                    state=states[('Drilled', 'Blocked Holes')], is_active=True))
+
+            if ring.fired_shift:
+                shkey = ring.fired_shift
+                now = Shkey.generate_shkey(self.today, 'N')
+                target = ring.designed_tonnes * (1 if ring.status == 'Complete' else Decimal('0.4'))
+                tonnes = Decimal(0)
+                while tonnes < target:
+                    amount = Decimal(self.random.randint(50, 400))
+                    bogging.append(pm.BoggedTonnes(
+                        production_ring=ring, shkey=shkey, bogged_tonnes=amount))
+                    tonnes += amount
+                    shkey = min(Shkey.next_shkey(shkey), now)
+
+        pm.RingStateChange.objects.bulk_create(changes, batch_size=BULK_BATCH_SIZE)
+        pm.BoggedTonnes.objects.bulk_create(bogging, batch_size=BULK_BATCH_SIZE)
+        return len(changes), len(bogging)
+
+    def generate(self):
+        '''
+        Returns counts of what was made
+        '''
+        blocks = self.create_concept()
+        links = self.create_links()
+        states = self.create_states()
+        rings = self.create_rings()
+        changes, bogging = self.create_history(rings, states)
+        # Totals the write paths would have kept
+        BoggingLedger().rebuild([r.location_id for r in rings if r.fired_shift])
+        ShiftRollup().backfill()
+        return {'concept_blocks': blocks, 'block_links': links, 'rings': len(rings),
+                'state_changes': changes, 'bogged_tonnes': bogging}
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 from django.db.models import JSONField
 
@@ -37,3 +38,36 @@ class Reference(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class Job(models.Model):
+    """
+    A long running piece of work (file upload, remap, scenario run)
+    handed to the task queue. The client polls it for progress.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
+    ]
+    job_id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=100)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default='queued')
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True)
+    # id of the django-tasks result
+    task_result_id = models.CharField(max_length=64, blank=True, null=True)
+    # uploaded files saved to storage, {'file': 'jobs/...'}
+    files = JSONField(default=dict, blank=True)
+    params = JSONField(default=dict, blank=True)
+    progress = JSONField(default=dict, blank=True)
+    result = JSONField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f'{self.name} {self.job_id} ({self.status})'
@@ -0,0 +1,36 @@
+from contextlib import contextmanager
+from django.dispatch import Signal
+
+import threading
+
+# Sent after bulk writes to ProductionRing or FlowModelConceptRing, which
+# skip post_save. sender is the model class written, location_ids the
+# ProductionRing ids involved when known (all rings otherwise), shkeys
+# any shifts the write moved rings or bogging off, which the rings no
+# longer show, and block_ids the FlowModelConceptRing ids changed.
+production_data_changed = Signal()
+
+
+class BulkWrite(threading.local):
+    depth = 0
+
+
+bulk = BulkWrite()
+
+
+@contextmanager
+def bulk_write():
+    '''
+    Per row receivers of the production models do nothing inside, for
+    writers that delete or save many rows and then send
+    production_data_changed once with the rings
+    '''
+    bulk.depth += 1
+    try:
+        yield
+    finally:
+        bulk.depth -= 1
+
+
+def in_bulk_write():
+    return bulk.depth > 0
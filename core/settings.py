@@ -31,6 +31,11 @@ DEBUG = os.getenv('DEBUG', 'False') == 'True'
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '').split(',')
 
 AUTH_SERVER_URL = os.getenv("AUTH_SERVER_URL", "http://localhost:8010")
+# Connections kept open to the auth server, and how long (seconds) and how many
+# users each process keeps between requests, see users.cache
+AUTH_SERVER_POOL_SIZE = int(os.getenv('AUTH_SERVER_POOL_SIZE', 10))
+REMOTE_USER_CACHE_TTL = int(os.getenv('REMOTE_USER_CACHE_TTL', 60))
+REMOTE_USER_CACHE_SIZE = int(os.getenv('REMOTE_USER_CACHE_SIZE', 1000))
 AUTH_USER_MODEL = 'users.RemoteUser'
 
 AUTHENTICATION_BACKENDS = [
@@ -49,6 +54,8 @@ INSTALLED_APPS = [
     'corsheaders',
     'rest_framework_simplejwt',
     'rest_framework',
+    'django_tasks',
+    'django_tasks.backends.database',
     'users',
     'common',
     'prod_actual',
@@ -61,6 +68,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the other middleware too
+    'logs.middleware.QueryProfileMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -70,6 +79,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'settings.middleware.ProjectSettingsMiddleware',
+    'prod_actual.middleware.RingStatesMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -147,11 +158,17 @@ PITRAM_DB_USER = os.getenv('PITRAM_DB_USER', '')
 PITRAM_DB_PASSWORD = os.getenv('PITRAM_DB_PASSWORD', '')
 PITRAM_DB_HOST = os.getenv('PITRAM_DB_HOST', '')
 PITRAM_DB_PORT = os.getenv('PITRAM_DB_PORT', '')
+# Pitram connections are kept open between requests and checked before reuse
+PITRAM_CONN_MAX_AGE = int(os.getenv('PITRAM_CONN_MAX_AGE', 300))
+# Rows fetched from Pitram at a time, see common.functions.pitram
+PITRAM_FETCH_SIZE = int(os.getenv('PITRAM_FETCH_SIZE', 2000))
 
 if PITRAM_DB_ENGINE == 'django.db.backends.sqlite3':
     DATABASES['readonly'] = {
         'ENGINE': PITRAM_DB_ENGINE,
         'NAME': PITRAM_DB_NAME,
+        'CONN_MAX_AGE': PITRAM_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
     }
 else:
     # assume MS-SQL in production
@@ -163,6 +180,8 @@ else:
         'PASSWORD': PITRAM_DB_PASSWORD,
         'HOST': PITRAM_DB_HOST,
         'PORT': PITRAM_DB_PORT,
+        'CONN_MAX_AGE': PITRAM_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
         'OPTIONS': {
             'driver': 'ODBC Driver 17 for SQL Server',
             'unicode_results': True,
@@ -170,6 +189,34 @@ else:
         },
     }
 
+# Background jobs, run the queue with: python manage.py db_worker
+TASKS = {
+    'default': {
+        'BACKEND': os.getenv('TASKS_BACKEND', 'django_tasks.backends.database.DatabaseBackend'),
+    }
+}
+
+# Processes a what-if scenario run spreads its levels over, 1 runs them in turn
+SCENARIO_WORKERS = int(os.getenv('SCENARIO_WORKERS', os.cpu_count() or 1))
+
+# Shift reports: seconds the current shift's are cached, days closed ones are kept
+REPORT_CURRENT_SHIFT_TTL = int(os.getenv('REPORT_CURRENT_SHIFT_TTL', 60))
+REPORT_SNAPSHOT_DAYS = int(os.getenv('REPORT_SNAPSHOT_DAYS', 90))
+
+# Request profiling, see logs.middleware. Requests slower than PROFILE_SLOW_MS are always kept.
+# Each process buffers the sums and writes them every PROFILE_FLUSH_SECONDS from a background
+# thread, one locked RequestProfile row per route and hour, and loses the unwritten ones on exit
+PROFILE_REQUESTS = os.getenv('PROFILE_REQUESTS', 'True') == 'True'
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.1))
+PROFILE_SLOW_MS = int(os.getenv('PROFILE_SLOW_MS', 1000))
+PROFILE_FLUSH_SECONDS = int(os.getenv('PROFILE_FLUSH_SECONDS', 60))
+
+# Seconds a process trusts its ProjectSetting snapshot before checking the settings
+# version again, requests check it first anyway. See settings.api.functions.project_settings
+PROJECT_SETTINGS_MAX_AGE = int(os.getenv('PROJECT_SETTINGS_MAX_AGE', 5))
+# The same for the RingState registry, see prod_actual.api.functions.ring_states
+RING_STATES_MAX_AGE = int(os.getenv('RING_STATES_MAX_AGE', 5))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
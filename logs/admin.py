@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ErrorLog, WarningLog, UserActivityLog
+from .models import ErrorLog, WarningLog, UserActivityLog, RequestProfile
 
 
 class ErrorLogAdmin(admin.ModelAdmin):
@@ -28,6 +28,17 @@ class UserActivityLogAdmin(admin.ModelAdmin):
                        'ip_address', 'activity_type', 'user')
 
 
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('period_start', 'method', 'route', 'requests', 'sampled',
+                    'total_ms', 'max_ms', 'max_queries')
+    search_fields = ('route', 'url_name')
+    list_filter = ('period_start', 'method')
+    readonly_fields = ('route', 'url_name', 'method', 'period_start', 'requests', 'sampled',
+                       'slow', 'total_ms',
+                       'max_ms', 'python_ms', 'db', 'max_queries', 'slowest_sql')
+
+
 admin.site.register(ErrorLog, ErrorLogAdmin)
 admin.site.register(WarningLog, WarningLogAdmin)
 admin.site.register(UserActivityLog, UserActivityLogAdmin)
+admin.site.register(RequestProfile, RequestProfileAdmin)
@@ -16,4 +16,7 @@ urlpatterns = [
          name='user-activity-log-list-create'),
     path('user-activity-logs/<int:pk>/',
          v.UserActivityLogDetailView.as_view(), name='user-activity-log-detail'),
+
+    path('request-profiles/', v.RequestProfileRankingView.as_view(),
+         name='request-profile-ranking'),
 ]
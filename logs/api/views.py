@@ -1,5 +1,9 @@
-from rest_framework import generics
-from ..models import ErrorLog, WarningLog, UserActivityLog
+from datetime import timedelta
+from django.utils import timezone
+from rest_framework import generics, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from ..models import ErrorLog, WarningLog, UserActivityLog, RequestProfile
 from .serializers import ErrorLogSerializer, WarningLogSerializer, UserActivityLogSerializer
 
 
@@ -31,3 +35,59 @@ class UserActivityLogListCreateView(generics.ListCreateAPIView):
 class UserActivityLogDetailView(generics.RetrieveDestroyAPIView):
     queryset = UserActivityLog.objects.all()
     serializer_class = UserActivityLogSerializer
+
+
+class RequestProfileRankingView(APIView):
+    '''
+    Routes ranked by where the time went over the last ?hours= (default 24).
+    ?order=total_ms (default), avg_ms, max_ms, avg_queries or max_queries,
+    ?limit= routes (default 20). requests and the totals are estimates from
+    the sampled requests, sampled and slow are what was profiled.
+    '''
+    ORDERS = ['total_ms', 'avg_ms', 'max_ms', 'avg_queries', 'max_queries']
+
+    def get(self, request, *args, **kwargs):
+        order = request.query_params.get('order', 'total_ms')
+        if order not in self.ORDERS:
+            return Response({'msg': {'body': f"Unknown order '{order}'", 'type': 'error'}},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            hours = float(request.query_params.get('hours', 24))
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            return Response({'msg': {'body': 'hours and limit must be numbers', 'type': 'error'}},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        since = timezone.now() - timedelta(hours=hours)
+        routes = {}
+        for row in RequestProfile.objects.filter(period_start__gte=since).order_by('period_start'):
+            route = routes.setdefault((row.route, row.method), {
+                'route': row.route, 'url_name': row.url_name, 'method': row.method,
+                'requests': 0, 'sampled': 0, 'slow': 0, 'total_ms': 0, 'max_ms': 0, 'python_ms': 0,
+                'queries': 0, 'max_queries': 0, 'db': {}, 'slowest_sql': []})
+            route['requests'] += row.requests
+            route['sampled'] += row.sampled
+            route['slow'] += row.slow
+            route['total_ms'] += row.total_ms
+            route['max_ms'] = max(route['max_ms'], row.max_ms)
+            route['python_ms'] += row.python_ms
+            route['max_queries'] = max(route['max_queries'], row.max_queries)
+            for alias, db in row.db.items():
+                totals = route['db'].setdefault(alias, {'queries': 0, 'ms': 0})
+                totals['queries'] += db['queries']
+                totals['ms'] += db['ms']
+                route['queries'] += db['queries']
+            route['slowest_sql'] = sorted(route['slowest_sql'] + row.slowest_sql,
+                                          key=lambda s: s['ms'], reverse=True)[:5]
+
+        for route in routes.values():
+            requests = route['requests'] or 1
+            route['avg_ms'] = round(route['total_ms'] / requests, 1)
+            route['avg_queries'] = round(route.pop('queries') / requests, 1)
+            route['requests'] = round(route['requests'])
+            route['total_ms'] = round(route['total_ms'], 1)
+            route['max_ms'] = round(route['max_ms'], 1)
+            route['python_ms'] = round(route['python_ms'], 1)
+
+        ranked = sorted(routes.values(), key=lambda r: r[order], reverse=True)[:limit]
+        return Response({'since': since, 'order': order, 'routes': ranked}, status=status.HTTP_200_OK)
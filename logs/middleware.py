@@ -0,0 +1,233 @@
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+import heapq
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class QueryTimer():
+    '''
+    execute_wrapper for one connection alias, counts and times its
+    statements and keeps the slowest ones
+    '''
+
+    def __init__(self, alias, keep):
+        self.alias = alias
+        self.keep = keep
+        self.queries = 0
+        self.seconds = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.seconds += elapsed
+            item = (elapsed, self.queries, sql)
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, item)
+            elif elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, item)
+
+
+class RequestProfiler():
+    '''
+    Times one request: statements and database time per connection alias
+    (default and the Pitram readonly), the rest counted as Python time.
+    '''
+
+    def __init__(self, aliases, keep_sql=5):
+        self.timers = [QueryTimer(alias, keep_sql) for alias in aliases]
+        self.total = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.wrappers = [connections[t.alias].execute_wrapper(t) for t in self.timers]
+        for wrapper in self.wrappers:
+            wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        for wrapper in reversed(self.wrappers):
+            wrapper.__exit__(*exc)
+        self.total = time.perf_counter() - self.started
+
+    @property
+    def queries(self):
+        return sum(t.queries for t in self.timers)
+
+    @property
+    def db_seconds(self):
+        return sum(t.seconds for t in self.timers)
+
+    def server_timing(self):
+        parts = [f'db-{t.alias};dur={t.seconds * 1000:.1f};desc="{t.queries} queries"'
+                 for t in self.timers if t.queries]
+        parts.append(f'python;dur={(self.total - self.db_seconds) * 1000:.1f}')
+        parts.append(f'total;dur={self.total * 1000:.1f}')
+        return ', '.join(parts)
+
+    def slowest_sql(self, keep):
+        statements = [{'alias': t.alias, 'ms': round(elapsed * 1000, 2), 'sql': sql[:1000]}
+                      for t in self.timers for elapsed, _, sql in t.slowest]
+        return sorted(statements, key=lambda s: s['ms'], reverse=True)[:keep]
+
+
+class ProfileBuffer():
+    '''
+    Request profiles summed in memory per route, method and hour, and
+    written to RequestProfile every flush_seconds by a background thread,
+    so a request never waits on, or locks, a profile row. What a process
+    hasn't written yet is lost when it stops.
+
+    Each profile is added with a weight, the number of requests it stands
+    for, so the sums estimate every request and not just the sampled ones.
+    '''
+
+    def __init__(self, flush_seconds, keep_sql):
+        self.flush_seconds = flush_seconds
+        self.keep_sql = keep_sql
+        self.rows = {}
+        self.flushed_at = time.monotonic()
+        self.flushing = False
+        self.lock = threading.Lock()
+
+    def add(self, match, method, profile, weight, slow):
+        route = match.route or match.view_name
+        period_start = timezone.now().replace(minute=0, second=0, microsecond=0)
+        total_ms = profile.total * 1000
+
+        with self.lock:
+            row = self.rows.get((route, method, period_start))
+            if row is None:
+                row = self.rows[(route, method, period_start)] = {
+                    'url_name': match.view_name, 'requests': 0, 'sampled': 0, 'slow': 0,
+                    'total_ms': 0, 'max_ms': 0, 'python_ms': 0, 'max_queries': 0,
+                    'db': {}, 'slowest_sql': []}
+            self.add_to(row, {
+                'requests': weight, 'sampled': 1, 'slow': int(slow),
+                'total_ms': total_ms * weight, 'max_ms': total_ms,
+                'python_ms': (profile.total - profile.db_seconds) * 1000 * weight,
+                'max_queries': profile.queries,
+                'db': {t.alias: {'queries': t.queries * weight, 'ms': t.seconds * 1000 * weight}
+                       for t in profile.timers if t.queries},
+                'slowest_sql': profile.slowest_sql(self.keep_sql)})
+
+            rows = None
+            if not self.flushing and time.monotonic() - self.flushed_at >= self.flush_seconds:
+                rows, self.rows = self.rows, {}
+                self.flushing = True
+        if rows:
+            threading.Thread(target=self.write, args=(rows,), daemon=True).start()
+
+    def add_to(self, row, totals):
+        for field in ('requests', 'sampled', 'slow', 'total_ms', 'python_ms'):
+            row[field] += totals[field]
+        row['max_ms'] = max(row['max_ms'], totals['max_ms'])
+        row['max_queries'] = max(row['max_queries'], totals['max_queries'])
+        for alias, db in totals['db'].items():
+            summed = row['db'].setdefault(alias, {'queries': 0, 'ms': 0})
+            summed['queries'] = round(summed['queries'] + db['queries'], 2)
+            summed['ms'] = round(summed['ms'] + db['ms'], 2)
+        row['slowest_sql'] = sorted(row['slowest_sql'] + totals['slowest_sql'],
+                                    key=lambda s: s['ms'], reverse=True)[:self.keep_sql]
+
+    def flush(self):
+        # Writes what is buffered now, in the calling thread
+        with self.lock:
+            rows, self.rows = self.rows, {}
+            self.flushing = True
+        self.write(rows, close=False)
+
+    def write(self, rows, close=True):
+        # Imported here, middleware is loaded before the apps are ready
+        from logs.models import RequestProfile
+
+        try:
+            for (route, method, period_start), totals in rows.items():
+                try:
+                    self.write_row(RequestProfile, route, method, period_start, totals)
+                except Exception as e:
+                    # Profiling must never break anything
+                    logger.warning(f"Request profile of {method} {route} not saved: {e}")
+        finally:
+            self.flushed_at = time.monotonic()
+            self.flushing = False
+            if close:
+                # The thread's own connections, nothing else will close them
+                connections.close_all()
+
+    def write_row(self, RequestProfile, route, method, period_start, totals):
+        for attempt in range(2):
+            try:
+                with transaction.atomic():
+                    row, _ = RequestProfile.objects.select_for_update().get_or_create(
+                        route=route, method=method, period_start=period_start,
+                        defaults={'url_name': totals['url_name']})
+                    summed = {field: getattr(row, field) for field in (
+                        'requests', 'sampled', 'slow', 'total_ms', 'max_ms', 'python_ms',
+                        'max_queries', 'db', 'slowest_sql')}
+                    self.add_to(summed, totals)
+                    for field, value in summed.items():
+                        setattr(row, field, value)
+                    row.save()
+                return
+            except IntegrityError:
+                # Another process created the hour's row first, add to it
+                if attempt:
+                    raise
+
+
+class QueryProfileMiddleware():
+    '''
+    Adds a Server-Timing header with database and Python time to every
+    response, and sums a sample of requests per route and hour into
+    RequestProfile. Slow requests are always kept and count once, the
+    others are kept at PROFILE_SAMPLE_RATE and count 1 / rate each, so the
+    totals estimate all requests.
+
+    The sums are buffered per process and written every
+    PROFILE_FLUSH_SECONDS (ProfileBuffer), off the request.
+
+    Settings: PROFILE_REQUESTS (on/off), PROFILE_SAMPLE_RATE (0-1),
+    PROFILE_SLOW_MS, PROFILE_SLOWEST_SQL (statements kept per route) and
+    PROFILE_FLUSH_SECONDS.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PROFILE_REQUESTS', True)
+        self.sample_rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0.1)
+        self.slow_ms = getattr(settings, 'PROFILE_SLOW_MS', 1000)
+        self.keep_sql = getattr(settings, 'PROFILE_SLOWEST_SQL', 5)
+        self.aliases = [alias for alias in ('default', 'readonly') if alias in settings.DATABASES]
+        self.buffer = ProfileBuffer(getattr(settings, 'PROFILE_FLUSH_SECONDS', 60), self.keep_sql)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        with RequestProfiler(self.aliases, self.keep_sql) as profile:
+            response = self.get_response(request)
+
+        response['Server-Timing'] = profile.server_timing()
+
+        match = getattr(request, 'resolver_match', None)
+        slow = profile.total * 1000 >= self.slow_ms
+        if match and (slow or random.random() < self.sample_rate):
+            try:
+                self.buffer.add(match, request.method, profile,
+                                1 if slow else 1 / self.sample_rate, slow)
+            except Exception as e:
+                # Profiling must never break the request
+                logger.warning(f"Request profile not kept: {e}")
+        return response
@@ -41,3 +41,30 @@ class UserActivityLog(models.Model):
 
     def __str__(self):
         return f"Activity by {self.user} at {self.timestamp} - {self.activity_type}"
+
+
+class RequestProfile(models.Model):
+    # Sampled requests to one route, summed per hour, see logs.middleware.
+    # The sums are weighted to estimate every request, sampled or not.
+    route = models.CharField(max_length=255)
+    url_name = models.CharField(max_length=100, null=True, blank=True)
+    method = models.CharField(max_length=10)
+    period_start = models.DateTimeField(db_index=True)
+    requests = models.FloatField(default=0)
+    # requests actually profiled, and of them the slow ones
+    sampled = models.PositiveIntegerField(default=0)
+    slow = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    python_ms = models.FloatField(default=0)
+    # {alias: {'queries': n, 'ms': t}} summed over the requests, weighted
+    db = models.JSONField(default=dict)
+    max_queries = models.PositiveIntegerField(default=0)
+    # slowest statements seen, [{'alias', 'ms', 'sql'}, ...] slowest first
+    slowest_sql = models.JSONField(default=list)
+
+    class Meta:
+        unique_together = ('route', 'method', 'period_start')
+
+    def __str__(self):
+        return f"{self.method} {self.route} at {self.period_start} - {round(self.requests)} requests"
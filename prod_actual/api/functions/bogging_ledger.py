@@ -0,0 +1,97 @@
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+import prod_actual.models as m
+
+from common.functions.constants import BULK_BATCH_SIZE
+from decimal import Decimal
+
+
+class BoggingLedger(object):
+    """
+    Keeps the bogged tonnes totals in step with BoggedTonnes: the running
+    total on ProductionRing.bogged_tonnes and the per shift rollup in
+    BoggedTonnesShift.
+
+    added(), changed() and removed() adjust the totals for one entry and
+    belong in the same transaction as the write to BoggedTonnes.
+    rebuild() recalculates them from the BoggedTonnes rows.
+    """
+
+    def __init__(self, batch_size=BULK_BATCH_SIZE):
+        self.batch_size = batch_size
+
+    def added(self, entry):
+        self.apply(entry.production_ring_id, entry.shkey, entry.bogged_tonnes, 1)
+
+    def removed(self, entry):
+        self.apply(entry.production_ring_id, entry.shkey, -Decimal(str(entry.bogged_tonnes)), -1)
+
+    def changed(self, before, entry):
+        # before: (production_ring_id, shkey, bogged_tonnes) as they were
+        ring_id, shkey, tonnes = before
+        self.apply(ring_id, shkey, -Decimal(str(tonnes)), -1)
+        self.added(entry)
+
+    def apply(self, ring_id, shkey, tonnes, entries):
+        tonnes = Decimal(str(tonnes or 0))
+        m.ProductionRing.objects.filter(location_id=ring_id).update(
+            bogged_tonnes=F('bogged_tonnes') + tonnes)
+
+        shift, _ = m.BoggedTonnesShift.objects.select_for_update().get_or_create(
+            production_ring_id=ring_id, shkey=shkey)
+        shift.bogged_tonnes += tonnes
+        shift.entries += entries
+        if shift.entries > 0:
+            shift.save(update_fields=['bogged_tonnes', 'entries'])
+        else:
+            shift.delete()
+
+    def rebuild(self, ring_ids=None):
+        """
+        Recalculates the totals of the rings, or of every ring when
+        ring_ids is None. Returns (rings with tonnes, shift rows).
+        """
+        with transaction.atomic():
+            if ring_ids is None:
+                rollup = list(self.rollup(m.BoggedTonnes.objects.all()))
+                m.BoggedTonnesShift.objects.all().delete()
+                m.ProductionRing.objects.exclude(
+                    bogged_tonnes=0).update(bogged_tonnes=0)
+            else:
+                ring_ids = list(ring_ids)
+                rollup = []
+                for i in range(0, len(ring_ids), self.batch_size):
+                    chunk = ring_ids[i:i + self.batch_size]
+                    rollup.extend(self.rollup(
+                        m.BoggedTonnes.objects.filter(production_ring_id__in=chunk)))
+                    m.BoggedTonnesShift.objects.filter(
+                        production_ring_id__in=chunk).delete()
+                    m.ProductionRing.objects.filter(
+                        location_id__in=chunk).update(bogged_tonnes=0)
+
+            m.BoggedTonnesShift.objects.bulk_create([
+                m.BoggedTonnesShift(
+                    production_ring_id=row['production_ring_id'],
+                    shkey=row['shkey'],
+                    bogged_tonnes=row['total'],
+                    entries=row['entries'],
+                ) for row in rollup
+            ], batch_size=self.batch_size)
+
+            totals = {}
+            for row in rollup:
+                totals[row['production_ring_id']] = totals.get(
+                    row['production_ring_id'], 0) + row['total']
+            m.ProductionRing.objects.bulk_update(
+                [m.ProductionRing(location_id=ring_id, bogged_tonnes=total)
+                 for ring_id, total in totals.items()],
+                ['bogged_tonnes'], batch_size=self.batch_size)
+
+        return len(totals), len(rollup)
+
+    def rollup(self, entries):
+        return (entries
+                .values('production_ring_id', 'shkey')
+                .annotate(total=Sum('bogged_tonnes'), entries=Count('id'))
+                .order_by('production_ring_id', 'shkey'))
@@ -0,0 +1,287 @@
+from django.db import models, transaction
+
+import logging
+import prod_actual.models as m
+
+from common.functions.constants import BULK_BATCH_SIZE
+from prod_actual.api.functions.bogging_ledger import BoggingLedger
+from common.signals import bulk_write, production_data_changed
+from decimal import Decimal
+
+
+class DupeReconciler(object):
+    """
+    Applies the rows of a dupe file to ProductionRing in bulk.
+
+    Rows are planned one at a time with add(), then apply() loads every ring
+    on the file's levels in one query, diffs the fields in memory and writes
+    the rings, missing RingStateChange rows and BoggedTonnes with bulk
+    operations. If a batch write fails the plans are retried one ring at a
+    time, so a bad row is reported on its own like it was before.
+
+    The per row signal receivers are skipped, apply() sends one
+    production_data_changed with the rings it wrote.
+    """
+    # Shifts a ring can be moved off, the reports of the old one are stale
+    SHIFT_FIELDS = ['drill_complete_shift', 'charge_shift', 'fired_shift', 'bog_complete_shift']
+
+    def __init__(self, ring_states, dupe_shkey, batch_size=BULK_BATCH_SIZE):
+        self.logger = logging.getLogger(__name__)
+        self.ring_states = ring_states
+        self.dupe_shkey = dupe_shkey
+        self.batch_size = batch_size
+
+        self.plans = {}
+        self.rings_created = 0
+        self.rings_updated = 0
+        self.rings_unchanged = 0
+        self.states_created = 0
+        # rings whose bogging comes from Pitram
+        self.bogging_skipped = 0
+        self.errors = []
+        # ProductionRing ids written and the shifts they were moved off
+        self.touched = set()
+        self.old_shkeys = set()
+
+    def add(self, row_label, key, values, states, tonnes):
+        """
+        row_label: how to refer to the row in error messages
+        key: (level, oredrive, ring_number_txt)
+        values: ProductionRing field values for the row
+        states: [(pri_state, shkey, RingStateChange field values), ...]
+        tonnes: total bogged tonnes for the ring, 0 for none
+
+        A ring repeated in the file keeps the last row's values and tonnes
+        and the state changes of every row, as the row by row import did.
+        """
+        key = self.ring_key(*key)
+        plan = self.plans.get(key)
+        if plan is None:
+            plan = {'key': key, 'rows': [], 'states': {}, 'tonnes': 0}
+            self.plans[key] = plan
+
+        plan['rows'].append(row_label)
+        plan['values'] = values
+        for pri_state, shkey, extra in states:
+            plan['states'].setdefault((pri_state, shkey), extra)
+        if tonnes > 0:
+            plan['tonnes'] = tonnes
+
+    def apply(self):
+        plans = list(self.plans.values())
+        if not plans:
+            return
+        with bulk_write():
+            try:
+                with transaction.atomic():
+                    self.apply_plans(plans)
+            except Exception as e:
+                self.logger.warning(
+                    f"Batch write failed ({e}), retrying ring by ring")
+                # Read again after the rollback, the failed batch changed
+                # the rings it loaded. Each plan has its own ring, so one
+                # load does for every retry.
+                rings = self.load_rings(self.levels(plans))
+                for plan in plans:
+                    try:
+                        with transaction.atomic():
+                            self.apply_plans([plan], rings)
+                    except Exception as e:
+                        self.logger.error(f"Error processing row: {e}")
+                        self.logger.error(f"Row: {plan['rows'][-1]}")
+                        self.errors.append(str(e))
+
+        if self.touched:
+            production_data_changed.send(
+                sender=m.ProductionRing, location_ids=sorted(self.touched),
+                shkeys=self.old_shkeys)
+
+    def apply_plans(self, plans, rings=None):
+        """
+        rings: the load_rings() of the plans' levels, loaded here if not given
+        """
+        counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'states': 0}
+        if rings is None:
+            rings = self.load_rings(self.levels(plans))
+        old_shkeys = set()
+
+        to_create = []
+        to_update = []
+        changed_fields = set()
+        for plan in plans:
+            matches = rings.get(plan['key'], [])
+            if len(matches) > 1:
+                raise m.ProductionRing.MultipleObjectsReturned(
+                    f"{len(matches)} rings match {plan['key']}")
+            if matches:
+                ring = matches[0]
+                shifts = [getattr(ring, name) for name in self.SHIFT_FIELDS]
+                changed = self.diff_ring(ring, plan['values'])
+                if changed:
+                    old_shkeys.update(shkey for name, shkey in zip(self.SHIFT_FIELDS, shifts)
+                                      if name in changed)
+                    changed_fields.update(changed)
+                    to_update.append(ring)
+                    counts['updated'] += 1
+                else:
+                    counts['unchanged'] += 1
+            else:
+                ring = m.ProductionRing(
+                    level=plan['key'][0],
+                    oredrive=plan['key'][1],
+                    ring_number_txt=plan['key'][2],
+                )
+                self.diff_ring(ring, plan['values'])
+                to_create.append(ring)
+                counts['created'] += 1
+            plan['ring'] = ring
+
+        m.ProductionRing.objects.bulk_create(
+            to_create, batch_size=self.batch_size)
+        if to_update:
+            m.ProductionRing.objects.bulk_update(
+                to_update, sorted(changed_fields), batch_size=self.batch_size)
+
+        if any(ring.pk is None for ring in to_create):
+            # Backends that can't return ids from a bulk insert
+            numbers = set(ring.ring_number_txt for ring in to_create)
+            reloaded = self.load_rings(set(ring.level for ring in to_create),
+                                       None if None in numbers else numbers)
+            for plan in plans:
+                if plan['ring'].pk is None:
+                    plan['ring'] = reloaded[plan['key']][0]
+
+        state_rings = self.write_state_changes(plans)
+        counts['states'] = len(state_rings)
+        bogged_rings, bogged_shkeys = self.write_bogged_tonnes(plans)
+
+        # Only count once the whole batch has been written
+        self.rings_created += counts['created']
+        self.rings_updated += counts['updated']
+        self.rings_unchanged += counts['unchanged']
+        self.states_created += counts['states']
+        self.touched.update(ring.pk for ring in to_create + to_update)
+        self.touched.update(state_rings + bogged_rings)
+        self.old_shkeys.update(old_shkeys | bogged_shkeys)
+
+    def levels(self, plans):
+        return set(plan['key'][0] for plan in plans)
+
+    def load_rings(self, levels, ring_numbers=None):
+        """
+        {key: [ProductionRing, ...]} of the rings on the levels, only those
+        numbered ring_numbers when given
+        """
+        queryset = m.ProductionRing.objects.filter(level__in=levels)
+        if ring_numbers is None:
+            found = list(queryset)
+        else:
+            ring_numbers = sorted(ring_numbers)
+            found = []
+            for i in range(0, len(ring_numbers), self.batch_size):
+                found.extend(queryset.filter(
+                    ring_number_txt__in=ring_numbers[i:i + self.batch_size]))
+
+        rings = {}
+        for ring in found:
+            key = self.ring_key(ring.level, ring.oredrive, ring.ring_number_txt)
+            rings.setdefault(key, []).append(ring)
+        return rings
+
+    def diff_ring(self, ring, values):
+        """
+        Sets the new values on the ring and returns the names of the fields
+        that differ from what it held, at the precision the database keeps.
+        """
+        changed = []
+        for name, value in values.items():
+            field = m.ProductionRing._meta.get_field(name)
+            new = field.to_python(value)
+            if not self.same_value(field, getattr(ring, name), new):
+                setattr(ring, name, new)
+                changed.append(name)
+        return changed
+
+    def same_value(self, field, old, new):
+        if old is None or new is None:
+            return old is None and new is None
+        if isinstance(field, models.DecimalField):
+            exp = Decimal(1).scaleb(-field.decimal_places)
+            return Decimal(old).quantize(exp) == Decimal(new).quantize(exp)
+        return old == new
+
+    def write_state_changes(self, plans):
+        """
+        Creates the state changes the file implies that are not on the
+        ring yet, matched on ring, state and shift. Returns the ring id of
+        each change.
+        """
+        ring_ids = [plan['ring'].pk for plan in plans if plan['states']]
+        existing = set()
+        for i in range(0, len(ring_ids), self.batch_size):
+            existing.update(m.RingStateChange.objects.filter(
+                prod_ring_id__in=ring_ids[i:i + self.batch_size],
+                is_active=True,
+            ).values_list('prod_ring_id', 'state_id', 'shkey'))
+
+        changes = []
+        for plan in plans:
+            for (pri_state, shkey), extra in plan['states'].items():
+                state = self.ring_states.get(pri_state)
+                if (plan['ring'].pk, state.pk, shkey) in existing:
+                    continue
+                changes.append(m.RingStateChange(
+                    prod_ring=plan['ring'],
+                    state=state,
+                    shkey=shkey,
+                    **extra
+                ))
+
+        m.RingStateChange.objects.bulk_create(
+            changes, batch_size=self.batch_size)
+        return [change.prod_ring_id for change in changes]
+
+    def write_bogged_tonnes(self, plans):
+        """
+        The dupe holds the total bogged tonnes, so it replaces every entry
+        recorded against the ring, manual ones included, and the ring's
+        totals with it. Rings with Pitram bogging are left alone, manual
+        entries and all, PitramBoggingSync keeps their total. Returns the
+        rings and the shifts of the entries replaced.
+        """
+        bogged = [plan for plan in plans if plan['tonnes'] > 0]
+        synced = set()
+        candidates = [plan['ring'].pk for plan in bogged]
+        for i in range(0, len(candidates), self.batch_size):
+            synced.update(m.BoggedTonnes.objects.filter(
+                source='pitram', production_ring_id__in=candidates[i:i + self.batch_size]
+            ).values_list('production_ring_id', flat=True).distinct())
+        bogged = [plan for plan in bogged if plan['ring'].pk not in synced]
+        self.bogging_skipped += len(synced)
+        ring_ids = [plan['ring'].pk for plan in bogged]
+        old_shkeys = set()
+        for i in range(0, len(ring_ids), self.batch_size):
+            entries = m.BoggedTonnes.objects.filter(
+                production_ring_id__in=ring_ids[i:i + self.batch_size])
+            old_shkeys.update(entries.values_list('shkey', flat=True).distinct())
+            entries.delete()
+
+        m.BoggedTonnes.objects.bulk_create([
+            m.BoggedTonnes(
+                production_ring=plan['ring'],
+                bogged_tonnes=plan['tonnes'],
+                shkey=self.dupe_shkey,
+                entered_by=None,
+                source='dupe'
+            ) for plan in bogged
+        ], batch_size=self.batch_size)
+        BoggingLedger(self.batch_size).rebuild(ring_ids)
+        return ring_ids, old_shkeys
+
+    def ring_key(self, level, oredrive, ring_number_txt):
+        # Keys are compared the way the database stores them
+        return (
+            int(level),
+            str(oredrive),
+            None if ring_number_txt is None else str(ring_number_txt),
+        )
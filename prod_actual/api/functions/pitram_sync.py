@@ -0,0 +1,162 @@
+from datetime import datetime
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+import logging
+import prod_actual.models as m
+
+from common.functions.common_methods import CommonMethods
+from common.functions.constants import BULK_BATCH_SIZE
+from common.functions.pitram import Pitram
+from common.signals import bulk_write, production_data_changed
+from prod_actual.api.functions.bogging_ledger import BoggingLedger
+
+
+class PitramBoggingSync(object):
+    """
+    Brings the bogging recorded in Pitram into BoggedTonnes, starting from
+    where the last run finished (SyncWatermark 'pitram_bogging').
+
+    Each Pitram record becomes one BoggedTonnes entry with source 'pitram'
+    and source_ref its record id, so a record read twice updates its entry
+    instead of adding another. The ring is found by its alias. Once a
+    ring has Pitram bogging, the ring's dupe entries are removed and later
+    dupe uploads leave its bogging alone (DupeReconciler.write_bogged_tonnes).
+
+    The sync never touches manual entries. A ring's total is the sum of
+    all its entries (BoggingLedger), so a ring with both manual and Pitram
+    entries totals the two, the Pitram tonnes on top of the manual ones.
+    Only a dupe upload removes manual entries, and only from rings without
+    Pitram bogging.
+
+    The query is the project setting 'pitram_bogging_query' when there is
+    one. It takes the watermark timestamp as its only parameter and has to
+    return record_id, alias, shkey, tonnes and updated_at, oldest first.
+    Records at the watermark itself are read again, a later record with
+    the same timestamp is not missed that way.
+
+    Every batch is written, the ring totals rebuilt and the watermark moved
+    in one transaction, an interrupted run carries on from the last batch.
+    """
+    NAME = 'pitram_bogging'
+    DEFAULT_QUERY = (
+        "SELECT record_id, alias, shkey, tonnes, updated_at FROM bogging "
+        "WHERE updated_at >= %s ORDER BY updated_at, record_id"
+    )
+    # first run, everything Pitram has
+    START = datetime(2000, 1, 1)
+
+    def __init__(self, batch_size=BULK_BATCH_SIZE):
+        self.logger = logging.getLogger(__name__)
+        self.batch_size = batch_size
+        self.job = None
+        self.rows_processed = 0
+        self.entries_created = 0
+        self.entries_updated = 0
+        self.rows_skipped = 0
+        self.dupe_entries_removed = 0
+        self.unknown_aliases = set()
+
+    def run(self):
+        query = CommonMethods().get_setting('pitram_bogging_query') or self.DEFAULT_QUERY
+        watermark, _ = m.SyncWatermark.objects.get_or_create(name=self.NAME)
+        since = self.START
+        if watermark.timestamp:
+            # Pitram keeps site time without a zone
+            since = timezone.make_naive(watermark.timestamp)
+
+        pitram = Pitram(fetch_size=self.batch_size)
+        for columns, rows in pitram.iter_batches(query, [since]):
+            self.apply_batch([dict(zip(columns, row)) for row in rows], watermark)
+            if self.job:
+                self.job.snapshot(self, 'syncing', created=self.entries_created,
+                                  updated=self.entries_updated, skipped=self.rows_skipped)
+
+        if self.unknown_aliases:
+            self.logger.warning(
+                f"Pitram bogging for unknown rings: {', '.join(sorted(self.unknown_aliases)[:20])}")
+
+        body = (f'Pitram bogging synced, {self.entries_created} created, '
+                f'{self.entries_updated} updated, {self.rows_skipped} skipped, '
+                f'{self.dupe_entries_removed} dupe entries replaced')
+        return {'msg': {'body': body, 'type': 'success'}}
+
+    def apply_batch(self, records, watermark):
+        self.rows_processed += len(records)
+
+        aliases = set(str(r['alias']) for r in records if r['alias'])
+        rings = dict(m.ProductionRing.objects.filter(
+            is_active=True, alias__in=aliases).values_list('alias', 'location_id'))
+        existing = {e.source_ref: e for e in m.BoggedTonnes.objects.filter(
+            source='pitram', source_ref__in=[str(r['record_id']) for r in records])}
+
+        new_entries = []
+        changed_entries = {}
+        ring_ids = set()
+        old_shkeys = set()
+        for record in records:
+            ring_id = rings.get(str(record['alias']))
+            if not ring_id or not record['shkey']:
+                self.rows_skipped += 1
+                if record['alias'] and not ring_id:
+                    self.unknown_aliases.add(str(record['alias']))
+                continue
+
+            ref = str(record['record_id'])
+            tonnes = Decimal(str(round(float(record['tonnes'] or 0), 1)))
+            entry = existing.get(ref)
+            if entry is None:
+                entry = m.BoggedTonnes(production_ring_id=ring_id, shkey=str(record['shkey']),
+                                       bogged_tonnes=tonnes, source='pitram', source_ref=ref)
+                existing[ref] = entry
+                new_entries.append(entry)
+            elif (entry.production_ring_id, entry.shkey, entry.bogged_tonnes) != (ring_id, str(record['shkey']), tonnes):
+                # a ring moved from keeps the tonnes until it is rebuilt too
+                ring_ids.add(entry.production_ring_id)
+                old_shkeys.add(entry.shkey)
+                entry.production_ring_id = ring_id
+                entry.shkey = str(record['shkey'])
+                entry.bogged_tonnes = tonnes
+                if entry.pk:
+                    changed_entries[entry.pk] = entry
+            else:
+                continue
+            ring_ids.add(ring_id)
+
+        last = records[-1]
+        removed = 0
+        with transaction.atomic(), bulk_write():
+            if ring_ids:
+                # The dupe's totals of these rings would count their Pitram bogging twice
+                dupe_entries = m.BoggedTonnes.objects.filter(
+                    source='dupe', production_ring_id__in=list(ring_ids))
+                old_shkeys.update(dupe_entries.values_list('shkey', flat=True).distinct())
+                removed = dupe_entries.delete()[0]
+
+            m.BoggedTonnes.objects.bulk_create(new_entries, batch_size=self.batch_size)
+            m.BoggedTonnes.objects.bulk_update(
+                list(changed_entries.values()), ['production_ring', 'shkey', 'bogged_tonnes'],
+                batch_size=self.batch_size)
+            if ring_ids:
+                BoggingLedger(self.batch_size).rebuild(list(ring_ids))
+                production_data_changed.send(sender=m.BoggedTonnes, location_ids=list(ring_ids),
+                                             shkeys=old_shkeys)
+
+            watermark.timestamp = self.aware(last['updated_at'])
+            watermark.shkey = str(last['shkey']) if last['shkey'] else watermark.shkey
+            watermark.records += len(new_entries) + len(changed_entries)
+            watermark.save()
+
+        self.entries_created += len(new_entries)
+        self.entries_updated += len(changed_entries)
+        self.dupe_entries_removed += removed
+
+    def aware(self, value):
+        # Drivers without a datetime type hand the timestamp back as text
+        if isinstance(value, str):
+            value = parse_datetime(value)
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+import prod_actual.models as m
+import threading
+import time
+
+from common.functions.constants import MANDATORY_RING_STATES
+
+
+class RingStateRegistry():
+    '''
+    The RingState rows as (pri_state, sec_state) -> id, read once per
+    process and kept until a RingState add or delete bumps
+    RingStateVersion (prod_actual.signals). The mandatory states are
+    created after every migrate and, for a database that lacks them, on
+    the first load.
+
+    The version is compared, one small query, the first time states are
+    read in a request (see prod_actual.middleware) and otherwise every
+    RING_STATES_MAX_AGE seconds, so other processes' adds and deletes are
+    seen too. Reads in between cost no queries.
+
+    get() hands back a RingState with just its key fields set, enough to
+    be the state of a RingStateChange without a query.
+    '''
+
+    def __init__(self):
+        self.states = None
+        self.version = None
+        self.checked_at = 0.0
+        self.stale = False
+        self.lock = threading.Lock()
+
+    @property
+    def max_age(self):
+        return getattr(settings, 'RING_STATES_MAX_AGE', 5)
+
+    def current(self):
+        states = self.states
+        if states is not None and not self.stale and \
+                time.monotonic() - self.checked_at < self.max_age:
+            return states
+
+        with self.lock:
+            states = self.states
+            if states is None or self.stale or time.monotonic() - self.checked_at >= self.max_age:
+                version = self.db_version()
+                if states is None or self.version != version:
+                    # The version is read first, a change in between only
+                    # means another load next time
+                    states, created = self.load()
+                    # States created in a transaction that may yet roll
+                    # back are only kept for this call
+                    if created and transaction.get_connection().in_atomic_block:
+                        return states
+                    self.states, self.version = states, version
+                self.checked_at = time.monotonic()
+                self.stale = False
+        return states
+
+    def db_version(self):
+        return m.RingStateVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+    def bump_version(self):
+        # In the transaction of the write, other processes see it on commit
+        if not m.RingStateVersion.objects.filter(pk=1).update(version=F('version') + 1):
+            m.RingStateVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+
+    def mark_stale(self):
+        # Compare the version before the next read
+        self.stale = True
+
+    def load(self):
+        states = {(pri, sec): pk for pk, pri, sec in
+                  m.RingState.objects.values_list('id', 'pri_state', 'sec_state')}
+        missing = [state for state in MANDATORY_RING_STATES
+                   if (state['pri_state'], state.get('sec_state')) not in states]
+        for state in missing:
+            obj, _ = m.RingState.objects.get_or_create(
+                pri_state=state['pri_state'], sec_state=state.get('sec_state'))
+            states[(obj.pri_state, obj.sec_state)] = obj.pk
+        return states, bool(missing)
+
+    def seed(self):
+        # Loading creates any mandatory state that is missing
+        self.clear()
+        self.current()
+
+    def clear(self):
+        self.states = None
+
+    def id_of(self, pri_state, sec_state=None):
+        # A state another process added shows once the version is checked
+        return self.current().get((pri_state, sec_state or None))
+
+    def get(self, pri_state, sec_state=None):
+        pk = self.id_of(pri_state, sec_state)
+        if pk is None:
+            return None
+        return m.RingState(id=pk, pri_state=pri_state, sec_state=sec_state or None)
+
+    def primaries(self):
+        # {pri_state: RingState} of the states without a condition
+        return {pri: m.RingState(id=pk, pri_state=pri, sec_state=None)
+                for (pri, sec), pk in self.current().items() if sec is None}
+
+    def conditions(self, pri_state):
+        # [{'id', 'sec_state'}, ...] of the states' secondary conditions
+        return sorted(({'id': pk, 'sec_state': sec}
+                       for (pri, sec), pk in self.current().items()
+                       if pri == pri_state and sec is not None),
+                      key=lambda state: state['sec_state'])
+
+
+ring_states = RingStateRegistry()
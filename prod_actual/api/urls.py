@@ -35,6 +35,8 @@ urlpatterns = [
          bdcf.GroupRingSelection.as_view(), name='bdcf-group-rings'),
     path('bdcf/groups/rings-aggregate/',
          bdcf.GroupAggregate.as_view(), name='bdcf-group-rings'),
+    path('bdcf/pitram-sync/',
+         bdcf.PitramBoggingSyncView.as_view(), name='bdcf-pitram-sync'),
     path('bdcf/status-rollback/<int:location_id>/',
          bdcf.StatusRollbackView.as_view(), name='status-rollback'),
     path('bdcf/unfire/<int:location_id>/',
@@ -2,7 +2,7 @@ from django.shortcuts import get_object_or_404, render
 from django.core.serializers.json import DjangoJSONEncoder
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import DatabaseError, IntegrityError, transaction
-from django.db.models import Sum, F, Value, CharField
+from django.db.models import Sum, F, Value, CharField, Prefetch
 from django.db.models.functions import Concat, Cast
 
 from rest_framework import generics, status
@@ -10,10 +10,14 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 
 from common.functions.common_methods import CommonMethods
+from common.functions.constants import BULK_BATCH_SIZE
+from common.functions.jobs import enqueue_job, queued_response
 from common.functions.shkey import Shkey
-from prod_actual.api.views.ring_state import ConditionsAndStates
-from prod_actual.api.views.drill_blast import ProdOrphans
+from prod_actual.api.functions.ring_states import ring_states
+from prod_actual.api.functions.bogging_ledger import BoggingLedger
 from common.functions.status import Status
+from common.signals import production_data_changed
+from prod_actual import tasks
 
 from datetime import timedelta, date, datetime
 
@@ -27,6 +31,12 @@ import math
 import random
 
 
+def synced_entry_response():
+    # The next sync would put a changed Pitram entry back, it is corrected in Pitram
+    return Response({'msg': {'body': 'Entry is synced from Pitram, correct it there', 'type': 'error'}},
+                    status=status.HTTP_409_CONFLICT)
+
+
 class BoggingRingsView(APIView):
     def get(self, request, *args, **kwargs):
         bdcf = BDCFRings()
@@ -49,8 +59,12 @@ class BoggingMovementsView(APIView):
         pk = location_id
         try:
             # Delete the record by its ID (pk)
-            bogging_movement = m.BoggedTonnes.objects.get(pk=pk)
-            bogging_movement.delete()
+            with transaction.atomic():
+                bogging_movement = m.BoggedTonnes.objects.select_for_update().get(pk=pk)
+                if bogging_movement.source == 'pitram':
+                    return synced_entry_response()
+                bogging_movement.delete()
+                BoggingLedger().removed(bogging_movement)
 
             return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -60,12 +74,18 @@ class BoggingMovementsView(APIView):
     def put(self, request, location_id, *args, **kwargs):
         pk = location_id
         try:
-            bogging_movement = m.BoggedTonnes.objects.get(pk=pk)
-
-            # Update the 'tonnes' field
-            bogging_movement.bogged_tonnes = request.data.get('tonnes')
-            bogging_movement.entered_by = request.user
-            bogging_movement.save()
+            with transaction.atomic():
+                bogging_movement = m.BoggedTonnes.objects.select_for_update().get(pk=pk)
+                if bogging_movement.source == 'pitram':
+                    return synced_entry_response()
+                before = (bogging_movement.production_ring_id,
+                          bogging_movement.shkey, bogging_movement.bogged_tonnes)
+
+                # Update the 'tonnes' field
+                bogging_movement.bogged_tonnes = request.data.get('tonnes')
+                bogging_movement.entered_by = request.user
+                bogging_movement.save()
+                BoggingLedger().changed(before, bogging_movement)
 
             return Response({'msg': {'body': 'Record updated successfully', 'type': 'success'}}, status=status.HTTP_200_OK)
 
@@ -73,6 +93,12 @@ class BoggingMovementsView(APIView):
             return Response({'msg': {'body': 'Record not found', 'type': 'error'}}, status=status.HTTP_404_NOT_FOUND)
 
 
+class PitramBoggingSyncView(APIView):
+    def post(self, request, *args, **kwargs):
+        job = enqueue_job(tasks.sync_pitram_bogging, 'pitram bogging sync', user=request.user)
+        return Response(queued_response(job, 'Pitram bogging sync queued'), status=status.HTTP_202_ACCEPTED)
+
+
 class ConditionsListView(APIView):
     def get(self, request, stat, *args, **kwargs):
         bdcf = BDCFRings()
@@ -117,8 +143,6 @@ class ChargeEntryView(APIView):
         return Response(data, status=status.HTTP_200_OK)
 
     def post(self, request, *args, **kwargs):
-        cas = ConditionsAndStates()
-        cas.ensure_mandatory_ring_states()
         bdcf = BDCFRings()
         return bdcf.charge_drilled_ring(request)
 
@@ -286,36 +310,19 @@ class BDCFRings():
         return dropdown_options
 
     def get_bogging_movements(self, location_id):
-        stats = {}
         # Filter BoggedTonnes by ProductionRing location_id
         bogged_entries = m.BoggedTonnes.objects.filter(
-            production_ring__location_id=location_id)
+            production_ring__location_id=location_id).select_related('entered_by')
 
         prod_ring = m.ProductionRing.objects.filter(
-            is_active=True, location_id=location_id).first()
+            is_active=True, location_id=location_id).select_related('concept_ring').first()
         if prod_ring:
-            stats['in_overdraw_zone'] = prod_ring.in_overdraw_zone
-            stats['fired_shift'] = prod_ring.fired_shift
-            stats['designed_tonnes'] = prod_ring.designed_tonnes
-            stats['draw_percentage'] = prod_ring.draw_percentage
-            stats['overdraw_amount'] = prod_ring.overdraw_amount
-            stats['draw_deviation'] = prod_ring.draw_deviation
-            stats['in_flow'] = prod_ring.in_flow
-            stats['comment'] = prod_ring.comment
-            summed = (prod_ring.designed_tonnes * prod_ring.draw_percentage/100) + \
-                prod_ring.draw_deviation + prod_ring.overdraw_amount
-            if prod_ring.concept_ring:
-                stats['flow_tonnes'] = prod_ring.concept_ring.pgca_modelled_tonnes
-            else:
-                stats['flow_tonnes'] = 0
-                self.msg = {
-                    'body': f'{prod_ring.alias} is an orphaned ring', 'type': 'warning'}
-
-        total_tonnes = sum(entry.bogged_tonnes for entry in bogged_entries)
-        stats['bogged_tonnes'] = total_tonnes
-        stats['remaining'] = round((summed - total_tonnes), 0)
-
-        self.update_prodring_bogged_tonnes(location_id, total_tonnes)
+            stats = self.get_bogging_stats(prod_ring)
+        else:
+            stats = {
+                'bogged_tonnes': sum(entry.bogged_tonnes for entry in bogged_entries),
+                'remaining': None,
+            }
 
         # Serialize the data as needed
         data = [
@@ -324,6 +331,7 @@ class BDCFRings():
                 "tonnes": entry.bogged_tonnes,
                 "date": Shkey.format_shkey_day_first(entry.shkey),
                 "timestamp": entry.datetime_stamp,
+                "source": entry.source,
                 "contributor": {
                     "full_name": entry.entered_by.get_full_name() if entry.entered_by else "Anonymous User",
                     "avatar": entry.entered_by.avatar,  # can be None; frontend handles fallback
@@ -335,16 +343,32 @@ class BDCFRings():
 
         return {'data': data, 'stats': stats}
 
-    def update_prodring_bogged_tonnes(self, location_id, bogged_tonnes):
-        try:
-            production_ring = m.ProductionRing.objects.get(
-                location_id=location_id)
-            production_ring.bogged_tonnes = bogged_tonnes
-            production_ring.save(update_fields=["bogged_tonnes"])
-            return True  # Return True to indicate success
-        except m.ProductionRing.DoesNotExist:
-            self.error_msg = "Could not update bogged tonnes for prod ring"
-            return False  # Return False if the production ring is not found
+    def get_bogging_stats(self, prod_ring):
+        '''
+        Tonnes of a ring for the bogging screens. Read only, the bogged
+        total is kept on the ring by BoggingLedger when entries change.
+        '''
+        stats = {}
+        stats['in_overdraw_zone'] = prod_ring.in_overdraw_zone
+        stats['fired_shift'] = prod_ring.fired_shift
+        stats['designed_tonnes'] = prod_ring.designed_tonnes
+        stats['draw_percentage'] = prod_ring.draw_percentage
+        stats['overdraw_amount'] = prod_ring.overdraw_amount
+        stats['draw_deviation'] = prod_ring.draw_deviation
+        stats['in_flow'] = prod_ring.in_flow
+        stats['comment'] = prod_ring.comment
+        summed = (prod_ring.designed_tonnes * prod_ring.draw_percentage/100) + \
+            prod_ring.draw_deviation + prod_ring.overdraw_amount
+        if prod_ring.concept_ring:
+            stats['flow_tonnes'] = prod_ring.concept_ring.pgca_modelled_tonnes
+        else:
+            stats['flow_tonnes'] = 0
+            self.msg = {
+                'body': f'{prod_ring.alias} is an orphaned ring', 'type': 'warning'}
+
+        stats['bogged_tonnes'] = prod_ring.bogged_tonnes
+        stats['remaining'] = round((summed - prod_ring.bogged_tonnes), 0)
+        return stats
 
     def add_bogging_movement(self, request, location_id):
         form_data = request.data
@@ -364,13 +388,15 @@ class BDCFRings():
                 location_id=location_id)
             shkey = Shkey.generate_shkey(mydate, shift)
 
-            # Create the BoggedTonnes entry
-            m.BoggedTonnes.objects.create(
-                production_ring=production_ring,
-                bogged_tonnes=tonnes,
-                shkey=shkey,
-                entered_by=request.user  # Assuming user is authenticated
-            )
+            # Create the BoggedTonnes entry and add it to the totals
+            with transaction.atomic():
+                entry = m.BoggedTonnes.objects.create(
+                    production_ring=production_ring,
+                    bogged_tonnes=tonnes,
+                    shkey=shkey,
+                    entered_by=request.user  # Assuming user is authenticated
+                )
+                BoggingLedger().added(entry)
             return {'type': 'success', 'body': 'Bogging movement added successfully'}, status.HTTP_201_CREATED
 
         except ObjectDoesNotExist:
@@ -601,13 +627,7 @@ class BDCFRings():
         pass
 
     def get_state_list(self, status):
-        states = (
-            m.RingState.objects.filter(pri_state=status)
-            .exclude(sec_state__isnull=True)
-            .order_by('sec_state')
-            .values('id', 'sec_state')
-        )
-        return list(states)
+        return ring_states.conditions(status)
 
     def get_current_conditions(self, ring, status):
         '''
@@ -650,8 +670,6 @@ class BDCFRings():
         For empty conditions list, pri_state = status, sec_state = None.
         '''
         sk = Shkey()
-        cas = ConditionsAndStates()
-        cas.ensure_mandatory_ring_states()
 
         data = request.data
         d = data.get('date')
@@ -681,8 +699,7 @@ class BDCFRings():
         # Handle default state creation for empty conditions
         if not conditions:
             # Find the default RingState (sec_state=None)
-            ring_state = m.RingState.objects.filter(
-                pri_state=status, sec_state=None).first()
+            ring_state = ring_states.get(status)
             if not ring_state:
                 return Response(
                     {'msg': {'type': 'error', 'body': "Default RingState not found"}},
@@ -706,8 +723,7 @@ class BDCFRings():
         # Iterate through conditions and create RingStateChange entries
         for condition in conditions:
             # Find the corresponding RingState
-            ring_state = m.RingState.objects.filter(
-                pri_state=status, sec_state=condition).first()
+            ring_state = ring_states.get(status, condition)
             if not ring_state:
                 return Response(
                     {'msg': {
@@ -793,9 +809,7 @@ class BDCFRings():
             ).update(is_active=False, deactivated_by=request.user)
 
             # Get new state
-            ring_state_obj = m.RingState.objects.filter(
-                pri_state=ring.status, sec_state=None
-            ).first()
+            ring_state_obj = ring_states.get(ring.status)
 
             if not ring_state_obj:
                 return {'msg': {'type': 'error', 'body': 'No matching RingState found'}}
@@ -1180,6 +1194,8 @@ class BDCFRings():
         # Bulk update rings to deactivate in one query
         m.ProductionRing.objects.filter(
             location_id__in=location_ids).update(is_active=False)
+        production_data_changed.send(
+            sender=m.ProductionRing, location_ids=location_ids)
 
     def get_existing_groups(self, request):
         groups = []
@@ -1313,9 +1329,6 @@ class BDCFRings():
 
         try:
             with transaction.atomic():
-                cas = ConditionsAndStates()
-                cas.ensure_mandatory_ring_states()
-
                 # Get ring(s) being replaced
                 completed = m.ProductionRing.objects.filter(
                     is_active=True, status='Bogging', oredrive=oredrive
@@ -1335,8 +1348,7 @@ class BDCFRings():
                 firing.save()
 
                 # Get the 'Bogging' state
-                bogging_state = m.RingState.objects.get(
-                    pri_state='Bogging', sec_state=None)
+                bogging_state = ring_states.get('Bogging')
 
                 # Create a state change entry
                 m.RingStateChange.objects.create(
@@ -1352,8 +1364,6 @@ class BDCFRings():
 
         except m.ProductionRing.DoesNotExist:
             return {'msg': {'body': 'Error: Production ring not found', 'type': 'error'}}
-        except m.RingState.DoesNotExist:
-            return {'msg': {'body': 'Error: Bogging state not found', 'type': 'error'}}
         except Exception as e:
             return {'msg': {'body': f'Unexpected error: {str(e)}', 'type': 'error'}}
 
@@ -1384,6 +1394,8 @@ class BDCFRings():
                 if replacing:
                     m.ProductionRing.objects.filter(is_active=True,
                                                     location_id__in=replacing).update(status='Bogging', bog_complete_shift=None)
+                    production_data_changed.send(
+                        sender=m.ProductionRing, location_ids=replacing)
 
                 # Deactivate the primary fired ring
                 fired_ring = ring_state_change.prod_ring
@@ -1399,49 +1411,61 @@ class BDCFRings():
             return {'msg': {'body': f'Unexpected error: {str(e)}', 'type': 'error'}}
 
     def get_fired_ring_detail(self, fired_rings):
+        # Rings and their firing in a fixed number of queries per chunk
+        firings = Prefetch(
+            'ringstatechange_set',
+            queryset=m.RingStateChange.objects.filter(
+                is_active=True,
+                state__pri_state='Bogging',
+                state__sec_state=None
+            ).select_related('user').order_by('-created_at', '-ring_state_id'),
+            to_attr='firings')
+
+        location_ids = [fr['location_id'] for fr in fired_rings]
+        prod_rings = {}
+        for i in range(0, len(location_ids), BULK_BATCH_SIZE):
+            prod_rings.update((ring.location_id, ring) for ring in m.ProductionRing.objects.filter(
+                location_id__in=location_ids[i:i + BULK_BATCH_SIZE]
+            ).select_related('concept_ring').prefetch_related(firings))
+
         rings = []
         for fr in fired_rings:
             fr_copy = fr.copy()  # Prevent modifying original data
-            location_id = fr_copy['location_id']
-            movements = self.get_bogging_movements(location_id)
-            fr_copy['remaining'] = movements['stats']['remaining']
-
-            try:
-                rsc = m.RingStateChange.objects.filter(
-                    is_active=True,
-                    prod_ring__location_id=location_id,
-                    state__pri_state='Bogging',
-                    state__sec_state=None
-                ).first()
-
-                if rsc and rsc.user:
-                    fr_copy['contributor'] = {
-                        "full_name": rsc.user.get_full_name() if rsc.user else "Anonymous User",
-                        "avatar": rsc.user.avatar,
-                        "initials": rsc.user.initials if rsc.user else None,
-                    }
-
-                else:
-                    fr_copy['contributor'] = None
-
-            except (AttributeError, m.RingStateChange.DoesNotExist) as e:
-                # Log the error instead of returning False
-                self.custom_logger.error(
-                    f"Error in get_fired_ring_detail: {e}")
-                return []
+            prod_ring = prod_rings.get(fr_copy['location_id'])
+            fr_copy['remaining'] = self.get_bogging_stats(
+                prod_ring)['remaining'] if prod_ring and prod_ring.is_active else None
+
+            # the latest active firing
+            rsc = prod_ring.firings[0] if prod_ring and prod_ring.firings else None
+            if rsc and rsc.user:
+                fr_copy['contributor'] = {
+                    "full_name": rsc.user.get_full_name() if rsc.user else "Anonymous User",
+                    "avatar": rsc.user.avatar,
+                    "initials": rsc.user.initials if rsc.user else None,
+                }
+            else:
+                fr_copy['contributor'] = None
 
             rings.append(fr_copy)
 
         return rings
 
     def add_orphan_status(self, charged):
-        # True or False
-        po = ProdOrphans()
+        # True or False, as ProdOrphans.is_orphan has it, for all the rings at once
+        location_ids = [entry["location_id"] for entry in charged
+                        if entry.get("location_id") is not None]
+        orphans = set()
+        for i in range(0, len(location_ids), BULK_BATCH_SIZE):
+            orphans.update(m.ProductionRing.objects.filter(
+                is_active=True,
+                concept_ring__isnull=True,
+                location_id__in=location_ids[i:i + BULK_BATCH_SIZE]
+            ).values_list('location_id', flat=True))
 
         for entry in charged:
             location_id = entry.get("location_id")
             if location_id is not None:
-                entry["orphaned"] = po.is_orphan(location_id)
+                entry["orphaned"] = location_id in orphans
 
         return charged
 
@@ -1499,4 +1523,8 @@ class BDCFRings():
             state__pri_state=pri_state,
             state__sec_state__in=list(sec_states)
         )
-        return qs.update(is_active=False, deactivated_by=user, operation_complete=True)
+        removed = qs.update(is_active=False, deactivated_by=user, operation_complete=True)
+        if removed:
+            production_data_changed.send(
+                sender=m.ProductionRing, location_ids=[location_id])
+        return removed
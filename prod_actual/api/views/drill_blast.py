@@ -11,8 +11,10 @@ import csv
 import io
 import json
 
-from settings.models import ProjectSetting
+from settings.api.functions.project_settings import project_settings
 from report.models import JsonReport
+from common.functions.jobs import enqueue_job, queued_response
+from prod_actual import tasks
 
 from django.db.models import F, ExpressionWrapper, fields, Value
 from django.db.models.functions import Power, Sqrt
@@ -62,11 +64,11 @@ class RingDesignUploadView(APIView):
         hole_file = request.FILES.get('hole_file')
 
         try:
-            service = RingDesignService()
-            service.upload_design(ring_file, hole_file)
-            msg = {
-                'msg': {'body': 'Ring data processed successfully', 'type': 'success'}}
-            return Response(msg, status=status.HTTP_200_OK)
+            if not ring_file or not hole_file:
+                raise ValueError("Both ring_file and hole_file are required.")
+            job = enqueue_job(tasks.upload_ring_design, 'ring design upload', user=request.user,
+                              files={'ring_file': ring_file, 'hole_file': hole_file})
+            return Response(queued_response(job, 'Ring design upload queued'), status=status.HTTP_202_ACCEPTED)
         except ValueError as ve:
             msg = {'msg': {'body': str(ve), 'type': 'error'}}
             return Response(msg, status=status.HTTP_400_BAD_REQUEST)
@@ -91,6 +93,9 @@ class RingDesignService:
 
     def __init__(self):
         self.ring_map = {}
+        self.rings_created = 0
+        self.rings_updated = 0
+        self.job = None
         self.draw_correction = Decimal('0.08')  # Hardcoded multiplier for draw correction
 
     def upload_design(self, ring_file, hole_file):
@@ -171,6 +176,12 @@ class RingDesignService:
                     obj.save(update_fields=list(CREATE_ONLY))
 
                 self.ring_map[alias] = obj
+                if created:
+                    self.rings_created += 1
+                else:
+                    self.rings_updated += 1
+                if self.job:
+                    self.job.snapshot(self, 'rings')
                 logger.info(
                     f"{'Created' if created else 'Updated'} ring: {alias}")
 
@@ -278,19 +289,17 @@ class ProdOrphans():
         return {"processed_count": orphans.count(), "matched": matches}
 
     def fetch_threshold_dist(self):
-        try:
-            project_setting = ProjectSetting.objects.get(
-                key='drill_blast_orphans')
-            dist_value = project_setting.value.get('distValue', None)
-
-            if dist_value is not None:
-                self.threshold_dist = round(float(dist_value), 1)
-            else:
-                self.threshold_dist = 5
-                self.warning_msg = "distValue not found in project setting; using default 5m"
-        except (ProjectSetting.DoesNotExist, ValueError, TypeError) as e:
+        if 'distValue' not in project_settings.get_dict('drill_blast_orphans'):
+            self.threshold_dist = 5
+            self.warning_msg = "distValue not found in project setting; using default 5m"
+            return
+
+        dist_value = project_settings.get_float('drill_blast_orphans', 'distValue')
+        if dist_value is not None:
+            self.threshold_dist = round(dist_value, 1)
+        else:
             self.threshold_dist = 5
-            self.warning_msg = f"Could not fetch threshold; using default 2m. Error: {e}"
+            self.warning_msg = "Could not fetch threshold, distValue is not a number; using default 5m"
 
     def is_orphan(self, location_id):
         """
@@ -4,6 +4,7 @@ from django.db.models import Sum
 import prod_actual.models as m
 import prod_actual.api.serializers as s
 from common.functions.shkey import Shkey
+from prod_actual.api.functions.ring_states import ring_states
 
 
 class OverdrawRingView(generics.ListCreateAPIView):
@@ -35,8 +36,7 @@ class OverdrawRingView(generics.ListCreateAPIView):
         )
 
         if status_value == 'rejected':
-            waste_state = m.RingState.objects.get(
-                pri_state='Bogging', sec_state='Waste')
+            waste_state = ring_states.get('Bogging', 'Waste')
 
             if not m.RingStateChange.objects.filter(is_active=True, prod_ring=ring, state=waste_state).exists():
                 m.RingStateChange.objects.create(
@@ -7,6 +7,7 @@ from django.db import IntegrityError
 from django.db.models import Exists, OuterRef
 
 from common.functions.constants import MANDATORY_RING_STATES
+from prod_actual.api.functions.ring_states import ring_states
 
 import prod_actual.models as m
 
@@ -42,16 +43,9 @@ class ConditionsAndStates():
     def ensure_mandatory_ring_states(self):
         """
         Ensures that all mandatory `RingState` combinations exist in the database.
-        Missing combinations will be created.
+        The registry creates missing ones when it loads, once per process.
         """
-
-        for state in MANDATORY_RING_STATES:
-            # Use get_or_create to check if the combination exists, and create if missing
-            m.RingState.objects.get_or_create(
-                pri_state=state["pri_state"],
-                # Use None if sec_state is not provided
-                sec_state=state.get("sec_state")
-            )
+        ring_states.current()
 
     def get_ring_states(self):
         """
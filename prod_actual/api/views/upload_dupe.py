@@ -4,7 +4,10 @@ from rest_framework.response import Response
 import prod_actual.api.serializers as s
 import prod_actual.models as m
 import prod_concept.models as pcm
-from prod_actual.api.views.ring_state import ConditionsAndStates
+from prod_actual.api.functions.ring_states import ring_states
+from prod_actual.api.functions.dupe_reconcile import DupeReconciler
+from prod_actual import tasks
+from common.functions.jobs import enqueue_job, queued_response
 
 from time import strftime
 from django.utils import timezone
@@ -30,10 +33,10 @@ class UploadDupeView(generics.CreateAPIView):
         date = request.data.get('date')
 
         try:
-            dfh = DupeFileHandler()
-            handler_response = dfh.handle_dupe_file(request, file, date)
+            job = enqueue_job(tasks.import_dupe, 'dupe upload',
+                              user=request.user, files={'file': file}, date=date)
 
-            return Response(handler_response, status=status.HTTP_200_OK)
+            return Response(queued_response(job, 'Dupe upload queued'), status=status.HTTP_202_ACCEPTED)
 
         except Exception as e:
             # Handle general exceptions with a 500 Internal Server Error response
@@ -53,16 +56,14 @@ class DupeFileHandler():
         # format YYYY-MM-DD
         self.dupe_file_date = ''
         self.dupe_shkey = ''
+        self.reconciler = None
+        self.job = None
+        self.rows_processed = 0
 
     def load_ring_states(self):
-        cas = ConditionsAndStates()
-        cas.ensure_mandatory_ring_states()
-        self.ring_states = {
-            state.pri_state: state
-            for state in m.RingState.objects.filter(sec_state__isnull=True)
-        }
+        self.ring_states = ring_states.primaries()
 
-    def handle_dupe_file(self, request, f, date):
+    def handle_dupe_file(self, f, date):
         # self.__init__() #  shouldnt be needed
         self.dupe_file_date = date
         self.dupe_shkey = Shkey.generate_shkey(date, 'd')
@@ -81,6 +82,8 @@ class DupeFileHandler():
                 msg = f'{self.rings_created} rings created, '
             if self.rings_updated > 0:
                 msg = msg + f'{self.rings_updated} rings updated'
+            if not msg:
+                msg = 'No ring changes in the dupe file'
             handler_response = {'msg': {'type': 'success', 'body': msg}}
         return handler_response
 
@@ -105,16 +108,32 @@ class DupeFileHandler():
             self.logger.error(f"Missing required columns: {missing}")
             return
 
+        self.reconciler = DupeReconciler(self.ring_states, self.dupe_shkey)
         for _, row in df2.iterrows():
             try:
-                with transaction.atomic():
-                    self.process_row(row)
+                self.process_row(row)
             except Exception as e:
                 self.logger.error(f"Row failed: {e}")
                 self.error = str(e)
+            self.rows_processed += 1
+            self.report_progress('reading')
+
+        self.report_progress('writing', force=True)
+        self.reconciler.apply()
+        if self.reconciler.errors:
+            self.error = self.reconciler.errors[-1]
+        self.rings_created = self.reconciler.rings_created
+        self.rings_updated = self.reconciler.rings_updated
 
         self.logger.info(
-            f"Rings created: {self.rings_created}, updated: {self.rings_updated}")
+            f"Rings created: {self.rings_created}, updated: {self.rings_updated}, "
+            f"unchanged: {self.reconciler.rings_unchanged}, "
+            f"state changes: {self.reconciler.states_created}, "
+            f"bogging left to Pitram: {self.reconciler.bogging_skipped}")
+
+    def report_progress(self, stage, force=False):
+        if self.job:
+            self.job.snapshot(self, stage, force=force)
 
     def check_required_headers(self, df):
         required = {
@@ -159,49 +178,43 @@ class DupeFileHandler():
         ).lower() not in ["true", "1", "yes"]
 
         try:
-            ring, _ = m.ProductionRing.objects.update_or_create(
-                level=level,
-                oredrive=oredrive,
-                ring_number_txt=ring_number_txt,
-                defaults={
-                    "alias": alias,
-                    "prod_dev_code": "p",
-                    "is_active": is_active,
-                    "holes": holes,
-                    "drill_meters": drill_meters,
-                    "draw_percentage": draw_ratio * 100,  # Convert to percentage
-                    "in_flow": in_flow,
-                    "designed_tonnes": designed_tonnes,
-                    "drill_complete_shift": drill_shift,
-                    "charge_shift": charge_shift,
-                    "fireby_date": self.reformat_date(row["FireBy"]),
-                    "fired_shift": shiftfired,
-                    "status": status,
-                    "multi_fire_group": row["IsMFGroup"],
-                    "bog_complete_shift": finished,
-                    "x": x,
-                    "y": y,
-                    "z": z,
-                }
-            )
-
-            # Create RingStateChange entries based on available data
+            values = {
+                "alias": alias,
+                "prod_dev_code": "p",
+                "is_active": is_active,
+                "holes": holes,
+                "drill_meters": drill_meters,
+                "draw_percentage": draw_ratio * 100,  # Convert to percentage
+                "in_flow": in_flow,
+                "designed_tonnes": designed_tonnes,
+                "drill_complete_shift": drill_shift,
+                "charge_shift": charge_shift,
+                "fireby_date": self.reformat_date(row["FireBy"]),
+                "fired_shift": shiftfired,
+                "status": status,
+                "multi_fire_group": row["IsMFGroup"],
+                "bog_complete_shift": finished,
+                "x": x,
+                "y": y,
+                "z": z,
+            }
+
+            # RingStateChange entries based on available data
+            states = []
             if drill_shift:
-                self.status_drilled(ring, drill_shift, holes, drill_meters)
+                states += self.status_drilled(drill_shift, holes, drill_meters)
 
             if charge_shift:
-                self.status_drilled(ring, drill_shift, holes, drill_meters)
-                self.status_charged(ring, charge_shift)
+                states += self.status_drilled(drill_shift, holes, drill_meters)
+                states += self.status_charged(charge_shift)
 
             if shiftfired:
-                self.status_drilled(ring, drill_shift, holes, drill_meters)
-                self.status_charged(ring, charge_shift)
-                self.status_fired(ring, shiftfired)
-
-            if tonnes > 0:
-                self.update_create_bog_tonnes(tonnes, ring)
+                states += self.status_drilled(drill_shift, holes, drill_meters)
+                states += self.status_charged(charge_shift)
+                states += self.status_fired(shiftfired)
 
-            self.rings_created += 1  # Count all rows in this case
+            self.reconciler.add(
+                row, (level, oredrive, ring_number_txt), values, states, tonnes)
 
         except Exception as e:
             self.logger.error(f"Error processing row: {e}")
@@ -209,57 +222,23 @@ class DupeFileHandler():
             self.logger.exception("Traceback:")
             self.error = str(e)
 
-    def status_drilled(self, ring, drill_shift, holes, drill_meters):
-        m.RingStateChange.objects.create(
-            prod_ring=ring,
-            state=self.ring_states.get('Drilled'),
-            shkey=drill_shift,
-            operation_complete=True,
-            mtrs_drilled=drill_meters,
-            holes_completed=holes,
-        )
-
-    def status_charged(self, ring, charge_shift):
-        m.RingStateChange.objects.create(
-            prod_ring=ring,
-            state=self.ring_states.get('Charged'),
-            shkey=charge_shift,
-            operation_complete=True,
-        )
-
-    def status_fired(self, ring, shiftfired):
-        m.RingStateChange.objects.create(
-            prod_ring=ring,
-            state=self.ring_states.get('Fired'),
-            shkey=shiftfired,
-            operation_complete=True,
-        )
+    def status_drilled(self, drill_shift, holes, drill_meters):
+        return [('Drilled', drill_shift, {
+            'operation_complete': True,
+            'mtrs_drilled': drill_meters,
+            'holes_completed': holes,
+        })]
+
+    def status_charged(self, charge_shift):
+        return [('Charged', charge_shift, {'operation_complete': True})]
+
+    def status_fired(self, shiftfired):
         # Record the bogging event in the following shift
         next_shift = Shkey.next_shkey(shiftfired)
-        m.RingStateChange.objects.create(
-            prod_ring=ring,
-            state=self.ring_states.get('Bogging'),
-            shkey=next_shift,
-            operation_complete=False,
-        )
-
-    def update_create_bog_tonnes(self, tonnes, existing_record):
-        try:
-            # Delete all existing linked BoggedTonnes records
-            m.BoggedTonnes.objects.filter(
-                production_ring=existing_record).delete()
-
-            # Create a new BoggedTonnes record
-            m.BoggedTonnes.objects.create(
-                production_ring=existing_record,
-                bogged_tonnes=tonnes,
-                shkey=self.dupe_shkey,
-                entered_by=None
-            )
-        except Exception as e:
-            # Log or re-raise the exception for handling in the calling code
-            self.logger.error(f"Error in update_create_bog_tonnes: {e}")
-            raise e
+        return [
+            ('Fired', shiftfired, {'operation_complete': True}),
+            ('Bogging', next_shift, {'operation_complete': False}),
+        ]
 
     def status_adapter(self, status):
         status_mapping = {
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ProdActualConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'prod_actual'
+
+    def ready(self):
+        import prod_actual.signals
+
+        post_migrate.connect(prod_actual.signals.seed_ring_states, sender=self)
@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from common.functions.benchmark_suite import throwaway_database
+from common.functions.synthetic_mine import SyntheticMine
+
+import prod_actual.models as pm
+import statistics
+import time
+
+
+class Command(BaseCommand):
+    help = ("Times the main BDCF and report queries on a synthetic mine, without and "
+            "with the model indexes. Runs in a test database, created and dropped here.")
+
+    MODELS = [pm.ProductionRing, pm.RingStateChange, pm.BoggedTonnes]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--levels', type=int, default=10)
+        parser.add_argument('--drives', type=int, default=12, help='ore drives per level')
+        parser.add_argument('--rings', type=int, default=60, help='rings per drive')
+        parser.add_argument('--repeat', type=int, default=20, help='runs of each query')
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            mine = SyntheticMine(options['levels'], options['drives'], options['rings'])
+            counts = mine.generate()
+            self.stdout.write(', '.join(f'{n} {k}' for k, n in counts.items()))
+
+            queries = self.get_queries()
+            self.set_indexes(False)
+            before = self.time_queries(queries, options['repeat'])
+            self.set_indexes(True)
+            after = self.time_queries(queries, options['repeat'])
+
+        self.stdout.write(f"{'query':<24}{'no index ms':>14}{'indexed ms':>14}{'speedup':>10}")
+        for name in queries:
+            speedup = before[name] / after[name] if after[name] else 0
+            self.stdout.write(f'{name:<24}{before[name]:>14.2f}{after[name]:>14.2f}{speedup:>9.1f}x')
+
+    def set_indexes(self, add):
+        with connection.schema_editor() as editor:
+            for model in self.MODELS:
+                for index in model._meta.indexes:
+                    if add:
+                        editor.add_index(model, index)
+                    else:
+                        editor.remove_index(model, index)
+        if connection.vendor == 'sqlite':
+            # Let the planner see the new indexes
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def get_queries(self):
+        # Sample arguments taken from the middle of the data
+        ring = pm.ProductionRing.objects.filter(status='Bogging').order_by('location_id')
+        ring = ring[ring.count() // 2]
+        state = pm.RingState.objects.get(pri_state='Bogging', sec_state=None)
+        shkeys = [ring.fired_shift[:8] + 'P1', ring.fired_shift[:8] + 'P2']
+
+        return {
+            'bogging_rings': lambda: list(pm.ProductionRing.objects.filter(
+                is_active=True, status='Bogging')),
+            'drive_charged_rings': lambda: list(pm.ProductionRing.objects.filter(
+                is_active=True, status='Charged', oredrive=ring.oredrive)),
+            'ring_by_number': lambda: list(pm.ProductionRing.objects.filter(
+                level=ring.level, oredrive=ring.oredrive, ring_number_txt=ring.ring_number_txt)),
+            'active_levels': lambda: list(pm.ProductionRing.objects.filter(
+                is_active=True, status='Bogging').values_list('level', flat=True).distinct()),
+            'dcf_day': lambda: list(pm.ProductionRing.objects.filter(
+                Q(drill_complete_shift__in=shkeys) | Q(charge_shift__in=shkeys) |
+                Q(fired_shift__in=shkeys))),
+            'fired_day': lambda: list(pm.ProductionRing.objects.filter(
+                fired_shift__in=shkeys)),
+            'ring_firing': lambda: list(pm.RingStateChange.objects.filter(
+                prod_ring=ring, is_active=True, state=state)),
+            'bogged_shift': lambda: list(pm.BoggedTonnes.objects.filter(
+                shkey=ring.fired_shift).select_related('production_ring')),
+        }
+
+    def time_queries(self, queries, repeat):
+        # Median milliseconds of each query
+        results = {}
+        for name, query in queries.items():
+            query()
+            runs = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                query()
+                runs.append((time.perf_counter() - start) * 1000)
+            results[name] = statistics.median(runs)
+        return results
@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from common.functions.benchmark_suite import BenchmarkSuite, throwaway_database
+from common.functions.synthetic_mine import SyntheticMine
+
+import json
+import subprocess
+
+
+class Command(BaseCommand):
+    help = ("Times uploads, remaps, reports and scenario runs on a synthetic mine in a "
+            "throwaway test database and writes the results as JSON")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--levels', type=int, default=10)
+        parser.add_argument('--drives', type=int, default=12, help='ore drives per level')
+        parser.add_argument('--rings', type=int, default=60, help='rings per drive')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--case', action='append', dest='cases', choices=BenchmarkSuite.CASES,
+                            help='case to run, repeatable (default all)')
+        parser.add_argument('--workers', type=int, default=1, help='scenario worker processes')
+        parser.add_argument('--output', help='file to write the results to')
+        parser.add_argument('--compare', help='results file of an earlier run to compare with')
+
+    def handle(self, *args, **options):
+        previous = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    previous = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Can't read {options['compare']}: {e}")
+
+        with throwaway_database():
+            mine = SyntheticMine(options['levels'], options['drives'], options['rings'],
+                                 seed=options['seed'])
+            counts = mine.generate()
+            results = BenchmarkSuite(mine, options['workers']).run(options['cases'])
+
+        run = {
+            'recorded_at': timezone.now().isoformat(),
+            'commit': self.get_commit(),
+            'database': connection.vendor,
+            'size': mine.size,
+            'counts': counts,
+            'results': results,
+        }
+
+        self.report(run, previous)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(run, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def get_commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def report(self, run, previous):
+        before = previous['results'] if previous else {}
+        if previous and previous.get('size') != run['size']:
+            self.stdout.write(self.style.WARNING(
+                f"Comparing with a run of a different size: {previous.get('size')}"))
+
+        self.stdout.write(f"{'case':<16}{'seconds':>10}{'queries':>10}" +
+                          (f"{'was s':>10}{'was q':>10}" if previous else ''))
+        for name, result in run['results'].items():
+            if 'skipped' in result:
+                self.stdout.write(f"{name:<16}  skipped, {result['skipped']}")
+                continue
+            line = f"{name:<16}{result['seconds']:>10.3f}{result['queries']:>10}"
+            old = before.get(name, {})
+            if 'seconds' in old:
+                line += f"{old['seconds']:>10.3f}{old['queries']:>10}"
+            if 'error' in result:
+                line += f"  error: {result['error']}"
+            self.stdout.write(line)
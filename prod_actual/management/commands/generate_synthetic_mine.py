@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from common.functions.synthetic_mine import SyntheticMine
+
+import prod_actual.models as pm
+import prod_concept.models as pcm
+
+
+class Command(BaseCommand):
+    help = "Fills an empty database with a synthetic mine, for development and benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--levels', type=int, default=10)
+        parser.add_argument('--drives', type=int, default=12, help='ore drives per level')
+        parser.add_argument('--rings', type=int, default=60, help='rings per drive')
+        parser.add_argument('--days', type=int, default=365, help='days of history')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--force', action='store_true',
+                            help='add to a database that already has rings or concept blocks')
+
+    def handle(self, *args, **options):
+        if not options['force'] and (pm.ProductionRing.objects.exists() or
+                                     pcm.FlowModelConceptRing.objects.exists()):
+            raise CommandError("The database already has rings, use --force to add a mine anyway")
+
+        mine = SyntheticMine(options['levels'], options['drives'], options['rings'],
+                             options['days'], options['seed'])
+        counts = mine.generate()
+        self.stdout.write(self.style.SUCCESS(
+            'Created ' + ', '.join(f'{n} {name}' for name, n in counts.items())))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from prod_actual.api.functions.bogging_ledger import BoggingLedger
+
+
+class Command(BaseCommand):
+    help = "Recalculates ProductionRing.bogged_tonnes and BoggedTonnesShift from BoggedTonnes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ring', type=int, action='append', dest='rings',
+                            help='location_id of a ring to rebuild, repeatable (default all)')
+
+    def handle(self, *args, **options):
+        rings, shifts = BoggingLedger().rebuild(options['rings'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt bogged tonnes: {rings} rings, {shifts} shift rows"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from prod_actual.api.functions.pitram_sync import PitramBoggingSync
+
+
+class Command(BaseCommand):
+    help = "Brings Pitram bogging recorded since the last sync into BoggedTonnes"
+
+    def handle(self, *args, **options):
+        sync = PitramBoggingSync()
+        reply = sync.run()
+        self.stdout.write(self.style.SUCCESS(reply['msg']['body']))
+        if sync.unknown_aliases:
+            self.stdout.write(self.style.WARNING(
+                f"{len(sync.unknown_aliases)} aliases not found on an active ring"))
@@ -0,0 +1,16 @@
+from prod_actual.api.functions.ring_states import ring_states
+
+
+class RingStatesMiddleware():
+    '''
+    Has the process's ring states checked against RingStateVersion the
+    first time a request reads them, so a condition added or deleted
+    through another process is seen from the next request on
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        ring_states.mark_stale()
+        return self.get_response(request)
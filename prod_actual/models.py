@@ -84,6 +84,18 @@ class ProductionRing(Location):
     class Meta:
         verbose_name_plural = 'Production Rings'
         ordering = ['level', 'oredrive']
+        indexes = [
+            # is_active, status also serves (is_active, status) on its own,
+            # level is included for the active levels lookup
+            models.Index(fields=['is_active', 'status', 'oredrive'],
+                         include=['level'], name='prodring_active_status_idx'),
+            models.Index(fields=['level', 'oredrive', 'ring_number_txt'],
+                         name='prodring_drive_ring_idx'),
+            models.Index(fields=['drill_complete_shift'],
+                         name='prodring_drill_shift_idx'),
+            models.Index(fields=['charge_shift'], name='prodring_charge_shift_idx'),
+            models.Index(fields=['fired_shift'], name='prodring_fired_shift_idx'),
+        ]
 
 
 class BoggedTonnes(models.Model):
@@ -100,9 +112,41 @@ class BoggedTonnes(models.Model):
     entered_by = models.ForeignKey(
         RemoteUser, on_delete=models.SET_NULL, blank=True, null=True)
     datetime_stamp = models.DateTimeField(auto_now_add=True)
+    # Where the entry came from, Pitram entries are kept by PitramBoggingSync
+    source = models.CharField(max_length=10, default='manual', choices=[
+        ('manual', 'Manual'),
+        ('dupe', 'Dupe'),
+        ('pitram', 'Pitram'),
+    ])
+    # id of the record in the source, for synced entries
+    source_ref = models.CharField(max_length=50, blank=True, null=True)
 
     class Meta:
         verbose_name_plural = "Bogged Tonnes"
+        indexes = [models.Index(fields=['shkey'], name='boggedtonnes_shkey_idx')]
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'source_ref'],
+                                    condition=models.Q(source_ref__isnull=False),
+                                    name='boggedtonnes_source_ref_uniq'),
+        ]
+
+
+class BoggedTonnesShift(models.Model):
+    # BoggedTonnes summed per ring and shift, kept by BoggingLedger
+    production_ring = models.ForeignKey(
+        ProductionRing,
+        on_delete=models.CASCADE,
+        related_name='bogged_shifts'
+    )
+    shkey = models.CharField(max_length=10)
+    bogged_tonnes = models.DecimalField(
+        max_digits=8, decimal_places=1, default=0)
+    # BoggedTonnes rows making up the total
+    entries = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Bogged Tonnes Shifts"
+        unique_together = ('production_ring', 'shkey')
 
 
 class MultifireGroup(models.Model):
@@ -144,6 +188,29 @@ class RingComments(models.Model):
     show_to_operator = models.JSONField(blank=True, null=True)
 
 
+class SyncWatermark(models.Model):
+    # How far an incremental sync has got, advanced with each batch it writes
+    name = models.CharField(max_length=50, unique=True)
+    # timestamp of the last record synced, the next run starts from it
+    timestamp = models.DateTimeField(blank=True, null=True)
+    shkey = models.CharField(max_length=10, blank=True, null=True)
+    records = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} at {self.timestamp}'
+
+
+class RingStateVersion(models.Model):
+    # One row, bumped on every RingState add or delete so each process can
+    # tell its RingStateRegistry is out of date
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Ring state version {self.version}'
+
+
 class RingState(models.Model):
     # if this ever gets a redesign, change attributes to 'state' and 'condition'
     pri_state = models.CharField(max_length=30)
@@ -178,6 +245,10 @@ class RingStateChange(models.Model):
     holes_completed = models.SmallIntegerField(blank=True, null=True)
     detail = models.JSONField(blank=True, null=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['prod_ring', 'is_active', 'state'],
+                                name='ringstate_ring_active_idx')]
+
 
 class RingLink(models.Model):
     ring = models.ForeignKey(
@@ -0,0 +1,20 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+import prod_actual.models as m
+
+from prod_actual.api.functions.ring_states import ring_states
+
+
+@receiver(post_save, sender=m.RingState)
+@receiver(post_delete, sender=m.RingState)
+def ring_state_changed(sender, instance, **kwargs):
+    ring_states.bump_version()
+    transaction.on_commit(ring_states.clear)
+
+
+def seed_ring_states(sender, using='default', **kwargs):
+    # After every migrate, so the mandatory states are there from the start
+    if using == 'default':
+        ring_states.seed()
@@ -0,0 +1,43 @@
+from django_tasks import task
+
+from common.functions.jobs import run_job
+
+
+@task()
+def import_dupe(job_id):
+    def work(tracker):
+        from prod_actual.api.views.upload_dupe import DupeFileHandler
+
+        dfh = DupeFileHandler()
+        dfh.job = tracker
+        with tracker.open_file('file') as file:
+            return dfh.handle_dupe_file(file, tracker.params.get('date'))
+
+    return run_job(job_id, work)
+
+
+@task()
+def upload_ring_design(job_id):
+    def work(tracker):
+        from prod_actual.api.views.drill_blast import RingDesignService
+
+        service = RingDesignService()
+        service.job = tracker
+        with tracker.open_file('ring_file') as ring_file, tracker.open_file('hole_file') as hole_file:
+            service.upload_design(ring_file, hole_file)
+        body = f'Ring data processed successfully, {service.rings_created} created, {service.rings_updated} updated'
+        return {'msg': {'body': body, 'type': 'success'}}
+
+    return run_job(job_id, work)
+
+
+@task()
+def sync_pitram_bogging(job_id):
+    def work(tracker):
+        from prod_actual.api.functions.pitram_sync import PitramBoggingSync
+
+        sync = PitramBoggingSync()
+        sync.job = tracker
+        return sync.run()
+
+    return run_job(job_id, work)
@@ -1,3 +1,204 @@
+from decimal import Decimal
+from django.db import connections
+from django.db.models import Count, Sum
 from django.test import TestCase
 
-# Create your tests here.
+from prod_actual.api.functions.bogging_ledger import BoggingLedger
+from prod_actual.api.functions.dupe_reconcile import DupeReconciler
+from prod_actual.api.functions.pitram_sync import PitramBoggingSync
+from prod_actual.api.functions.ring_states import ring_states
+
+import prod_actual.models as m
+
+
+class RingTestCase(TestCase):
+    '''
+    Rings on one level and the dupe uploads that write them
+    '''
+
+    def setUp(self):
+        ring_states.clear()
+
+    def ring(self, number, alias):
+        return m.ProductionRing.objects.create(
+            level=1000, oredrive='OD1', ring_number_txt=number, alias=alias, status='Bogging',
+            x=0, y=0, z=0, prod_dev_code='p', designed_tonnes=1000, draw_percentage=100)
+
+    def tonnes(self, ring):
+        ring.refresh_from_db()
+        return ring.bogged_tonnes
+
+    def upload(self, rings, tonnes, values=None, states=(), shkey='20261005P1'):
+        reconciler = DupeReconciler(ring_states.primaries(), shkey)
+        for ring in rings:
+            reconciler.add(ring.ring_number_txt, (ring.level, ring.oredrive, ring.ring_number_txt),
+                           values or {}, list(states), tonnes)
+        reconciler.apply()
+        return reconciler
+
+
+class DupeReconcilerTests(RingTestCase):
+    '''
+    The batched dupe upload
+    '''
+
+    def setUp(self):
+        super().setUp()
+        self.rings = [self.ring('1', 'R1'), self.ring('2', 'R2')]
+
+    def test_reupload_replaces_totals(self):
+        m.BoggedTonnes.objects.create(
+            production_ring=self.rings[0], shkey='20261001P1', bogged_tonnes=30)
+        states = [('Bogging', '20261004P2', {})]
+
+        first = self.upload(self.rings, 500, {'designed_tonnes': 1200}, states)
+        self.assertEqual((first.rings_updated, first.states_created), (2, 2))
+        self.assertEqual([self.tonnes(ring) for ring in self.rings], [Decimal('500')] * 2)
+
+        # The second upload's totals replace the first's, the state isn't added again
+        second = self.upload(self.rings, 700, {'designed_tonnes': 1200}, states, shkey='20261006P1')
+        self.assertEqual((second.rings_unchanged, second.states_created), (2, 0))
+        self.assertEqual([self.tonnes(ring) for ring in self.rings], [Decimal('700')] * 2)
+        self.assertEqual(list(m.BoggedTonnes.objects.filter(production_ring=self.rings[0])
+                              .values_list('shkey', 'bogged_tonnes', 'source')),
+                         [('20261006P1', Decimal('700'), 'dupe')])
+        self.assertEqual(list(m.BoggedTonnesShift.objects.filter(production_ring=self.rings[0])
+                              .values_list('shkey', 'bogged_tonnes', 'entries')),
+                         [('20261006P1', Decimal('700'), 1)])
+        self.assertEqual(m.RingStateChange.objects.count(), 2)
+
+    def test_new_rings_and_failed_batch(self):
+        # Two rings share a key, the batch fails and the rest go in one by one
+        self.ring('1', 'R1b')
+        new = m.ProductionRing(level=1000, oredrive='OD1', ring_number_txt='3')
+        values = dict(alias='R3', status='Designed', x=0, y=0, z=0, prod_dev_code='p',
+                      designed_tonnes=900, draw_percentage=100)
+
+        reconciler = self.upload(self.rings + [new], 100, values)
+        self.assertEqual(len(reconciler.errors), 1)
+        self.assertEqual((reconciler.rings_created, reconciler.rings_updated), (1, 1))
+        created = m.ProductionRing.objects.get(ring_number_txt='3')
+        self.assertEqual((created.alias, self.tonnes(created)), ('R3', Decimal('100')))
+        self.assertEqual(self.tonnes(self.rings[1]), Decimal('100'))
+        self.assertEqual(self.tonnes(self.rings[0]), Decimal('0'))
+
+
+class BoggingLedgerTests(RingTestCase):
+    '''
+    The running totals against what summing BoggedTonnes gives
+    '''
+
+    def setUp(self):
+        super().setUp()
+        self.rings = [self.ring('1', 'R1'), self.ring('2', 'R2')]
+        self.ledger = BoggingLedger()
+
+    def entry(self, ring, shkey, tonnes):
+        entry = m.BoggedTonnes.objects.create(production_ring=ring, shkey=shkey, bogged_tonnes=tonnes)
+        self.ledger.added(entry)
+        return entry
+
+    def assertMatchesEntries(self):
+        for ring in self.rings:
+            summed = m.BoggedTonnes.objects.filter(
+                production_ring=ring).aggregate(total=Sum('bogged_tonnes'))['total']
+            self.assertEqual(self.tonnes(ring), summed or 0)
+        shifts = (m.BoggedTonnes.objects.values('production_ring_id', 'shkey')
+                  .annotate(total=Sum('bogged_tonnes'), entries=Count('id')))
+        self.assertEqual(
+            set(m.BoggedTonnesShift.objects.values_list(
+                'production_ring_id', 'shkey', 'bogged_tonnes', 'entries')),
+            set((s['production_ring_id'], s['shkey'], s['total'], s['entries']) for s in shifts))
+
+    def test_entries_then_rebuild(self):
+        first = self.entry(self.rings[0], '20261001P1', Decimal('100.5'))
+        self.entry(self.rings[0], '20261001P1', 50)
+        moved = self.entry(self.rings[0], '20261001P2', 20)
+        gone = self.entry(self.rings[1], '20261001P1', 75)
+
+        # Moved to the other ring and shift
+        before = (moved.production_ring_id, moved.shkey, moved.bogged_tonnes)
+        moved.production_ring = self.rings[1]
+        moved.shkey = '20261002P1'
+        moved.bogged_tonnes = 25
+        moved.save()
+        self.ledger.changed(before, moved)
+
+        self.ledger.removed(gone)
+        gone.delete()
+        before = (first.production_ring_id, first.shkey, first.bogged_tonnes)
+        first.bogged_tonnes = 90
+        first.save()
+        self.ledger.changed(before, first)
+        self.assertMatchesEntries()
+        self.assertFalse(m.BoggedTonnesShift.objects.filter(shkey='20261001P2').exists())
+
+        # A rebuild of one ring, and of every ring, comes to the same
+        m.ProductionRing.objects.update(bogged_tonnes=999)
+        m.BoggedTonnesShift.objects.update(bogged_tonnes=999)
+        self.assertEqual(self.ledger.rebuild([self.rings[0].pk]), (1, 1))
+        self.assertEqual(self.tonnes(self.rings[0]), Decimal('140'))
+        self.assertEqual(self.ledger.rebuild(), (2, 2))
+        self.assertMatchesEntries()
+
+
+class PitramBoggingSyncTests(RingTestCase):
+    '''
+    The sync against a SQLite table standing in for Pitram's bogging
+    '''
+    databases = {'default', 'readonly'}
+
+    def setUp(self):
+        super().setUp()
+        with connections['readonly'].cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS bogging")
+            cursor.execute("CREATE TABLE bogging (record_id integer, alias text, shkey text, "
+                           "tonnes real, updated_at datetime)")
+        self.pitram_ring = self.ring('1', 'R1')
+        self.dupe_ring = self.ring('2', 'R2')
+
+    def pitram(self, *records):
+        with connections['readonly'].cursor() as cursor:
+            cursor.executemany("INSERT INTO bogging VALUES (%s, %s, %s, %s, %s)", records)
+
+    def dupe(self, tonnes):
+        return self.upload((self.pitram_ring, self.dupe_ring), tonnes)
+
+    def test_sync_rerun_and_dupe(self):
+        m.BoggedTonnes.objects.create(
+            production_ring=self.pitram_ring, shkey='20260930P2', bogged_tonnes=50)
+        self.pitram((1, 'R1', '20261001P1', 100, '2026-10-01 07:00:00'),
+                    (2, 'R1', '20261001P2', 120, '2026-10-01 19:00:00'),
+                    (3, 'NOPE', '20261001P2', 10, '2026-10-01 19:00:00'))
+
+        sync = PitramBoggingSync()
+        sync.run()
+        self.assertEqual((sync.entries_created, sync.rows_skipped), (2, 1))
+        self.assertEqual(self.tonnes(self.pitram_ring), Decimal('270'))
+        watermark = m.SyncWatermark.objects.get(name=PitramBoggingSync.NAME)
+        self.assertEqual(watermark.shkey, '20261001P2')
+
+        # The records at the watermark are read again and change nothing
+        rerun = PitramBoggingSync()
+        rerun.run()
+        self.assertEqual((rerun.entries_created, rerun.entries_updated), (0, 0))
+        self.assertEqual(m.BoggedTonnes.objects.filter(source='pitram').count(), 2)
+        self.assertEqual(self.tonnes(self.pitram_ring), Decimal('270'))
+
+        # The dupe replaces the other ring's bogging, not the synced ring's
+        reconciler = self.dupe(500)
+        self.assertEqual(reconciler.bogging_skipped, 1)
+        self.assertEqual(self.tonnes(self.pitram_ring), Decimal('270'))
+        self.assertEqual(self.tonnes(self.dupe_ring), Decimal('500'))
+        self.assertTrue(m.BoggedTonnes.objects.filter(
+            production_ring=self.pitram_ring, source='manual').exists())
+
+    def test_sync_after_dupe_replaces_dupe_total(self):
+        self.dupe(500)
+        self.pitram((1, 'R2', '20261006P1', 80, '2026-10-06 07:00:00'))
+
+        sync = PitramBoggingSync()
+        sync.run()
+        self.assertEqual(sync.dupe_entries_removed, 1)
+        self.assertEqual(self.tonnes(self.dupe_ring), Decimal('80'))
+        self.assertEqual(self.tonnes(self.pitram_ring), Decimal('500'))
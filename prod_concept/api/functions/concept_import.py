@@ -0,0 +1,190 @@
+from django.db import transaction
+
+import numpy as np
+import pandas as pd
+import prod_actual.models as pm
+import prod_concept.models as m
+
+from common.functions.constants import BULK_BATCH_SIZE
+from common.signals import production_data_changed
+
+
+class ConceptFrameImporter(object):
+    """
+    Applies a flow model DataFrame to FlowModelConceptRing in bulk.
+
+    The frame is coerced column by column, compared against the existing
+    rows (fetched once, keyed by blastsolids_id) and only the new or
+    changed rows are written, with bulk_create and bulk_update.
+    """
+    TEXT_FIELDS = ['description', 'heading', 'loc']
+    INT_FIELDS = ['level', 'drive', 'draw_zone']
+    DECIMAL_FIELDS = ['x', 'y', 'z', 'pgca_modelled_tonnes',
+                      'density', 'modelled_au', 'modelled_cu']
+    WRITE_FIELDS = ['is_active'] + TEXT_FIELDS + INT_FIELDS + DECIMAL_FIELDS
+
+    def __init__(self, strict=False, batch_size=BULK_BATCH_SIZE):
+        # strict: any non-numeric cell in a numeric column is an error,
+        # otherwise it is read as 0
+        self.strict = strict
+        self.batch_size = batch_size
+
+        self.rings_created = 0
+        self.rings_updated = 0
+        self.rings_unchanged = 0
+        self.rows_skipped = 0
+        self.skip_reason = None
+
+        self.valid_index = None
+        self.touched_levels = set()
+        # blastsolids_ids by outcome, for follow-up work such as remapping
+        self.created_ids = []
+        self.moved_ids = []
+        self.reactivated_ids = []
+
+    def import_frame(self, df, columns):
+        """
+        df: DataFrame as read from the CSV
+        columns: {'blastsolids_id': header, 'description': header, ...}
+                 one CSV header per field in TEXT/INT/DECIMAL_FIELDS
+
+        Raises ValueError in strict mode and lets database errors through,
+        in both cases nothing is written.
+        """
+        frame = self.coerce_frame(df, columns)
+        if frame.empty:
+            return
+
+        # The last row wins when a block appears twice, like update_or_create
+        unique = frame.drop_duplicates(
+            subset='blastsolids_id', keep='last').set_index('blastsolids_id')
+        existing = self.fetch_existing(list(unique.index))
+
+        is_new = ~unique.index.isin(existing.index)
+        new_rows = unique[is_new]
+        old_rows = unique[~is_new]
+        changed, moved = self.diff_rows(old_rows, existing.loc[old_rows.index])
+
+        to_create = [self.build_block(bs_id, row)
+                     for bs_id, row in new_rows.iterrows()]
+        to_update = [self.build_block(bs_id, row, existing.at[bs_id, 'location_id'])
+                     for bs_id, row in old_rows[changed].iterrows()]
+
+        with transaction.atomic():
+            m.FlowModelConceptRing.objects.bulk_create(
+                to_create, batch_size=self.batch_size)
+            m.FlowModelConceptRing.objects.bulk_update(
+                to_update, self.WRITE_FIELDS, batch_size=self.batch_size)
+
+        # Every valid row that did not create a block counts as an update
+        self.rings_created = len(new_rows)
+        self.rings_updated = len(frame) - len(new_rows)
+        self.rings_unchanged = len(old_rows) - len(to_update)
+        self.created_ids = list(new_rows.index)
+        self.moved_ids = list(old_rows[moved].index)
+        self.reactivated_ids = list(
+            old_rows[(existing.loc[old_rows.index, 'is_active'] != True).values].index)
+        self.touched_levels = set(int(level) for level in frame['level'].unique())
+
+        if to_create or to_update:
+            # New blocks have no rings yet, only the rings of changed ones are affected
+            block_ids = [int(block.location_id) for block in to_update]
+            production_data_changed.send(
+                sender=m.FlowModelConceptRing,
+                location_ids=self.rings_of_blocks(block_ids), block_ids=block_ids)
+
+    def rings_of_blocks(self, block_ids):
+        ring_ids = []
+        for i in range(0, len(block_ids), self.batch_size):
+            ring_ids.extend(pm.ProductionRing.objects.filter(
+                concept_ring_id__in=block_ids[i:i + self.batch_size]).values_list('location_id', flat=True))
+        return ring_ids
+
+    def coerce_frame(self, df, columns):
+        """
+        Returns a frame with one column per model field and only the rows
+        that can be imported. Rows without an id are dropped quietly, rows
+        without a usable drive number are counted as skipped.
+        """
+        ids = self.text_column(df[columns['blastsolids_id']])
+        df = df[ids != '']
+
+        drive = pd.to_numeric(df[columns['drive']], errors='coerce')
+        bad_drive = drive.isna()
+        if bad_drive.any():
+            self.rows_skipped = int(bad_drive.sum())
+            self.skip_reason = f"{self.rows_skipped} rows without a valid drive number"
+            df = df[~bad_drive]
+
+        frame = pd.DataFrame(index=df.index)
+        frame['blastsolids_id'] = ids[df.index]
+        for field in self.TEXT_FIELDS:
+            frame[field] = self.text_column(df[columns[field]])
+        for field in self.INT_FIELDS + self.DECIMAL_FIELDS:
+            frame[field] = self.numeric_column(df[columns[field]])
+        for field in self.INT_FIELDS:
+            frame[field] = frame[field].astype('int64')
+
+        self.valid_index = frame.index
+        return frame
+
+    def text_column(self, column):
+        return column.fillna('').astype(str)
+
+    def numeric_column(self, column):
+        numbers = pd.to_numeric(column, errors='coerce')
+        if self.strict:
+            bad = numbers.isna()
+            if bad.any():
+                raise ValueError(
+                    f"Non-numeric string encountered: {column[bad].iloc[0]}")
+        return numbers.fillna(0).astype(float)
+
+    def fetch_existing(self, bs_ids):
+        rows = []
+        for i in range(0, len(bs_ids), self.batch_size):
+            rows.extend(m.FlowModelConceptRing.objects.filter(
+                blastsolids_id__in=bs_ids[i:i + self.batch_size]
+            ).order_by('location_id').values('location_id', 'blastsolids_id', *self.WRITE_FIELDS))
+
+        columns = ['location_id', 'blastsolids_id'] + self.WRITE_FIELDS
+        existing = pd.DataFrame(rows, columns=columns)
+        # Decimals come back as Decimal, compare them as floats
+        for field in self.DECIMAL_FIELDS:
+            existing[field] = existing[field].astype(float)
+        return existing.drop_duplicates(
+            subset='blastsolids_id', keep='first').set_index('blastsolids_id')
+
+    def diff_rows(self, new, old):
+        """
+        Returns two boolean masks over new: rows that differ from the
+        database at the precision it stores, and rows whose location moved
+        by more than 0.1 on any axis (see has_location_changed).
+        """
+        changed = pd.Series(False, index=new.index)
+        if new.empty:
+            return changed, changed
+
+        changed |= old['is_active'] != True
+        for field in self.TEXT_FIELDS:
+            changed |= new[field] != old[field].fillna('')
+        for field in self.INT_FIELDS:
+            changed |= new[field] != old[field]
+        for field in self.DECIMAL_FIELDS:
+            places = m.FlowModelConceptRing._meta.get_field(field).decimal_places
+            changed |= np.round(new[field], places) != np.round(old[field], places)
+
+        moved = pd.Series(False, index=new.index)
+        for field in ('x', 'y', 'z'):
+            moved |= (new[field] - old[field]).abs() > 0.1
+
+        return changed, moved
+
+    def build_block(self, bs_id, row, location_id=None):
+        values = {field: row[field] for field in self.WRITE_FIELDS if field != 'is_active'}
+        return m.FlowModelConceptRing(
+            location_id=location_id,
+            blastsolids_id=bs_id,
+            is_active=True,
+            **values
+        )
@@ -1,9 +1,10 @@
-from django.db import transaction
 from django.contrib.auth import get_user_model
 import logging
 import pandas as pd
 import prod_concept.models as m
 
+from prod_concept.api.functions.concept_import import ConceptFrameImporter
+
 User = get_user_model()
 logger = logging.getLogger('custom_logger')
 
@@ -71,104 +72,41 @@ class ConceptRingsFileHandler(object):
                 })
                 error_msg = 'There was error in the CSV file'
             return
-        # Replace all the 'nan' values for 'None'
-        df2 = df.fillna("")
-
+        importer = ConceptFrameImporter(strict=True)
+        columns = {
+            'blastsolids_id': "ID",
+            'description': "Name",
+            'level': "LEVEL",
+            'heading': "HEADING",
+            'drive': "DRIVE",
+            'loc': "LOC",
+            'x': "X",
+            'y': "Y",
+            'z': "Z",
+            'pgca_modelled_tonnes': "PGCA_Modelled Tonnes",
+            'draw_zone': "DRAW_ZONE",
+            'density': "Density",
+            'modelled_au': "PGCA_Modelled Au",
+            'modelled_cu': "PGCA_Modelled Cu",
+        }
         try:
-            with transaction.atomic():
-                for _, row in df2.iterrows():
-                    # Initialize flag to track if a record is created or updated
-                    create_record = True
-
-                    try:
-                        drv_num = int(row["DRIVE"])
-                    except ValueError:
-                        # Ignore rows without a valid DRIVE number
-                        continue
-
-                    bs_id = row["ID"]
-
-                    # Create a savepoint
-                    sid = transaction.savepoint()
-
-                    try:
-                        # Attempt to get the existing record
-                        existing_record = m.FlowModelConceptRing.objects.get(
-                            blastsolids_id=bs_id)
-
-                        # Update the existing record
-                        self.update_existing_record(existing_record, row)
-                        create_record = False
-                    except m.FlowModelConceptRing.DoesNotExist:
-                        # Create a new record if it does not exist
-                        self.create_new_record(row)
-
-                    if self.error_msg:
-                        # If an error was encountered in helper methods, rollback and return
-                        transaction.savepoint_rollback(sid)
-                        return
-
-                    # Commit the savepoint if no errors occurred
-                    transaction.savepoint_commit(sid)
-
-                    # Update counters
-                    if create_record:
-                        self.rings_created += 1
-                    else:
-                        self.rings_updated += 1
-
+            # Rows without a valid DRIVE number are ignored by the importer,
+            # anything else it rejects leaves the table untouched
+            importer.import_frame(df, columns)
+        except ValueError as e:
+            self.logger.warning(str(e))
+            self.error_msg = str(e)
+            return
         except Exception as e:
             logger.warning("flow model file data error", exc_info=True, extra={
                 'user': self.user,
                 'additional_info': e,
             })
             self.error_msg = "flow model file data error"
-            # Rollback to the savepoint (only the erroneous transaction)
-            transaction.savepoint_rollback(sid)
             return
 
-    def update_existing_record(self, record, row):
-        """Helper method to update an existing record."""
-        record.description = row["Name"]
-        record.inactive = False
-        record.level = self.number_fix(row["LEVEL"])
-        record.heading = row["HEADING"]
-        record.drive = self.number_fix(row["DRIVE"])
-        record.loc = row["LOC"]
-        record.x = self.number_fix(row["X"])
-        record.y = self.number_fix(row["Y"])
-        record.z = self.number_fix(row["Z"])
-        record.pgca_modelled_tonnes = self.number_fix(
-            row["PGCA_Modelled Tonnes"])
-        record.draw_zone = self.number_fix(row["DRAW_ZONE"])
-        record.density = self.number_fix(row["Density"])
-        record.modelled_au = self.number_fix(row["PGCA_Modelled Au"])
-        record.modelled_cu = self.number_fix(row["PGCA_Modelled Cu"])
-
-        if self.error_msg:
-            return
-
-        record.save()
-
-    def create_new_record(self, row):
-        """Helper method to create a new record."""
-        m.FlowModelConceptRing.objects.create(
-            description=row["Name"],
-            inactive=False,
-            level=self.number_fix(row["LEVEL"]),
-            blastsolids_id=row["ID"],
-            heading=row["HEADING"],
-            drive=self.number_fix(row["DRIVE"]),
-            loc=row["LOC"],
-            x=self.number_fix(row["X"]),
-            y=self.number_fix(row["Y"]),
-            z=self.number_fix(row["Z"]),
-            pgca_modelled_tonnes=self.number_fix(row["PGCA_Modelled Tonnes"]),
-            draw_zone=self.number_fix(row["DRAW_ZONE"]),
-            density=self.number_fix(row["Density"]),
-            modelled_au=self.number_fix(row["PGCA_Modelled Au"]),
-            modelled_cu=self.number_fix(row["PGCA_Modelled Cu"])
-        )
+        self.rings_created = importer.rings_created
+        self.rings_updated = importer.rings_updated
 
     def number_fix(self, cell):
         """
@@ -7,5 +7,6 @@ urlpatterns = [
     path('', EmptyView.as_view(), name='empty-view'),
     path('choose-parent/<int:location_id>/',
          ChooseParentView.as_view(), name='choose-parent'),
+    path('remap/', RemapBlocksView.as_view(), name='remap-blocks'),
     path('upload/concept/', UploadConceptRingsView.as_view(), name='upload-concept'),
 ]
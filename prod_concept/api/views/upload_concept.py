@@ -9,13 +9,18 @@ from rest_framework.renderers import JSONRenderer
 
 import logging
 import pandas as pd
+import time
 import prod_concept.models as m
 import prod_concept.api.serializers as s
 
-from settings.models import ProjectSetting
+from settings.api.functions.project_settings import project_settings
 from prod_actual.models import ProductionRing
 from prod_concept.api.views.mining_direction import MiningDirectionView
 from common.functions.block_adjacency import BlockAdjacencyFunctions
+from common.functions.constants import BULK_BATCH_SIZE
+from prod_concept.api.functions.concept_import import ConceptFrameImporter
+from common.functions.jobs import enqueue_job, queued_response
+from prod_concept import tasks
 
 from datetime import datetime
 from decimal import Decimal
@@ -30,16 +35,23 @@ class UploadConceptRingsView(generics.CreateAPIView):
         file = serializer.validated_data['file']
         if file:
             try:
-                crfh = ConceptRingsFileHandler()
-                handler_response = crfh.handle_flow_concept_file(request, file)
+                job = enqueue_job(tasks.import_flow_concept, 'flow concept upload',
+                                  user=request.user, files={'file': file})
 
-                return Response(handler_response, status=status.HTTP_202_ACCEPTED)
+                return Response(queued_response(job, 'Flow model upload queued'),
+                                status=status.HTTP_202_ACCEPTED)
             except Exception as e:
                 # Handle general exceptions with a 500 Internal Server Error response
                 print(str(e))
                 return Response({"status": "error", "detail": "Internal Server Error"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class RemapBlocksView(APIView):
+    def post(self, request, *args, **kwargs):
+        job = enqueue_job(tasks.remap_mine, 'remap mine', user=request.user)
+        return Response(queued_response(job, 'Block remap queued'), status=status.HTTP_202_ACCEPTED)
+
+
 class ConceptRingsFileHandler():
     def __init__(self):
         self.logger = logging.getLogger(__name__)
@@ -52,10 +64,19 @@ class ConceptRingsFileHandler():
         self.user = ''
         self.touched_levels = set()
         self.succession_data = []
-
-    def handle_flow_concept_file(self, request, file):
-        self.user = request.user
+        self.links_created = 0
+        self.job = None
+        self.created_ids = []
+        self.moved_ids = []
+        self.reactivated_ids = []
+        self.blocks_remapped = 0
+
+    def handle_flow_concept_file(self, user, file):
+        self.user = user
         self.read_flow_concept_file(file)
+        self.report_progress('imported', force=True)
+        if not self.error_msg:
+            self.remap_changed_blocks()
         # b = BlockAdjacencyFunctions()
         # b.remap_levels(self.touched_levels)
         # self.update_block_links()
@@ -75,15 +96,12 @@ class ConceptRingsFileHandler():
 
     def read_flow_concept_file(self, file):
         # Fetch the required columns from the settings
-        try:
-            project_setting = ProjectSetting.objects.get(
-                key='concept_csv_headers')
-            required_columns = project_setting.value
-            required_columns_list = list(required_columns.values())
-        except ProjectSetting.DoesNotExist:
+        required_columns = project_settings.get('concept_csv_headers')
+        if required_columns is None:
             self.error_msg = "CSV file headers blank, see FM Concept tab in settings"
             self.logger.error(self.error_msg)
             return
+        required_columns_list = list(required_columns.values())
 
         try:
             file.seek(0)
@@ -98,60 +116,83 @@ class ConceptRingsFileHandler():
             self.logger.error(f"Error: {self.error_msg}")
             return
 
-        df2 = df.fillna("")
+        importer = ConceptFrameImporter()
+        columns = {
+            'blastsolids_id': required_columns["id"],
+            'description': required_columns["name"],
+            'level': required_columns["level"],
+            'heading': required_columns["heading"],
+            'drive': required_columns["drive"],
+            'loc': required_columns["loc"],
+            'x': required_columns["x"],
+            'y': required_columns["y"],
+            'z': required_columns["z"],
+            'pgca_modelled_tonnes': required_columns["tonnes"],
+            'draw_zone': required_columns["draw_zone"],
+            'density': required_columns["density"],
+            'modelled_au': required_columns["au"],
+            'modelled_cu': required_columns["cu"],
+        }
+        started = time.perf_counter()
+        self.report_progress('importing', force=True)
+        try:
+            importer.import_frame(df, columns)
+        except Exception as e:
+            self.logger.error(f"Error: {e}")
+            self.error_msg = str(e)
+            self.logger.exception("Traceback:")
+            return
+
+        if importer.skip_reason:
+            self.logger.warning(f"Skipping rows: {importer.skip_reason}")
+            self.warning_msg = f"Rows were skipped due to: {importer.skip_reason}"
+
+        self.rings_created = importer.rings_created
+        self.rings_updated = importer.rings_updated
+        self.touched_levels.update(importer.touched_levels)
+        self.created_ids = importer.created_ids
+        self.moved_ids = importer.moved_ids
+        self.reactivated_ids = importer.reactivated_ids
+        self.logger.info(
+            f"Flow model imported: {importer.rings_created} created, {importer.rings_updated} updated "
+            f"({importer.rings_unchanged} unchanged) in {time.perf_counter() - started:.3f}s")
+
+        # Store successors/predecessors
+        succession = df.loc[importer.valid_index].fillna("")
+        for bs_id, successors, predecessors in zip(
+                succession[required_columns["id"]],
+                succession[required_columns["successors"]],
+                succession[required_columns["predecessors"]]):
+            self.succession_data.append({
+                'id': bs_id,
+                'successors': successors,
+                'predecessors': predecessors,
+            })
+
+    def remap_changed_blocks(self, batch_size=BULK_BATCH_SIZE):
+        """
+        Updates BlockAdjacency for the blocks the file added, moved or
+        reactivated instead of remapping every touched level.
+        """
+        bs_ids = sorted(set(self.created_ids + self.moved_ids + self.reactivated_ids))
+        if not bs_ids:
+            return
 
-        for _, row in df2.iterrows():
-            bs_id = row[required_columns["id"]]
-            if not bs_id:
-                # Skip empty row
-                continue
-            try:
-                drv_num = int(row[required_columns["drive"]])
-                
-                level = self.number_fix(row[required_columns["level"]])
-                self.touched_levels.add(level)
-
-                # Store successors/predecessors
-                self.succession_data.append({
-                    'id': bs_id,
-                    'successors': row[required_columns["successors"]],
-                    'predecessors': row[required_columns["predecessors"]],
-                })
-
-                obj, created = m.FlowModelConceptRing.objects.update_or_create(
-                    blastsolids_id=bs_id,
-                    defaults={
-                        'description': row[required_columns["name"]],
-                        'is_active': True,
-                        'level': level,
-                        'heading': row[required_columns["heading"]],
-                        'drive': self.number_fix(row[required_columns["drive"]]),
-                        'loc': row[required_columns["loc"]],
-                        'x': self.number_fix(row[required_columns["x"]]),
-                        'y': self.number_fix(row[required_columns["y"]]),
-                        'z': self.number_fix(row[required_columns["z"]]),
-                        'pgca_modelled_tonnes': self.number_fix(row[required_columns["tonnes"]]),
-                        'draw_zone': self.number_fix(row[required_columns["draw_zone"]]),
-                        'density': self.number_fix(row[required_columns["density"]]),
-                        'modelled_au': self.number_fix(row[required_columns["au"]]),
-                        'modelled_cu': self.number_fix(row[required_columns["cu"]]),
-                    }
-                )
-
-                if created:
-                    self.rings_created += 1
-                else:
-                    self.rings_updated += 1
-
-            except ValueError as ve:
-                self.logger.warning(f"Skipping row due to ValueError: {ve}")
-                self.warning_msg = f"Rows were skipped due to: {ve}"
-            except Exception as e:
-                self.logger.error(f"Error: {e}")
-                self.error_msg = str(e)
-                self.logger.error(f"Row causing the error: {row}")
-                self.logger.exception("Traceback:")
-                return
+        location_ids = []
+        for i in range(0, len(bs_ids), batch_size):
+            location_ids.extend(m.FlowModelConceptRing.objects.filter(
+                blastsolids_id__in=bs_ids[i:i + batch_size]).values_list('location_id', flat=True))
+
+        self.report_progress('remapping', force=True)
+        stats = BlockAdjacencyFunctions(batch_size).remap_blocks(location_ids)
+        self.blocks_remapped = stats['blocks']
+        self.logger.info(
+            f"Remapped {stats['blocks']} blocks for {stats['changed']} changed, "
+            f"{stats['links']} links in {stats['seconds']}s")
+
+    def report_progress(self, stage, force=False):
+        if self.job:
+            self.job.snapshot(self, stage, force=force)
 
     def has_location_changed(self, existing_record, new_x, new_y, new_z):
         new_x = Decimal(new_x)
@@ -184,60 +225,83 @@ class ConceptRingsFileHandler():
         else:
             return cell
 
-    def update_block_links(self):
-        # Step 1: Delete all existing links
+    def update_block_links(self, batch_size=BULK_BATCH_SIZE):
+        """
+        Replaces the BlockLink rows of every block in the file.
+        All blastsolids ids are resolved to location ids up front, the
+        links are built in memory and each level is rewritten with
+        bulk_create inside its own transaction.
+        """
+        started = time.perf_counter()
+
+        # Step 1: Resolve every id the file mentions in as few queries as possible
+        wanted = set()
         for b in self.succession_data:
-            block_id = b['id']
-
-            # Get the block using its blastsolids_id
-            block = m.FlowModelConceptRing.objects.filter(
-                blastsolids_id=block_id).first()
-            if not block:
-                # Skip if the block doesn't exist
-                continue
-
-            # Delete all existing links for this block (both as block and linked)
-            m.BlockLink.objects.filter(block=block).delete()
-
-        # Step 2: Create new links
+            wanted.add(b['id'])
+            wanted.update(self.split_ids(b['successors']))
+            wanted.update(self.split_ids(b['predecessors']))
+
+        blocks = {}
+        wanted = sorted(wanted)
+        for i in range(0, len(wanted), batch_size):
+            rows = m.FlowModelConceptRing.objects.filter(
+                blastsolids_id__in=wanted[i:i + batch_size]
+            ).order_by('location_id').values_list('blastsolids_id', 'location_id', 'level')
+            for bs_id, location_id, level in rows:
+                # Keep the first match, as .first() did
+                blocks.setdefault(bs_id, (location_id, level))
+
+        # Step 2: Work out the full link set per level
+        links_by_level = {}
         for b in self.succession_data:
-            block_id = b['id']
-
-            # Get the block using its blastsolids_id
-            block = m.FlowModelConceptRing.objects.filter(
-                blastsolids_id=block_id).first()
+            block = blocks.get(b['id'])
             if not block:
                 # Skip if the block doesn't exist
                 continue
-
-            # Create new links for successors
-            if b['successors']:
-                successor_ids = b['successors'].split(';')
-                for succ_id in successor_ids:
-                    successor = m.FlowModelConceptRing.objects.filter(
-                        blastsolids_id=succ_id).first()
-                    if successor:
-                        m.BlockLink.objects.create(
-                            block=block,
-                            linked=successor,
-                            direction='S'
-                        )
-                    else:
-                        print(
-                            f'{b["id"]}: Successor {succ_id} not in concept database.')
-
-            # Create new links for predecessors
-            if b['predecessors']:
-                predecessor_ids = b['predecessors'].split(';')
-                for pred_id in predecessor_ids:
-                    predecessor = m.FlowModelConceptRing.objects.filter(
-                        blastsolids_id=pred_id).first()
-                    if predecessor:
-                        m.BlockLink.objects.create(
-                            block=block,
-                            linked=predecessor,
-                            direction='P'
-                        )
+            block_id, level = block
+            level_links = links_by_level.setdefault(
+                level, {'block_ids': set(), 'links': []})
+            level_links['block_ids'].add(block_id)
+
+            for direction, label, linked_ids in (
+                    ('S', 'Successor', b['successors']),
+                    ('P', 'Predecessor', b['predecessors'])):
+                for linked_id in self.split_ids(linked_ids):
+                    linked = blocks.get(linked_id)
+                    if linked:
+                        level_links['links'].append(m.BlockLink(
+                            block_id=block_id,
+                            linked_id=linked[0],
+                            direction=direction
+                        ))
                     else:
                         print(
-                            f'{b["id"]}: Predecessor {succ_id} not in concept database.')
+                            f'{b["id"]}: {label} {linked_id} not in concept database.')
+
+        # Step 3: Swap the old links for the new ones, one level at a time
+        links_created = 0
+        for level, level_links in links_by_level.items():
+            block_ids = sorted(level_links['block_ids'])
+            with transaction.atomic():
+                for i in range(0, len(block_ids), batch_size):
+                    m.BlockLink.objects.filter(
+                        block_id__in=block_ids[i:i + batch_size]).delete()
+                m.BlockLink.objects.bulk_create(
+                    level_links['links'], batch_size=batch_size)
+            links_created += len(level_links['links'])
+
+        self.links_created = links_created
+        self.logger.info(
+            f"Block links rebuilt: {links_created} links on {len(links_by_level)} levels "
+            f"in {time.perf_counter() - started:.3f}s")
+
+        return {
+            'levels': len(links_by_level),
+            'links': links_created,
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+
+    def split_ids(self, cell):
+        if not cell:
+            return []
+        return [i for i in str(cell).split(';') if i]
@@ -0,0 +1,40 @@
+from django_tasks import task
+
+import prod_concept.models as m
+
+from common.functions.block_adjacency import BlockAdjacencyFunctions
+from common.functions.jobs import run_job
+
+
+@task()
+def import_flow_concept(job_id):
+    def work(tracker):
+        from prod_concept.api.views.upload_concept import ConceptRingsFileHandler
+
+        crfh = ConceptRingsFileHandler()
+        crfh.job = tracker
+        with tracker.open_file('file') as file:
+            return crfh.handle_flow_concept_file(tracker.user, file)
+
+    return run_job(job_id, work)
+
+
+@task()
+def remap_mine(job_id):
+    def work(tracker):
+        baf = BlockAdjacencyFunctions()
+        levels = sorted(m.FlowModelConceptRing.objects.filter(
+            is_active=True).values_list('level', flat=True).distinct())
+
+        links = 0
+        for done, level in enumerate(levels):
+            tracker.update({'stage': 'remapping', 'level': level,
+                            'levels_done': done, 'levels_total': len(levels),
+                            'links_created': links})
+            links += baf.remap_level(level)['links']
+
+        tracker.update({'stage': 'done', 'levels_done': len(levels),
+                        'levels_total': len(levels), 'links_created': links})
+        return {'msg': {'body': f'{len(levels)} levels remapped, {links} links', 'type': 'success'}}
+
+    return run_job(job_id, work)
@@ -1,3 +1,42 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
 
-# Create your tests here.
+import shutil
+import tempfile
+
+from common.models import Job
+from settings.api.functions.project_settings import project_settings
+from users.models import RemoteUser
+
+
+class ConceptUploadJobTests(TestCase):
+    '''
+    The flow concept upload as queued job, run straight away
+    '''
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(
+            MEDIA_ROOT=media,
+            TASKS={'default': {'BACKEND': 'django_tasks.backends.immediate.ImmediateBackend',
+                               'ENQUEUE_ON_COMMIT': False}})
+        override.enable()
+        self.addCleanup(override.disable)
+        project_settings.clear()
+
+        self.client = APIClient()
+        self.client.force_authenticate(RemoteUser.objects.create(id=1, email='user@example.com'))
+
+    def test_failed_upload_fails_the_job(self):
+        # No concept_csv_headers setting, the handler answers with an error
+        file = SimpleUploadedFile('concept.csv', b'a,b\n1,2\n', content_type='text/csv')
+        response = self.client.post('/api/prod-concept/upload/concept/', {'file': file})
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['msg']['type'], 'success')
+        job = Job.objects.get(job_id=response.data['job_id'])
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error, 'CSV file headers blank, see FM Concept tab in settings')
+        self.assertEqual(job.result['msg_type'], 'error')
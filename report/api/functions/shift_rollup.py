@@ -0,0 +1,161 @@
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce
+
+from common.functions.constants import BULK_BATCH_SIZE
+from common.functions.shkey import Shkey
+from datetime import datetime, timedelta
+
+import prod_actual.models as pm
+import report.models as m
+
+
+class ShiftRollup():
+    '''
+    Keeps ShiftProduction, the rings drilled, charged and fired and the
+    tonnes bogged per ore drive per shift, so reports over a range of
+    shifts are one aggregate query instead of scans of ProductionRing.
+
+    Rows are rebuilt whole for each shift that changes, report.signals
+    does this after the ring, state change and bogging writes commit.
+    backfill_shift_production rebuilds them from history.
+    '''
+    GROUPS = {
+        'total': [],
+        'level': ['level'],
+        'drive': ['level', 'oredrive'],
+        'shift': ['shkey'],
+    }
+    PERIODS = ['wtd', 'mtd', 'r28']
+    COUNTS = ['rings_drilled', 'rings_charged', 'rings_fired']
+    TOTALS = ['rings_drilled', 'drilled_mtrs', 'rings_charged', 'rings_fired',
+              'fired_tonnes', 'bogged_tonnes', 'bogged_au_tonnes', 'bogged_cu_tonnes']
+
+    def refresh(self, shkeys):
+        '''
+        Rebuilds the rows of the shifts, returns how many rows they have now
+        '''
+        shkeys = sorted(set(shkey for shkey in shkeys if shkey))
+        created = 0
+        for i in range(0, len(shkeys), BULK_BATCH_SIZE):
+            chunk = shkeys[i:i + BULK_BATCH_SIZE]
+            rows = self.build(chunk)
+            with transaction.atomic():
+                m.ShiftProduction.objects.filter(shkey__in=chunk).delete()
+                m.ShiftProduction.objects.bulk_create(
+                    rows, batch_size=BULK_BATCH_SIZE)
+            created += len(rows)
+        return created
+
+    def backfill(self):
+        # Every shift anything was drilled, charged, fired or bogged on
+        shkeys = set()
+        for field in ('drill_complete_shift', 'charge_shift', 'fired_shift'):
+            shkeys.update(pm.ProductionRing.objects.exclude(**{f'{field}__isnull': True}).exclude(
+                **{field: ''}).order_by().values_list(field, flat=True).distinct())
+        shkeys.update(pm.BoggedTonnesShift.objects.order_by().values_list(
+            'shkey', flat=True).distinct())
+        return len(shkeys), self.refresh(shkeys)
+
+    def build(self, shkeys):
+        rows = {}
+
+        def row(level, oredrive, shkey):
+            key = (level, oredrive, shkey)
+            if key not in rows:
+                rows[key] = m.ShiftProduction(
+                    level=level, oredrive=oredrive, shkey=shkey)
+            return rows[key]
+
+        rings = pm.ProductionRing.objects.order_by()
+        for drilled in (rings.filter(drill_complete_shift__in=shkeys)
+                        .values('level', 'oredrive', 'drill_complete_shift')
+                        .annotate(rings=Count('location_id'),
+                                  mtrs=Sum(Coalesce('drilled_meters', 'drill_meters')))):
+            r = row(drilled['level'], drilled['oredrive'], drilled['drill_complete_shift'])
+            r.rings_drilled = drilled['rings']
+            r.drilled_mtrs = drilled['mtrs'] or 0
+
+        for charged in (rings.filter(charge_shift__in=shkeys)
+                        .values('level', 'oredrive', 'charge_shift')
+                        .annotate(rings=Count('location_id'))):
+            r = row(charged['level'], charged['oredrive'], charged['charge_shift'])
+            r.rings_charged = charged['rings']
+
+        for fired in (rings.filter(fired_shift__in=shkeys)
+                      .values('level', 'oredrive', 'fired_shift')
+                      .annotate(rings=Count('location_id'), tonnes=Sum('designed_tonnes'))):
+            r = row(fired['level'], fired['oredrive'], fired['fired_shift'])
+            r.rings_fired = fired['rings']
+            r.fired_tonnes = fired['tonnes'] or 0
+
+        for bogged in (pm.BoggedTonnesShift.objects.order_by()
+                       .filter(shkey__in=shkeys)
+                       .values('production_ring__level', 'production_ring__oredrive', 'shkey')
+                       .annotate(tonnes=Sum('bogged_tonnes'),
+                                 au=Sum(F('bogged_tonnes') * F('production_ring__concept_ring__modelled_au')),
+                                 cu=Sum(F('bogged_tonnes') * F('production_ring__concept_ring__modelled_cu')))):
+            r = row(bogged['production_ring__level'],
+                    bogged['production_ring__oredrive'], bogged['shkey'])
+            r.bogged_tonnes = bogged['tonnes'] or 0
+            r.bogged_au_tonnes = bogged['au'] or 0
+            r.bogged_cu_tonnes = bogged['cu'] or 0
+
+        return list(rows.values())
+
+    def shkeys_of_rings(self, location_ids):
+        shkeys = set()
+        location_ids = list(location_ids)
+        for i in range(0, len(location_ids), BULK_BATCH_SIZE):
+            chunk = location_ids[i:i + BULK_BATCH_SIZE]
+            for shifts in pm.ProductionRing.objects.filter(location_id__in=chunk).values_list(
+                    'drill_complete_shift', 'charge_shift', 'fired_shift'):
+                shkeys.update(shifts)
+            shkeys.update(pm.BoggedTonnesShift.objects.filter(
+                production_ring_id__in=chunk).values_list('shkey', flat=True))
+        shkeys.discard(None)
+        return shkeys
+
+    def period_range(self, period, now=None):
+        '''
+        First and last shkey of wtd (from Monday), mtd or r28 (the last
+        28 days), up to the current shift
+        '''
+        now = now or datetime.now()
+        end = Shkey.datetime_to_shkey(now)
+        today = datetime.strptime(end[:8], '%Y%m%d').date()
+        if period == 'wtd':
+            start = today - timedelta(days=today.weekday())
+        elif period == 'mtd':
+            start = today.replace(day=1)
+        elif period == 'r28':
+            start = today - timedelta(days=27)
+        else:
+            raise ValueError(f"Unknown period '{period}'")
+        return Shkey.generate_shkey(start, 'D'), end
+
+    def get_range(self, start, end, group='drive'):
+        '''
+        Totals of the shifts start to end, inclusive, per group
+        '''
+        fields = self.GROUPS[group]
+        shifts = m.ShiftProduction.objects.filter(shkey__gte=start, shkey__lte=end)
+        sums = {name: Sum(name) for name in self.TOTALS}
+        if fields:
+            rows = list(shifts.values(*fields).annotate(**sums).order_by(*fields))
+        else:
+            rows = [shifts.aggregate(**sums)]
+
+        for row in rows:
+            for name in self.TOTALS:
+                row[name] = row[name] or 0
+                if name not in self.COUNTS:
+                    row[name] = float(row[name])
+            # grades weighted by bogged tonnes
+            tonnes = row['bogged_tonnes']
+            au_tonnes = row.pop('bogged_au_tonnes')
+            cu_tonnes = row.pop('bogged_cu_tonnes')
+            row['bogged_au'] = round(au_tonnes / tonnes, 3) if tonnes else None
+            row['bogged_cu'] = round(cu_tonnes / tonnes, 3) if tonnes else None
+
+        return {'start': start, 'end': end, 'group': group, 'results': rows}
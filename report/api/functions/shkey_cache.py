@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.utils.encoders import JSONEncoder
+
+from common.functions.constants import BULK_BATCH_SIZE
+from common.functions.shkey import Shkey
+from datetime import datetime, timedelta
+
+import json
+import report.models as m
+
+
+class ShkeyReportCache():
+    '''
+    Reports addressed by shift.
+
+    A report whose shifts have all finished is built once and stored as a
+    JsonReport (for_date: its last shkey, expiry: the shkey it may be
+    purged after, see purge_report_snapshots). The current shift is still
+    changing, so its reports are rebuilt on request and only held in the
+    Django cache for a short while.
+    '''
+    PREFIX = 'shift'
+
+    def __init__(self):
+        self.ttl = getattr(settings, 'REPORT_CURRENT_SHIFT_TTL', 60)
+        self.keep_days = getattr(settings, 'REPORT_SNAPSHOT_DAYS', 90)
+
+    def get(self, report, shkey, build, *params):
+        '''
+        report: name of the report, params: anything else the output
+        depends on. build() makes the report when it isn't cached.
+        '''
+        if not shkey:
+            return build()
+
+        name = ':'.join([self.PREFIX, report] + [str(p) for p in params])
+        if shkey >= self.current_shkey():
+            key = f'{name}:{shkey}'
+            data = cache.get(key)
+            if data is None:
+                data = self.as_json(build())
+                cache.set(key, data, self.ttl)
+            return data
+
+        snapshot = m.JsonReport.objects.filter(
+            name=name, for_date=shkey).order_by('-datetime_stamp').first()
+        if snapshot:
+            return snapshot.report
+
+        data = self.as_json(build())
+        m.JsonReport.objects.create(
+            name=name, report=data, for_date=shkey, expiry=self.expiry(shkey))
+        return data
+
+    def invalidate(self, shkeys):
+        '''
+        Drops the snapshots of the days of the shkeys, after a late edit
+        to a closed shift. Current shift reports just age out of the cache.
+        '''
+        # Snapshots are stored against their shkey, both shifts of the day go
+        shifts = sorted(set(f'{shkey[:8]}{p}' for shkey in shkeys if shkey for p in ('P1', 'P2')))
+        for i in range(0, len(shifts), BULK_BATCH_SIZE):
+            m.JsonReport.objects.filter(
+                name__startswith=f'{self.PREFIX}:',
+                for_date__in=shifts[i:i + BULK_BATCH_SIZE]).delete()
+
+    def invalidate_all(self):
+        # After a write to rings not known one by one
+        m.JsonReport.objects.filter(name__startswith=f'{self.PREFIX}:').delete()
+
+    def purge(self):
+        # Snapshots past their expiry, returns how many were removed
+        deleted, _ = m.JsonReport.objects.filter(
+            name__startswith=f'{self.PREFIX}:', expiry__lt=self.current_shkey()).delete()
+        return deleted
+
+    def current_shkey(self):
+        return Shkey.datetime_to_shkey(datetime.now())
+
+    def expiry(self, shkey):
+        day = datetime.strptime(shkey[:8], '%Y%m%d').date()
+        shift = 'N' if shkey[9] == '2' else 'D'
+        return Shkey.generate_shkey(day + timedelta(days=self.keep_days), shift)
+
+    def as_json(self, data):
+        # Stored reports come back as they would be rendered
+        return json.loads(json.dumps(data, cls=JSONEncoder))
@@ -15,4 +15,6 @@ urlpatterns = [
     path('prod/level-status/', LevelStatusReportView.as_view(), name='level-status'),
     path('prod/level-status/create/',
          LevelStatusCreateReportView.as_view(), name='level-status-create'),
+    path('prod/shift-production/', p.ShiftProductionView.as_view(),
+         name='shift-production'),
 ]
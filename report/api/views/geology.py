@@ -9,6 +9,7 @@ from common.functions.shkey import Shkey
 
 from settings.models import ProjectSetting
 from report.models import JsonReport
+from report.api.functions.shkey_cache import ShkeyReportCache
 
 from django.db.models import F, ExpressionWrapper, fields
 from django.db.models.functions import Power, Sqrt
@@ -34,6 +35,10 @@ class GeoReporting():
         if not date:
             date = datetime.now().date() - timedelta(days=1)
 
+        shkey_night = Shkey.generate_shkey(date1=date, dn='n')
+        return ShkeyReportCache().get('fired_grade', shkey_night, lambda: self.build_fired_rings(date))
+
+    def build_fired_rings(self, date):
         shkey_day = Shkey.generate_shkey(date1=date, dn='d')
         shkey_night = Shkey.generate_shkey(date1=date, dn='n')
 
@@ -1,16 +1,18 @@
 from django.shortcuts import render
 from django.core.serializers.json import DjangoJSONEncoder
-from django.db import DatabaseError, IntegrityError
-from django.db.models import Sum
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Sum, Prefetch, prefetch_related_objects
 
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
 from common.functions.common_methods import CommonMethods
+from common.functions.constants import BULK_BATCH_SIZE
 from common.functions.shkey import Shkey
 
 from datetime import timedelta, datetime, date
+from decimal import Decimal
 from itertools import groupby
 from operator import attrgetter
 
@@ -22,7 +24,12 @@ import json
 class LevelStatusReportView(APIView):
     def get(self, request, *args, **kwargs):
         lsr = LevelStatusReport()
-        report = lsr.fetch_ls_report()
+        # live: rebuild the drives that changed instead of the stored report
+        live_param = request.query_params.get('live', 'false').lower()
+        if live_param in ('true', '1'):
+            report = lsr.live_ls_report()
+        else:
+            report = lsr.fetch_ls_report()
         return Response(report, status=status.HTTP_200_OK)
 
 
@@ -32,9 +39,13 @@ class LevelStatusCreateReportView(APIView):
         draft_param = request.query_params.get('draft', 'false').lower()
         is_draft = draft_param in ('true', '1')
 
+        incremental_param = request.query_params.get(
+            'incremental', 'false').lower()
+
         # Instantiate your report and set the flag
         lsr = LevelStatusReport()
         lsr.is_draft = is_draft
+        lsr.incremental = incremental_param in ('true', '1')
 
         # Call whatever logic generates/saves your report
         reply = lsr.create_ls_report(request)
@@ -47,6 +58,10 @@ class LevelStatusReport():
         self.active_levels = set()
         self.active_drives = []
         self.is_draft = None
+        # incremental: only drives marked dirty are rebuilt, see refresh_fragments
+        self.incremental = False
+        # (level, oredrive): active rings, filled by load_rings
+        self.drive_rings = {}
 
         # shared attributes
         self.level = None
@@ -117,21 +132,42 @@ class LevelStatusReport():
             print(f"An error occurred: {str(e)}")
             return {'msg': {'body': 'An error occurred', 'type': 'error'}}
 
+    def live_ls_report(self):
+        # Not stored, the fragments are
+        self.incremental = True
+        return {
+            'author': None,
+            'report_date': datetime.now().strftime('%d/%m/%Y %I:%M %p'),
+            'shift': "Nightshift" if datetime.now().hour >= 12 else "Dayshift",
+            'report': self.list_active_rings(),
+            'is_draft': True,
+            'is_live': True,
+        }
+
     def delete_ls_report(self):
         m.JsonReport.objects.filter(name="Prod Level Status Report").delete()
 
-    def list_active_rings(self):
-        # Step 1: Query the data
+    def get_active_drives(self):
         current_rings = pm.ProductionRing.objects.filter(is_active=True, status='Bogging').values(
             'level', 'oredrive').distinct().order_by('level', 'oredrive')
+        return [(ring['level'], ring['oredrive']) for ring in current_rings]
+
+    def list_active_rings(self):
+        # Step 1: Query the data
+        if self.incremental:
+            drives = [(f.level, f.drive) for f in self.refresh_fragments()]
+        else:
+            active_drives = self.get_active_drives()
+            # Everything the drives need, in a few queries
+            self.load_rings(active_drives)
+            drives = [(level, self.oredrive_status(level, oredrive))
+                      for level, oredrive in active_drives]
 
         # Step 2: Structure the data by levels
         report_data = []
         level_data = {}
 
-        for ring in current_rings:
-            level = ring['level']
-            oredrive = ring['oredrive']
+        for level, drive in drives:
 
             # Check if the current level is already in level_data
             if level not in level_data:
@@ -144,22 +180,96 @@ class LevelStatusReport():
                 report_data.append(level_data[level])
 
             # Append the oredrive status to the 'ore_drives' array
-            drive = self.oredrive_status(level, oredrive)
             level_data[level]['ore_drives'].append(drive)
 
-            if drive['bogging']['avail_tonnes'] > 0:
-                level_data[level]['broken_stock'] += abs(drive['bogging']['avail_tonnes'])
+            # Fragments hold the tonnes as text, Decimal keeps them exact
+            avail_tonnes = Decimal(str(drive['bogging']['avail_tonnes']))
+            if avail_tonnes > 0:
+                level_data[level]['broken_stock'] += abs(avail_tonnes)
 
         # Step 3: Convert the structured data to JSON
         report_json = json.dumps(report_data, cls=DjangoJSONEncoder, indent=4)
 
         return report_json
 
+    def refresh_fragments(self):
+        '''
+        Rebuilds the LevelStatusFragment of every active drive that is
+        new or marked dirty, drops those of drives no longer bogging and
+        returns the fragments in report order
+        '''
+        active_drives = self.get_active_drives()
+        fragments = {(f.level, f.oredrive): f for f in m.LevelStatusFragment.objects.all()}
+
+        missing = [key for key in active_drives if key not in fragments]
+        if missing:
+            try:
+                with transaction.atomic():
+                    m.LevelStatusFragment.objects.bulk_create(
+                        [m.LevelStatusFragment(level=level, oredrive=oredrive)
+                         for level, oredrive in missing], batch_size=BULK_BATCH_SIZE)
+            except IntegrityError:
+                # another build got there first
+                pass
+            fragments = {(f.level, f.oredrive): f for f in m.LevelStatusFragment.objects.all()}
+
+        stale = [key for key in active_drives if fragments[key].is_dirty]
+        self.load_rings(stale)
+        for level, oredrive in stale:
+            fragment = fragments[(level, oredrive)]
+            version = fragment.version
+            drive = json.loads(json.dumps(
+                self.oredrive_status(level, oredrive), cls=DjangoJSONEncoder))
+            fragment.drive = drive
+            # A change since it was read keeps it dirty for the next build
+            clean = m.LevelStatusFragment.objects.filter(
+                pk=fragment.pk, version=version).update(drive=drive, is_dirty=False)
+            if not clean:
+                m.LevelStatusFragment.objects.filter(
+                    pk=fragment.pk).update(drive=drive)
+
+        active = set(active_drives)
+        gone = [f.pk for key, f in fragments.items() if key not in active]
+        for i in range(0, len(gone), BULK_BATCH_SIZE):
+            m.LevelStatusFragment.objects.filter(
+                pk__in=gone[i:i + BULK_BATCH_SIZE]).delete()
+
+        return [fragments[key] for key in active_drives]
+
+    def load_rings(self, drives):
+        '''
+        Loads the active rings of the drives [(level, oredrive), ...] with
+        their concept ring and active conditions, so the report needs no
+        queries per ring
+        '''
+        wanted = set(drives)
+        rings = (pm.ProductionRing.objects
+                 .filter(is_active=True,
+                         level__in=set(level for level, _ in wanted),
+                         oredrive__in=set(oredrive for _, oredrive in wanted))
+                 .select_related('concept_ring')
+                 .order_by('level', 'oredrive', 'status', 'location_id'))
+        rings = [ring for ring in rings if (ring.level, ring.oredrive) in wanted]
+
+        conditions = Prefetch(
+            'ringstatechange_set',
+            queryset=pm.RingStateChange.objects.filter(
+                is_active=True).select_related('state').order_by('ring_state_id'),
+            to_attr='active_conditions')
+        for i in range(0, len(rings), BULK_BATCH_SIZE):
+            prefetch_related_objects(rings[i:i + BULK_BATCH_SIZE], conditions)
+
+        for key in wanted:
+            self.drive_rings[key] = []
+        for ring in rings:
+            self.drive_rings[(ring.level, ring.oredrive)].append(ring)
+
     def oredrive_status(self, level, oredrive):
         drive = {}
 
-        od_rings = pm.ProductionRing.objects.filter(
-            is_active=True, level=level, oredrive=oredrive).order_by('status')
+        if (level, oredrive) not in self.drive_rings:
+            self.load_rings([(level, oredrive)])
+        od_rings = self.drive_rings[(level, oredrive)]
 
         for status, group in groupby(od_rings, key=attrgetter('status')):
             rings = list(group)
@@ -197,8 +307,8 @@ class LevelStatusReport():
             rings, key=lambda r: r.drill_complete_shift or "")
         for ring in sorted_rings:
             drilled['last_drilled'] = ring.ring_number_txt
-            prob = pm.RingStateChange.objects.filter(
-                is_active=True, prod_ring=ring, state__pri_state='Drilled', state__sec_state='Blocked Holes')
+            prob = [c for c in ring.active_conditions
+                    if c.state.pri_state == 'Drilled' and c.state.sec_state == 'Blocked Holes']
             for p in prob:
                 drilled['problem_rings'].append(
                     {'ring_number_txt': ring.ring_number_txt, 'condition': 'Blocked Holes', 'location_id': ring.location_id})
@@ -280,11 +390,8 @@ class LevelStatusReport():
         return bogging
 
     def get_bogged_tonnes(self, ring):
-        result = pm.BoggedTonnes.objects.filter(production_ring=ring).aggregate(
-            total_bogged_tonnes=Sum('bogged_tonnes'))
-
-        # result will be a dictionary with 'total_bogged_tonnes' key, return the value or 0 if None
-        return result['total_bogged_tonnes'] or 0
+        # running total kept by BoggingLedger
+        return ring.bogged_tonnes or 0
 
     def is_overslept_ring(self, ring):
         # charge_shift is a shkey
@@ -297,10 +404,8 @@ class LevelStatusReport():
 
     def get_ring_conditions(self, ring):
         cond_list = []
-        active_cond = pm.RingStateChange.objects.filter(
-            is_active=True, prod_ring=ring)
 
-        for c in active_cond:
+        for c in ring.active_conditions:
             condition = c.state.sec_state
             if condition:  # skips None, '', 0, and other falsy values
                 cond_list.append(condition)
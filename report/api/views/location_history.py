@@ -7,7 +7,6 @@ from prod_actual.api.serializers import RingStateChangeSerializer
 from operator import itemgetter
 from collections import defaultdict
 from common.functions.shkey import Shkey
-from prod_actual.api.views.ring_state import ConditionsAndStates
 
 
 class LocationHistoryView(APIView):
@@ -15,8 +14,6 @@ class LocationHistoryView(APIView):
         ring = get_object_or_404(ProductionRing, location_id=location_id)
 
         # 1. State Changes (use SHKEY as-is)
-        cas = ConditionsAndStates()
-        cas.ensure_mandatory_ring_states()
         state_changes = RingStateChange.objects.filter(
             is_active=True,
             prod_ring=ring,
@@ -8,6 +8,9 @@ from datetime import datetime, timedelta
 import prod_actual.models as pm
 import report.api.serializers as s
 
+from report.api.functions.shift_rollup import ShiftRollup
+from report.api.functions.shkey_cache import ShkeyReportCache
+
 
 class DCFReportView(APIView):
     def post(self, request, *args, **kwargs):
@@ -27,6 +30,37 @@ class BogVerifyReportView(APIView):
         return Response(tonnes, status=status.HTTP_200_OK)
 
 
+class ShiftProductionView(APIView):
+    '''
+    Production totals over a range of shifts.
+    ?period=wtd|mtd|r28, or ?start= and ?end= dates (end inclusive),
+    ?group=total|level|drive|shift (default drive)
+    '''
+
+    def get(self, request, *args, **kwargs):
+        rollup = ShiftRollup()
+        period = request.query_params.get('period')
+        group = request.query_params.get('group', 'drive')
+
+        if group not in rollup.GROUPS:
+            return Response({'msg': {'body': f"Unknown group '{group}'", 'type': 'error'}},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if period:
+            if period not in rollup.PERIODS:
+                return Response({'msg': {'body': f"Unknown period '{period}'", 'type': 'error'}},
+                                status=status.HTTP_400_BAD_REQUEST)
+            start, end = rollup.period_range(period)
+        else:
+            start = Shkey.generate_shkey(request.query_params.get('start'), 'D')
+            end = Shkey.generate_shkey(request.query_params.get('end'), 'N')
+            if not start or not end:
+                return Response({'msg': {'body': 'A period or start and end dates are required', 'type': 'error'}},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(rollup.get_range(start, end, group), status=status.HTTP_200_OK)
+
+
 class DataDupeView(APIView):
     def get(self, request, *args, **kwargs):
         rings = ProdReporting().get_dupe_rings()
@@ -42,6 +76,11 @@ class ProdReporting():
         if not date:
             date = datetime.now().date() - timedelta(days=1)
 
+        # Keyed by the night shift, the day's report is final once it ends
+        shkey_night = Shkey.generate_shkey(date1=date, dn='n')
+        return ShkeyReportCache().get('dcf', shkey_night, lambda: self.build_dcf_rings(date))
+
+    def build_dcf_rings(self, date):
         shkey_day = Shkey.generate_shkey(date1=date, dn='d')
         shkey_night = Shkey.generate_shkey(date1=date, dn='n')
         shkeys = [shkey_day, shkey_night]
@@ -90,7 +129,11 @@ class ProdReporting():
         date = data.get('date')
         shift = data.get('shift')
         shkey = Shkey.generate_shkey(date, shift)
+        # shift is echoed in the results, so it's part of the key
+        return ShkeyReportCache().get('bog_tonnes', shkey,
+                                      lambda: self.build_bog_tonnes_shift(shkey, shift), shift)
 
+    def build_bog_tonnes_shift(self, shkey, shift):
         bogged_entries = pm.BoggedTonnes.objects.select_related(
             'production_ring').filter(shkey=shkey)
 
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from report.api.functions.shift_rollup import ShiftRollup
+
+
+class Command(BaseCommand):
+    help = "Rebuilds ShiftProduction from ProductionRing and BoggedTonnesShift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shkey', action='append', dest='shkeys',
+                            help='shkey of a shift to rebuild, repeatable (default all)')
+
+    def handle(self, *args, **options):
+        rollup = ShiftRollup()
+        if options['shkeys']:
+            shifts, rows = len(set(options['shkeys'])), rollup.refresh(options['shkeys'])
+        else:
+            shifts, rows = rollup.backfill()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt shift production: {shifts} shifts, {rows} rows"))
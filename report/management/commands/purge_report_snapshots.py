@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from report.api.functions.shkey_cache import ShkeyReportCache
+
+
+class Command(BaseCommand):
+    help = "Deletes shift report snapshots past their expiry shkey"
+
+    def handle(self, *args, **options):
+        deleted = ShkeyReportCache().purge()
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} report snapshots"))
@@ -17,6 +17,46 @@ class JsonReport(models.Model):
         return self.name
 
 
+class LevelStatusFragment(models.Model):
+    # One ore drive of the level status report, kept for incremental builds
+    level = models.SmallIntegerField()
+    oredrive = models.CharField(max_length=50)
+    drive = JSONField(blank=True, null=True)
+    is_dirty = models.BooleanField(default=True)
+    # bumped on every change, a rebuild only clears the flag if unchanged
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('level', 'oredrive')
+
+
+class ShiftProduction(models.Model):
+    # Production per ore drive per shift, kept by ShiftRollup for range reports
+    level = models.SmallIntegerField()
+    oredrive = models.CharField(max_length=50)
+    shkey = models.CharField(max_length=10)
+    rings_drilled = models.PositiveIntegerField(default=0)
+    drilled_mtrs = models.DecimalField(
+        max_digits=10, decimal_places=1, default=0)
+    rings_charged = models.PositiveIntegerField(default=0)
+    rings_fired = models.PositiveIntegerField(default=0)
+    # designed tonnes of the rings fired
+    fired_tonnes = models.DecimalField(
+        max_digits=10, decimal_places=1, default=0)
+    bogged_tonnes = models.DecimalField(
+        max_digits=10, decimal_places=1, default=0)
+    # bogged tonnes x modelled grade of the ring, divide by bogged_tonnes for the grade
+    bogged_au_tonnes = models.DecimalField(
+        max_digits=12, decimal_places=3, default=0)
+    bogged_cu_tonnes = models.DecimalField(
+        max_digits=12, decimal_places=3, default=0)
+
+    class Meta:
+        unique_together = ('level', 'oredrive', 'shkey')
+        indexes = [models.Index(fields=['shkey'])]
+
+
 class Lock(models.Model):
     item = models.CharField(max_length=250, unique=True)
     locked = models.BooleanField(default=False)
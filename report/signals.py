@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+import prod_actual.models as pm
+import report.models as m
+import threading
+
+from common.functions.constants import BULK_BATCH_SIZE
+from report.api.functions.shift_rollup import ShiftRollup
+from report.api.functions.shkey_cache import ShkeyReportCache
+from common.signals import in_bulk_write, production_data_changed
+
+
+def mark_drives_dirty(drives):
+    # drives: [(level, oredrive), ...] whose level status fragment is stale
+    for level, oredrive in set(drives):
+        m.LevelStatusFragment.objects.filter(level=level, oredrive=oredrive).update(
+            is_dirty=True, version=F('version') + 1)
+
+
+def drives_of_rings(location_ids):
+    drives = set()
+    location_ids = list(location_ids)
+    for i in range(0, len(location_ids), BULK_BATCH_SIZE):
+        drives.update(pm.ProductionRing.objects.filter(
+            location_id__in=location_ids[i:i + BULK_BATCH_SIZE]).values_list('level', 'oredrive'))
+    return drives
+
+
+class PendingRefresh(threading.local):
+    # The shkeys waiting for the open transaction to commit
+    hooks = None
+    shkeys = None
+
+
+pending = PendingRefresh()
+
+
+def refresh_shift_production(shkeys):
+    '''
+    Refreshes the shifts once the write commits, so the rollup reads what
+    was saved. Every write in a transaction adds to one refresh.
+    '''
+    shkeys = set(shkey for shkey in shkeys if shkey)
+    if not shkeys:
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        ShiftRollup().refresh(shkeys)
+        return
+    # The hook list is replaced once the transaction commits or rolls back
+    if pending.hooks is not connection.run_on_commit:
+        batch = set()
+        transaction.on_commit(lambda: ShiftRollup().refresh(batch))
+        pending.hooks = connection.run_on_commit
+        pending.shkeys = batch
+    pending.shkeys.update(shkeys)
+
+
+@receiver(post_save, sender=pm.ProductionRing)
+@receiver(post_delete, sender=pm.ProductionRing)
+def ring_changed(sender, instance, **kwargs):
+    if in_bulk_write():
+        return
+    mark_drives_dirty([(instance.level, instance.oredrive)])
+    shkeys = [instance.drill_complete_shift, instance.charge_shift, instance.fired_shift]
+    ShkeyReportCache().invalidate(shkeys)
+    refresh_shift_production(shkeys)
+
+
+@receiver(post_save, sender=pm.RingStateChange)
+@receiver(post_delete, sender=pm.RingStateChange)
+def ring_state_changed(sender, instance, **kwargs):
+    if in_bulk_write():
+        return
+    mark_drives_dirty(drives_of_rings([instance.prod_ring_id]))
+    # Undoing a drill, charge or firing clears the ring's shift, the change keeps it
+    ShkeyReportCache().invalidate([instance.shkey])
+    refresh_shift_production([instance.shkey])
+
+
+@receiver(post_save, sender=pm.BoggedTonnes)
+@receiver(post_delete, sender=pm.BoggedTonnes)
+def bogged_tonnes_changed(sender, instance, **kwargs):
+    if in_bulk_write():
+        return
+    mark_drives_dirty(drives_of_rings([instance.production_ring_id]))
+    ShkeyReportCache().invalidate([instance.shkey])
+    refresh_shift_production([instance.shkey])
+
+
+@receiver(production_data_changed)
+def production_data_bulk_changed(sender, location_ids=None, shkeys=None, **kwargs):
+    if location_ids is None:
+        m.LevelStatusFragment.objects.update(
+            is_dirty=True, version=F('version') + 1)
+        ShkeyReportCache().invalidate_all()
+        transaction.on_commit(ShiftRollup().backfill)
+    else:
+        mark_drives_dirty(drives_of_rings(location_ids))
+        shkeys = set(shkeys or []) | ShiftRollup().shkeys_of_rings(location_ids)
+        ShkeyReportCache().invalidate(shkeys)
+        refresh_shift_production(shkeys)
@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.db.models import F
+from types import MappingProxyType
+
+import copy
+import settings.models as m
+import threading
+import time
+
+
+class SettingsSnapshot():
+    '''
+    Every ProjectSetting as of one SettingsVersion, read only
+    '''
+
+    def __init__(self, version, values):
+        self.version = version
+        self.values = MappingProxyType(dict(values))
+
+    def __contains__(self, key):
+        return key in self.values
+
+    def get(self, key, default=None):
+        # A copy, so a caller changing the value can't change the snapshot
+        if key not in self.values:
+            return default
+        return copy.deepcopy(self.values[key])
+
+
+class ProjectSettings():
+    '''
+    The project settings of this process, loaded in one query and kept
+    until a write bumps SettingsVersion.
+
+    The version is compared, one small query, the first time settings are
+    read in a request (see settings.middleware) and otherwise every
+    PROJECT_SETTINGS_MAX_AGE seconds, so workers pick up changes as well.
+    Reads in between cost no queries.
+    '''
+
+    def __init__(self):
+        self.snapshot = None
+        self.checked_at = 0.0
+        self.stale = False
+        self.lock = threading.Lock()
+
+    @property
+    def max_age(self):
+        return getattr(settings, 'PROJECT_SETTINGS_MAX_AGE', 5)
+
+    def current(self):
+        snapshot = self.snapshot
+        if snapshot is not None and not self.stale and \
+                time.monotonic() - self.checked_at < self.max_age:
+            return snapshot
+
+        with self.lock:
+            if self.snapshot is None or self.stale or \
+                    time.monotonic() - self.checked_at >= self.max_age:
+                version = self.db_version()
+                if self.snapshot is None or self.snapshot.version != version:
+                    # The version is read first, a write in between only
+                    # means another load next time
+                    self.snapshot = SettingsSnapshot(
+                        version, m.ProjectSetting.objects.values_list('key', 'value'))
+                self.checked_at = time.monotonic()
+                self.stale = False
+            return self.snapshot
+
+    def db_version(self):
+        return m.SettingsVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+    def mark_stale(self):
+        # Compare the version before the next read
+        self.stale = True
+
+    def clear(self):
+        self.snapshot = None
+
+    def bump_version(self):
+        # In the transaction of the write, other processes see it on commit
+        if not m.SettingsVersion.objects.filter(pk=1).update(version=F('version') + 1):
+            m.SettingsVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+
+    def get(self, key, default=None):
+        return self.current().get(key, default)
+
+    def get_dict(self, key):
+        value = self.get(key)
+        return value if isinstance(value, dict) else {}
+
+    def get_float(self, key, field=None, default=None):
+        '''
+        The setting, or its field when it is a dict, as a float. default
+        when it is missing or not a number.
+        '''
+        value = self.get(key)
+        if field is not None:
+            value = value.get(field) if isinstance(value, dict) else None
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return default
+
+
+project_settings = ProjectSettings()
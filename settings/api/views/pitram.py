@@ -7,6 +7,8 @@ from rest_framework.response import Response
 import settings.models as m
 import settings.api.serializers as s
 
+from settings.api.functions.project_settings import project_settings
+
 
 class PitramConnectionParamsView(APIView):
     """
@@ -24,15 +26,16 @@ class PitramConnectionParamsView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def get(self, request, key, *args, **kwargs):
-        try:
-            setting = m.ProjectSetting.objects.get(key=key)
-            serializer = s.PitramConnectionSerializer(
-                instance=setting, data=setting.value)
-            serializer.is_valid(raise_exception=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except m.ProjectSetting.DoesNotExist:
+        value = project_settings.get(key)
+        if value is None:
             return Response({'msg': 'Setting not found'}, status=status.HTTP_404_NOT_FOUND)
 
+        setting = m.ProjectSetting(key=key, value=value)
+        serializer = s.PitramConnectionSerializer(
+            instance=setting, data=setting.value)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
     def put(self, request, key, *args, **kwargs):
         try:
             setting = m.ProjectSetting.objects.get(key=key)
@@ -0,0 +1,16 @@
+from settings.api.functions.project_settings import project_settings
+
+
+class ProjectSettingsMiddleware():
+    '''
+    Has the process's project settings checked against SettingsVersion
+    the first time a request reads them, so a change made through
+    another process is seen from the next request on
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        project_settings.mark_stale()
+        return self.get_response(request)
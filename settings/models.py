@@ -17,3 +17,13 @@ class ProjectSetting(models.Model):
     class Meta:
         verbose_name = "App Setting"
         verbose_name_plural = "Cave Manager Settings"
+
+
+class SettingsVersion(models.Model):
+    # One row, bumped on every ProjectSetting write so each process can
+    # tell its snapshot of the settings is out of date
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Settings version {self.version}'
@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+import settings.models as m
+
+from settings.api.functions.project_settings import project_settings
+
+
+@receiver(post_save, sender=m.ProjectSetting)
+@receiver(post_delete, sender=m.ProjectSetting)
+def project_setting_changed(sender, instance, **kwargs):
+    project_settings.bump_version()
+    transaction.on_commit(project_settings.clear)
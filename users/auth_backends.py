@@ -2,6 +2,7 @@ import requests
 from django.conf import settings
 from django.contrib.auth.backends import BaseBackend
 from users.models import RemoteUser
+from users.utils import auth_session
 
 
 class RemoteAuthBackend(BaseBackend):
@@ -13,7 +14,7 @@ class RemoteAuthBackend(BaseBackend):
         # POST to your auth-server’s login endpoint:
         try:
             url = settings.AUTH_SERVER_URL.rstrip('/') + '/users/login/'
-            resp = requests.post(
+            resp = auth_session.post(
                 url,
                 json={'email': username, 'password': password},
                 timeout=5
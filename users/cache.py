@@ -0,0 +1,113 @@
+from collections import OrderedDict
+from django.conf import settings
+from django.db import connections
+
+import copy
+import logging
+import threading
+import time
+
+from users.utils import get_or_create_remote_user
+
+logger = logging.getLogger(__name__)
+
+
+class Flight():
+    # One load of a user, the callers that arrive meanwhile wait for it
+    def __init__(self):
+        self.done = threading.Event()
+        self.user = None
+        self.error = None
+
+
+class RemoteUserCache():
+    '''
+    RemoteUser rows of the users making requests, by the token's user id,
+    kept for REMOTE_USER_CACHE_TTL seconds and at most REMOTE_USER_CACHE_SIZE
+    of them, least recently used dropped first.
+
+    A user is loaded once however many of their requests arrive together,
+    the rest wait for that load. Past its TTL a user is still returned while
+    one background thread reloads it. Saving or deleting a RemoteUser drops
+    it (users.signals).
+    '''
+
+    def __init__(self, ttl=None, size=None):
+        self.ttl = ttl if ttl is not None else getattr(settings, 'REMOTE_USER_CACHE_TTL', 60)
+        self.size = size or getattr(settings, 'REMOTE_USER_CACHE_SIZE', 1000)
+        self.users = OrderedDict()
+        self.flights = {}
+        self.lock = threading.Lock()
+
+    def get(self, user_id, raw_token):
+        '''
+        The RemoteUser, fetched from the auth server if it isn't mirrored
+        here yet. None when the auth server doesn't know it.
+        '''
+        # Claims may hold the id as a string
+        user_id = str(user_id)
+        with self.lock:
+            entry = self.users.get(user_id)
+            if entry is not None:
+                self.users.move_to_end(user_id)
+                user, loaded_at = entry
+                if time.monotonic() - loaded_at >= self.ttl and user_id not in self.flights:
+                    flight = self.flights[user_id] = Flight()
+                    threading.Thread(target=self.refresh, args=(user_id, raw_token, flight),
+                                     daemon=True).start()
+                # A copy, a request changing its user can't change the cache
+                return copy.copy(user)
+
+            flight = self.flights.get(user_id)
+            leader = flight is None
+            if leader:
+                flight = self.flights[user_id] = Flight()
+
+        if leader:
+            self.load(user_id, raw_token, flight)
+        else:
+            flight.done.wait()
+
+        if flight.error is not None:
+            raise flight.error
+        return copy.copy(flight.user) if flight.user is not None else None
+
+    def load(self, user_id, raw_token, flight):
+        try:
+            flight.user = get_or_create_remote_user(user_id, raw_token)
+            if flight.user is not None:
+                self.put(user_id, flight.user)
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self.lock:
+                self.flights.pop(user_id, None)
+            flight.done.set()
+
+    def refresh(self, user_id, raw_token, flight):
+        try:
+            self.load(user_id, raw_token, flight)
+            if flight.error is not None:
+                # The stale copy is kept, the next request tries again
+                logger.warning(f"Refreshing user {user_id} failed: {flight.error}")
+        finally:
+            # The thread's own connections, nothing else will close them
+            connections.close_all()
+
+    def put(self, user_id, user):
+        with self.lock:
+            self.users[user_id] = (user, time.monotonic())
+            self.users.move_to_end(user_id)
+            while len(self.users) > self.size:
+                self.users.popitem(last=False)
+
+    def discard(self, user_id):
+        with self.lock:
+            self.users.pop(str(user_id), None)
+
+    def clear(self):
+        with self.lock:
+            self.users.clear()
+
+
+remote_users = RemoteUserCache()
@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from users.cache import remote_users
+from users.models import RemoteUser
+
+
+@receiver(post_save, sender=RemoteUser)
+@receiver(post_delete, sender=RemoteUser)
+def remote_user_changed(sender, instance, **kwargs):
+    # Again on commit, a load meanwhile may have read the old row
+    remote_users.discard(instance.pk)
+    transaction.on_commit(lambda: remote_users.discard(instance.pk))
@@ -1,3 +1,154 @@
-from django.test import TestCase
+from datetime import timedelta
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+import json
+import requests
+import threading
+
+from users.cache import RemoteUserCache
+from users.models import RemoteUser
+
+
+class AuthServerStub():
+    '''
+    Stands in for the auth server's users/user/<id>/ on a local port.
+    Answers with first_name set to self.name, or self.status when that
+    isn't 200, and holds every answer until self.gate is set. self.arrived
+    is set once a request got there.
+    '''
+
+    def __init__(self):
+        self.name = 'One'
+        self.status = 200
+        self.gate = threading.Event()
+        self.gate.set()
+        self.arrived = threading.Event()
+        self.requests = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub.lock:
+                    stub.requests += 1
+                stub.arrived.set()
+                stub.gate.wait(5)
+                user_id = self.path.rstrip('/').split('/')[-1]
+                body = json.dumps({'data': {
+                    'email': f'user{user_id}@example.com', 'first_name': stub.name,
+                    'start_date': '2026-01-01T00:00:00Z'}}).encode()
+                self.send_response(stub.status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.gate.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class RemoteUserCacheTests(TransactionTestCase):
+    '''
+    RemoteUserCache against a local stub of the auth server
+    '''
+
+    def setUp(self):
+        self.auth = AuthServerStub()
+        self.addCleanup(self.auth.stop)
+        override = override_settings(AUTH_SERVER_URL=self.auth.url)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def age(self, user_id):
+        # Past USER_CACHE_TTL, the next load asks the auth server again
+        RemoteUser.objects.filter(pk=user_id).update(updated_at=timezone.now() - timedelta(days=2))
+
+    def refreshed(self, cache, user_id, release=True):
+        # Waits for the background refresh of user_id
+        flight = cache.flights[str(user_id)]
+        if release:
+            self.auth.gate.set()
+        self.assertTrue(flight.done.wait(5))
+
+    def test_concurrent_first_requests_fetch_once(self):
+        cache = RemoteUserCache(ttl=60, size=10)
+        self.auth.gate.clear()
+        results = []
+
+        def request():
+            results.append(cache.get(7, 'token'))
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        # The others wait on the one fetch, or find its user once it is in
+        self.assertTrue(self.auth.arrived.wait(5))
+        self.auth.gate.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(self.auth.requests, 1)
+        self.assertEqual(len(results), 8)
+        self.assertEqual(set((user.email, user.first_name) for user in results),
+                         {('user7@example.com', 'One')})
+
+    def test_stale_entry_served_while_refreshing(self):
+        cache = RemoteUserCache(ttl=0, size=10)
+        cache.get(7, 'token')
+        self.age(7)
+        self.auth.name = 'Two'
+        self.auth.gate.clear()
+
+        # The refresh is held at the auth server, the old copy comes back
+        self.assertEqual(cache.get(7, 'token').first_name, 'One')
+        self.assertEqual(cache.get(7, 'token').first_name, 'One')
+        self.refreshed(cache, 7)
+
+        self.assertEqual(self.auth.requests, 2)
+        self.assertEqual(cache.users['7'][0].first_name, 'Two')
+        self.assertEqual(RemoteUser.objects.get(pk=7).first_name, 'Two')
+
+    def test_auth_server_failure_keeps_local_copy(self):
+        cache = RemoteUserCache(ttl=0, size=10)
+        cache.get(7, 'token')
+        self.age(7)
+        self.auth.status = 500
+        self.auth.gate.clear()
+
+        self.assertEqual(cache.get(7, 'token').first_name, 'One')
+        self.refreshed(cache, 7)
+
+        self.assertEqual(self.auth.requests, 2)
+        self.assertEqual(cache.get(7, 'token').first_name, 'One')
+        self.assertTrue(RemoteUser.objects.filter(pk=7).exists())
+
+        # Without a local copy there is nothing to fall back on
+        with self.assertRaises(requests.HTTPError):
+            cache.get(8, 'token')
+        self.assertNotIn('8', cache.users)
+
+    def test_least_recently_used_evicted(self):
+        cache = RemoteUserCache(ttl=60, size=2)
+        cache.get(1, 'token')
+        cache.get(2, 'token')
+        cache.get(1, 'token')
+        cache.get(3, 'token')
+
+        self.assertEqual(list(cache.users), ['1', '3'])
+        self.assertEqual(self.auth.requests, 3)
+
+        # Back from the database, the auth server isn't asked again
+        self.assertEqual(cache.get(2, 'token').pk, 2)
+        self.assertEqual(self.auth.requests, 3)
+        self.assertEqual(list(cache.users), ['3', '2'])
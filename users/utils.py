@@ -1,17 +1,37 @@
 
+import logging
 import requests
 import sys
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
+from requests.adapters import HTTPAdapter
 
 from users.models import RemoteUser
 
+logger = logging.getLogger(__name__)
+
 # How often you consider a local copy “stale” (you can ignore TTL if you only
 # want to fetch-once). For now, set it very long (e.g. 1 day):
 USER_CACHE_TTL = timedelta(days=1)
 
 
+def auth_server_session():
+    """
+    A requests.Session whose connections to the auth server are kept
+    open and reused, up to AUTH_SERVER_POOL_SIZE at once.
+    """
+    pool_size = getattr(settings, 'AUTH_SERVER_POOL_SIZE', 10)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+auth_session = auth_server_session()
+
+
 def fetch_user_from_auth_server(user_id, token):
     """
     Call GET <AUTH_SERVER_URL>/users/user/<user_id>/,
@@ -25,7 +45,7 @@ def fetch_user_from_auth_server(user_id, token):
         'Authorization': f'Bearer {raw_token}',
         'Accept': 'application/json',
     }
-    resp = requests.get(url, headers=headers, timeout=3.0)
+    resp = auth_session.get(url, headers=headers, timeout=3.0)
     resp.raise_for_status()
     return resp.json()
 
@@ -45,7 +65,14 @@ def get_or_create_remote_user(user_id, token):
                   user.updated_at) > USER_CACHE_TTL)
 
     if need_fetch:
-        data = fetch_user_from_auth_server(user_id, token)
+        try:
+            data = fetch_user_from_auth_server(user_id, token)
+        except requests.RequestException as e:
+            if user is None:
+                raise
+            # The local copy will do until the auth server answers again
+            logger.warning(f"Auth server fetch of user {user_id} failed: {e}")
+            return user
         if not data:
             # Auth server couldn’t return a user → we give up (user stays None)
             return user
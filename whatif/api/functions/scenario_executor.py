@@ -0,0 +1,83 @@
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+
+import django
+import multiprocessing
+
+from whatif.api.functions.scenario_snapshot import ScenarioSnapshot
+
+
+def simulate_partition(scenario, level, snapshot, sched_items, options):
+    '''
+    Runs one level of a scenario, in a worker process or inline.
+    Returns (level, sched_items, error_msg).
+    '''
+    # Imported here, the views module imports this one
+    from whatif.api.views.drilling_scenario import ScheduleFileHandler
+
+    sfh = ScheduleFileHandler(in_memory=True)
+    for name, value in options.items():
+        setattr(sfh, name, value)
+    sfh.scenario = scenario
+    sfh.sched_items = sched_items
+    sfh.snapshot = snapshot
+    sfh.graph = snapshot.graph
+    sfh.simulate()
+    return level, sfh.sched_items, sfh.error_msg
+
+
+class ScenarioExecutor():
+    '''
+    Simulates a scenario level by level on a pool of processes.
+
+    Levels don't interact, adjacency is only mapped within a level, so
+    each level gets its own ScenarioSnapshot and runs on its own. Results
+    are merged in level order, giving the same rows whatever the number
+    of workers.
+    '''
+    # ScheduleFileHandler settings copied to each partition
+    OPTIONS = ['min_precharge_amount', 'min_amount_drilled', 'assumed_mtrs_in_concept_ring',
+               'assumed_mtrs_in_start_drive', 'assumed_rings_in_start_drive']
+
+    def __init__(self, workers=None):
+        self.workers = workers or settings.SCENARIO_WORKERS
+        self.error_msg = ""
+
+    def partition(self, sched_items):
+        levels = {}
+        for sched in sched_items:
+            levels.setdefault(sched.level, []).append(sched)
+        return dict(sorted(levels.items()))
+
+    def snapshot(self, sched_items):
+        drives = set(s.description for s in sched_items if s.description)
+        drives.update(s.bogging_block.description for s in sched_items if s.bogging_block)
+        return ScenarioSnapshot([s.level for s in sched_items], drives)
+
+    def run(self, handler):
+        '''
+        Simulates handler.sched_items, returning the merged rows. On error
+        self.error_msg is set, the first in level order.
+        '''
+        options = {name: getattr(handler, name) for name in self.OPTIONS}
+        partitions = self.partition(handler.sched_items)
+        jobs = [(handler.scenario, level, self.snapshot(items), items, options)
+                for level, items in partitions.items()]
+
+        workers = min(self.workers, len(jobs))
+        if workers <= 1:
+            results = [simulate_partition(*job) for job in jobs]
+        else:
+            # spawn: workers start clean and open their own connections if needed
+            with ProcessPoolExecutor(max_workers=workers,
+                                     mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=django.setup) as pool:
+                futures = [pool.submit(simulate_partition, *job) for job in jobs]
+                results = [future.result() for future in futures]
+
+        merged = []
+        for level, sched_items, error_msg in results:
+            if error_msg and not self.error_msg:
+                self.error_msg = error_msg
+            merged.extend(sched_items)
+        return merged
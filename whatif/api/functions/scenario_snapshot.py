@@ -0,0 +1,80 @@
+import prod_actual.models as pam
+import prod_concept.models as pcm
+
+from common.functions.drive_graph import DriveGraph
+
+
+class ScenarioSnapshot():
+    '''
+    Everything a scenario run reads, loaded once: concept blocks and their
+    links (as a DriveGraph), the active production rings on the levels and
+    mining directions. The lookups return what the equivalent
+    ScheduleFileHandler queries would, in the same order. Snapshots are
+    only read once built, so they can be pickled to worker processes.
+    '''
+
+    def __init__(self, levels, drives):
+        self.graph = DriveGraph.for_schedule(levels, drives)
+
+        self.levels = sorted(set(levels))
+        self.rings = list(pam.ProductionRing.objects.filter(
+            is_active=True, level__in=self.levels).select_related('concept_ring').order_by('level', 'oredrive', 'location_id'))
+        self.rings_by_concept = {}
+        self.rings_by_concept_drive = {}
+        self.rings_by_drive = {}
+        for ring in self.rings:
+            self.rings_by_drive.setdefault(ring.description, []).append(ring)
+            if ring.concept_ring_id:
+                self.rings_by_concept.setdefault(ring.concept_ring_id, []).append(ring)
+                self.rings_by_concept_drive.setdefault(
+                    ring.concept_ring.description, []).append(ring)
+
+        self.mining_directions = {}
+        for md in pcm.MiningDirection.objects.order_by('id'):
+            self.mining_directions.setdefault(md.description, md)
+
+    def rings_with_status(self, description, status):
+        '''
+        Active rings whose concept block is in the drive, falling back
+        to rings carrying the drive name themselves (alias)
+        '''
+        rings = [r for r in self.rings_by_concept_drive.get(description, [])
+                 if r.status == status]
+        if not rings:
+            rings = [r for r in self.rings_by_drive.get(description, [])
+                     if r.status == status]
+        return rings
+
+    def rings_in_drive(self, description):
+        return self.rings_by_concept_drive.get(description, [])
+
+    def rings_in_block(self, block):
+        return self.rings_by_concept.get(block.location_id, [])
+
+    def mining_direction(self, description):
+        return self.mining_directions.get(description)
+
+    def block_links(self, block):
+        if self.graph.has_block(block):
+            return self.graph.get_links(block)
+        return [(link.direction, link.linked) for link in
+                pcm.BlockLink.objects.filter(block=block).select_related('linked').order_by('id')]
+
+    def adjacent_drive_blocks(self, block):
+        '''
+        For every other drive next to the block, the adjacent block in
+        that drive with the lowest location_id
+        '''
+        if self.graph.has_block(block):
+            adjacent = [b for _, b in self.graph.get_adjacent(block)]
+        else:
+            adjacent = [a.adjacent_block for a in pcm.BlockAdjacency.objects.filter(
+                block=block).select_related('adjacent_block')]
+
+        chosen = {}
+        for b in adjacent:
+            if b.description == block.description:
+                continue
+            if b.description not in chosen or b.location_id < chosen[b.description].location_id:
+                chosen[b.description] = b
+        return sorted(chosen.values(), key=lambda b: b.location_id)
@@ -0,0 +1,160 @@
+from django.db.models import Count, Max, Min, Sum
+
+import hashlib
+import json
+import whatif.models as m
+
+
+class ScenarioSummaries():
+    '''
+    Summary tables of a scenario: rings and meters drilled per drive per
+    month and where each drive's last charged block sits over time.
+
+    Summaries are cached in ScenarioSummary keyed by scenario and input
+    hash, so an unchanged scenario is summarised once. whatif.signals
+    clears them when the scenario or one of its last charged blocks
+    changes.
+    '''
+    # Bump when the summary layout changes, so cached ones are rebuilt
+    VERSION = 1
+
+    def get(self, scenario):
+        input_hash = self.input_hash(scenario)
+        cached = m.ScenarioSummary.objects.filter(
+            scenario=scenario, input_hash=input_hash).first()
+        if cached:
+            return cached.summary
+
+        summary = self.build(scenario)
+        # Summaries of older inputs are no use any more
+        m.ScenarioSummary.objects.filter(scenario=scenario).exclude(
+            input_hash=input_hash).delete()
+        m.ScenarioSummary.objects.update_or_create(
+            scenario=scenario, input_hash=input_hash, defaults={'summary': summary})
+        return summary
+
+    def input_hash(self, scenario):
+        '''
+        One aggregate query over the scenario's rows, changes whenever
+        rows are added, removed or their results change
+        '''
+        totals = m.SchedSim.objects.filter(scenario=scenario).aggregate(
+            rows=Count('id'),
+            last_id=Max('id'),
+            first_date=Min('start_date'),
+            last_date=Max('start_date'),
+            rings=Sum('sum_drill_rings_from_prev'),
+            mtrs=Sum('sum_drill_mtrs_from_prev'),
+            charge_blocks=Sum('last_charge_block_id'),
+            drill_blocks=Sum('last_drill_block_id'),
+        )
+        key = json.dumps([self.VERSION, scenario.pk, scenario.name, totals],
+                         default=str, sort_keys=True)
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def build(self, scenario):
+        rows = (m.SchedSim.objects
+                .filter(scenario=scenario, start_date__isnull=False)
+                .values('description', 'start_date', 'sum_drill_rings_from_prev',
+                        'sum_drill_mtrs_from_prev', 'last_charge_block_id',
+                        'last_charge_block__blastsolids_id', 'last_charge_block__x',
+                        'last_charge_block__y', 'last_charge_block__z')
+                .order_by('description', 'start_date', 'id'))
+
+        drives = {}
+        periods = set()
+        for row in rows:
+            drive = drives.setdefault(row['description'], {
+                'rings': 0, 'mtrs': 0, 'periods': {}, 'charged': {}})
+            period = row['start_date'].strftime('%Y-%m')
+            periods.add(period)
+
+            rings = row['sum_drill_rings_from_prev'] or 0
+            mtrs = row['sum_drill_mtrs_from_prev'] or 0
+            totals = drive['periods'].setdefault(period, {'rings': 0, 'mtrs': 0})
+            totals['rings'] += rings
+            totals['mtrs'] += mtrs
+            drive['rings'] += rings
+            drive['mtrs'] += mtrs
+
+            # The last row of the day has the final charged block
+            date = row['start_date'].isoformat()
+            if row['last_charge_block_id']:
+                drive['charged'][date] = {
+                    'date': date,
+                    'location_id': row['last_charge_block_id'],
+                    'blastsolids_id': row['last_charge_block__blastsolids_id'],
+                    'x': float(row['last_charge_block__x']),
+                    'y': float(row['last_charge_block__y']),
+                    'z': float(row['last_charge_block__z']),
+                }
+            else:
+                drive['charged'][date] = None
+
+        for drive in drives.values():
+            drive['charged'] = [c for c in drive['charged'].values() if c]
+
+        return {
+            'scenario': scenario.pk,
+            'name': scenario.name,
+            'periods': sorted(periods),
+            'drives': drives,
+            'totals': {
+                'rings': sum(d['rings'] for d in drives.values()),
+                'mtrs': sum(d['mtrs'] for d in drives.values()),
+            },
+        }
+
+    def compare(self, scenario_a, scenario_b):
+        '''
+        What changes going from scenario a to b. Numbers are b - a and
+        only drives that differ are listed.
+        '''
+        a = self.get(scenario_a)
+        b = self.get(scenario_b)
+
+        drives = {}
+        for name in sorted(set(a['drives']) | set(b['drives'])):
+            drive_a = a['drives'].get(name)
+            drive_b = b['drives'].get(name)
+            diff = self.compare_drive(drive_a or {}, drive_b or {})
+            if drive_a is None or drive_b is None:
+                diff['only_in'] = 'b' if drive_a is None else 'a'
+            if diff['rings'] or diff['mtrs'] or diff['periods'] or diff['charged'] or 'only_in' in diff:
+                drives[name] = diff
+
+        return {
+            'a': a['scenario'],
+            'b': b['scenario'],
+            'periods': sorted(set(a['periods']) | set(b['periods'])),
+            'drives': drives,
+            'totals': {
+                'rings': b['totals']['rings'] - a['totals']['rings'],
+                'mtrs': b['totals']['mtrs'] - a['totals']['mtrs'],
+            },
+        }
+
+    def compare_drive(self, drive_a, drive_b):
+        periods_a = drive_a.get('periods', {})
+        periods_b = drive_b.get('periods', {})
+        periods = {}
+        for period in sorted(set(periods_a) | set(periods_b)):
+            rings = periods_b.get(period, {}).get('rings', 0) - \
+                periods_a.get(period, {}).get('rings', 0)
+            mtrs = periods_b.get(period, {}).get('mtrs', 0) - \
+                periods_a.get(period, {}).get('mtrs', 0)
+            if rings or mtrs:
+                periods[period] = {'rings': rings, 'mtrs': mtrs}
+
+        charged_a = {c['date']: c['location_id'] for c in drive_a.get('charged', [])}
+        charged_b = {c['date']: c['location_id'] for c in drive_b.get('charged', [])}
+        charged = [{'date': date, 'a': charged_a.get(date), 'b': charged_b.get(date)}
+                   for date in sorted(set(charged_a) | set(charged_b))
+                   if charged_a.get(date) != charged_b.get(date)]
+
+        return {
+            'rings': drive_b.get('rings', 0) - drive_a.get('rings', 0),
+            'mtrs': drive_b.get('mtrs', 0) - drive_a.get('mtrs', 0),
+            'periods': periods,
+            'charged': charged,
+        }
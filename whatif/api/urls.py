@@ -3,7 +3,12 @@ from django.views.generic import TemplateView
 from django.urls import path, include
 
 from whatif.api.views.drilling_scenario import UploadScheduleView
+from whatif.api.views.scenario_summary import ScenarioSummaryView, ScenarioCompareView
 
 urlpatterns = [
     path('drilling/', UploadScheduleView.as_view(), name='drilling-scenario'),
-]
\ No newline at end of file
+    path('scenarios/<int:scenario_id>/summary/',
+         ScenarioSummaryView.as_view(), name='scenario-summary'),
+    path('scenarios/<int:scenario_a>/compare/<int:scenario_b>/',
+         ScenarioCompareView.as_view(), name='scenario-compare'),
+]
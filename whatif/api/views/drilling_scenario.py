@@ -8,8 +8,14 @@ import prod_actual.models as pam
 
 from common.functions.status import Status
 from common.functions.block_adjacency import BlockAdjacencyFunctions
-from settings.models import ProjectSetting
+from common.functions.drive_graph import DriveGraph
+from common.functions.constants import BULK_BATCH_SIZE
+from whatif.api.functions.scenario_executor import ScenarioExecutor
+from settings.api.functions.project_settings import project_settings
 from prod_concept.api.views.mining_direction import MiningDirectionView
+from common.functions.jobs import enqueue_job, queued_response
+from common.signals import bulk_write
+from whatif import tasks
 
 from time import strftime
 from django.utils import timezone
@@ -40,11 +46,10 @@ class UploadScheduleView(generics.CreateAPIView):
         scenario_name = request.data.get('scenario_name')
 
         try:
-            sfh = ScheduleFileHandler()
-            handler_response = sfh.handle_schedule_file(
-                request, file, scenario_name)
+            job = enqueue_job(tasks.run_schedule, 'drilling scenario', user=request.user,
+                              files={'file': file}, scenario_name=scenario_name)
 
-            return Response(handler_response, status=status.HTTP_200_OK)
+            return Response(queued_response(job, 'Scenario run queued'), status=status.HTTP_202_ACCEPTED)
 
         except Exception as e:
             # Handle general exceptions with a 500 Internal Server Error response
@@ -57,7 +62,7 @@ class ScenarioListView():
 
 
 class ScheduleFileHandler():
-    def __init__(self):
+    def __init__(self, in_memory=True, workers=None):
         self.opposite_direction = {'N': 'S', 'NE': 'SW', 'E': 'W',
                                    'SE': 'NW', 'S': 'N', 'SW': 'NE', 'W': 'E', 'NW': 'SE'}
         self.mining_direction = None
@@ -80,9 +85,20 @@ class ScheduleFileHandler():
         self.reporting_interval = 'monthly'
         self.filename = 'results.csv'
         self.split_month = False
+        self.job = None
+        self.rows_processed = 0
+        # Blocks and links of the scenario's levels, loaded by run_scenario
+        self.graph = None
 
-    def handle_schedule_file(self, request, file, scenario_name):
-        user = request.user
+        # in_memory: SchedSim rows are kept in self.sched_items, each level
+        # runs against its own snapshot and rows are saved at the end
+        self.in_memory = in_memory
+        self.sched_items = []
+        self.snapshot = None
+        # processes for the levels, defaults to settings.SCENARIO_WORKERS
+        self.workers = workers
+
+    def handle_schedule_file(self, user, file, scenario_name):
 
         scenario = m.Scenario.objects.create(
             name=scenario_name,
@@ -91,16 +107,28 @@ class ScheduleFileHandler():
         )
         self.scenario = scenario
 
+        try:
+            # Rows are saved one by one outside memory mode, the scenario's
+            # summaries are cleared once at the end instead of per row
+            with bulk_write():
+                return self.process_schedule_file(file)
+        finally:
+            m.ScenarioSummary.objects.filter(scenario=scenario).delete()
+
+    def process_schedule_file(self, file):
         # Process the uploaded CSV file
         print("reading csv into scenario table")
         rows_processed = self.read_csv(file)
         if self.error_msg:
             return {'msg': {'body': self.error_msg, 'type': 'error'}}
+        self.rows_processed = rows_processed
+        self.report_progress('marrying concept rings')
 
         print("marrying concept rings")
         self.marry_concept_rings()
         if self.error_msg:
             return {'msg': {'body': self.error_msg, 'type': 'error'}}
+        self.report_progress('running scenario')
         print("Running the scenario")
         self.run_scenario()
         if self.error_msg:
@@ -111,16 +139,18 @@ class ScheduleFileHandler():
 
         return {'msg': {'body': msg, 'type': 'success'}}
 
+    def report_progress(self, stage):
+        if self.job:
+            self.job.snapshot(self, stage, force=True,
+                              scenario=self.scenario.pk if self.scenario else None)
+
     def read_csv(self, file):
         """
         Read the CSV file and create SchedSim entries for each row.
         """
         # Fetch the required columns from the settings
-        try:
-            project_setting = ProjectSetting.objects.get(
-                key='drill_scenario_file_headers')
-            required_columns = project_setting.value
-        except ProjectSetting.DoesNotExist:
+        required_columns = project_settings.get('drill_scenario_file_headers')
+        if required_columns is None:
             self.error_msg = "CSV file headers blank, see FM Concept tab in settings"
             return
 
@@ -161,7 +191,7 @@ class ScheduleFileHandler():
                 finish_date = None
 
             # Create a SchedSim object for each row
-            m.SchedSim.objects.create(
+            self.create_sched(
                 bogging_block=None,  # Assuming you'll handle bogging_block logic separately
                 production_ring=None,  # Assuming you'll handle production_ring logic separately
                 scenario=self.scenario,
@@ -177,15 +207,44 @@ class ScheduleFileHandler():
 
         return rows_processed
 
+    def get_baf(self):
+        return BlockAdjacencyFunctions(graph=self.graph)
+
     def run_scenario(self):
-        all_sched = m.SchedSim.objects.filter(scenario=self.scenario)
+        if self.in_memory:
+            print("running scenario by level")
+            executor = ScenarioExecutor(self.workers)
+            self.sched_items = executor.run(self)
+            self.error_msg = executor.error_msg
+        else:
+            print("loading drive graph")
+            self.graph = DriveGraph.for_scenario(self.scenario)
+            self.simulate()
+        if self.error_msg:
+            return
+
+        self.persist_schedule()
+        self.generate_schedule_csv()
+
+    def simulate(self):
+        '''
+        Works out the charged and drilled blocks and drill sums of every
+        scheduled row. In memory this needs self.snapshot and self.graph.
+        '''
+        all_sched = self.get_scenario_items()
 
         print("calculating charged blocks")
         for sched_item in all_sched:
-            try:
-                concept_ring = m.FlowModelConceptRing.objects.get(
-                    blastsolids_id=sched_item.blastsolids_id)
-            except m.FlowModelConceptRing.DoesNotExist:
+            if self.in_memory:
+                # Already looked up by marry_concept_rings
+                concept_ring = sched_item.bogging_block
+            else:
+                try:
+                    concept_ring = m.FlowModelConceptRing.objects.get(
+                        blastsolids_id=sched_item.blastsolids_id)
+                except m.FlowModelConceptRing.DoesNotExist:
+                    concept_ring = None
+            if not concept_ring:
                 self.error_msg = f'Block with ID:{sched_item.blastsolids_id} is not in the database.'
                 return
             drv_name = self.determine_mining_direction(concept_ring)
@@ -195,7 +254,7 @@ class ScheduleFileHandler():
             sched_item.description = drv_name
             sched_item.last_charge_block = self.calc_last_charged_block(
                 sched_item)
-            sched_item.save()
+            self.save_sched(sched_item)
 
         print("populate last drill block")
         self.populate_last_drill_block()
@@ -209,8 +268,6 @@ class ScheduleFileHandler():
             print("error", self.error_msg)
             return
 
-        self.generate_schedule_csv()
-
     def determine_mining_direction(self, concept_ring):
         drv_name = self.mining_dir_successor_method(concept_ring)
         if drv_name:
@@ -220,18 +277,18 @@ class ScheduleFileHandler():
             return self.mining_dir_guess_method(concept_ring)
 
     def mining_dir_successor_method(self, concept_ring):
-        baf = BlockAdjacencyFunctions()
+        baf = self.get_baf()
         drv_name = concept_ring.description
-        links = pcm.BlockLink.objects.filter(block=concept_ring)
+        links = self.get_block_links(concept_ring)
         if links:
-            for link in links:
-                if link.linked.description == drv_name:
-                    if link.direction == 'S':
+            for direction, linked in links:
+                if linked.description == drv_name:
+                    if direction == 'S':
                         self.mining_direction = baf.determine_direction(
-                            concept_ring, link.linked)
+                            concept_ring, linked)
                     else:
                         self.mining_direction = baf.determine_direction(
-                            link.linked, concept_ring)
+                            linked, concept_ring)
                     return drv_name
         return None
 
@@ -239,16 +296,14 @@ class ScheduleFileHandler():
         # if there is an alias, try to use that first
         drv_name = concept_ring.alias
         if drv_name:
-            direction = pcm.MiningDirection.objects.filter(
-                description=drv_name).first()
+            direction = self.get_mining_direction(drv_name)
             if direction:
                 self.mining_direction = direction.mining_direction
                 return drv_name
 
         drv_name = concept_ring.description
         if drv_name:
-            direction = pcm.MiningDirection.objects.filter(
-                description=drv_name).first()
+            direction = self.get_mining_direction(drv_name)
             if direction:
                 self.mining_direction = direction.mining_direction
                 return drv_name
@@ -257,18 +312,20 @@ class ScheduleFileHandler():
         return None
 
     def marry_concept_rings(self):
-        sched_to_marry = m.SchedSim.objects.filter(
-            scenario=self.scenario)
+        sched_to_marry = self.get_scenario_items()
         updated_sched_blocks = []
 
+        # One query for every block in the schedule
+        bs_ids = sorted(set(s.blastsolids_id for s in sched_to_marry))
+        concept_blocks = {}
+        for i in range(0, len(bs_ids), BULK_BATCH_SIZE):
+            for block in m.FlowModelConceptRing.objects.filter(blastsolids_id__in=bs_ids[i:i + BULK_BATCH_SIZE]):
+                concept_blocks.setdefault(block.blastsolids_id, []).append(block)
+
         for sched_block in sched_to_marry:
-            try:
-                concept_block = m.FlowModelConceptRing.objects.get(
-                    blastsolids_id=sched_block.blastsolids_id)
-            except m.FlowModelConceptRing.DoesNotExist:
-                concept_block = None
-            except m.FlowModelConceptRing.MultipleObjectsReturned:
-                concept_block = None
+            matches = concept_blocks.get(sched_block.blastsolids_id, [])
+            # Unknown or ambiguous blastsolids are both an error
+            concept_block = matches[0] if len(matches) == 1 else None
             if not concept_block:
                 self.error_msg = f'Unknown blastsolid: {sched_block.blastsolids_id}'
                 print(self.error_msg)
@@ -279,8 +336,9 @@ class ScheduleFileHandler():
             updated_sched_blocks.append(sched_block)
 
         # Use bulk_update to save all changes at once
-        m.SchedSim.objects.bulk_update(
-            updated_sched_blocks, ['bogging_block'])
+        if not self.in_memory:
+            m.SchedSim.objects.bulk_update(
+                updated_sched_blocks, ['bogging_block'])
 
     def is_block_in_flow_concept(self, sched_sim):
         blastsolid = sched_sim.blastsolids_id
@@ -292,7 +350,7 @@ class ScheduleFileHandler():
             return False
 
     def calc_last_charged_block(self, sched_item):
-        baf = BlockAdjacencyFunctions()
+        baf = self.get_baf()
         last_charged_block = None
         charged = None
 
@@ -313,13 +371,8 @@ class ScheduleFileHandler():
         return None
 
     def get_current_last_block_of_status(self, description, status):
-        baf = BlockAdjacencyFunctions()
-        designed_rings = pam.ProductionRing.objects.filter(
-            is_active=True, status=status, concept_ring__description=description)
-        if not designed_rings:
-            # could be using alias
-            designed_rings = pam.ProductionRing.objects.filter(
-                is_active=True, status=status, description=description)
+        baf = self.get_baf()
+        designed_rings = self.get_rings_with_status(description, status)
         if designed_rings:
             last_ring = baf.get_last_block_in_set(
                 designed_rings, self.mining_direction)
@@ -328,9 +381,8 @@ class ScheduleFileHandler():
             return None
 
     def get_last_designed_block(self, description):
-        baf = BlockAdjacencyFunctions()
-        designed_rings = pam.ProductionRing.objects.filter(
-            is_active=True, concept_ring__description=description)
+        baf = self.get_baf()
+        designed_rings = self.get_rings_in_drive(description)
         if designed_rings:
             last_ring = baf.get_last_block_in_set(
                 designed_rings, self.mining_direction)
@@ -339,14 +391,12 @@ class ScheduleFileHandler():
             return None
 
     def populate_last_drill_block(self):
-        baf = BlockAdjacencyFunctions()
-        oredrive_list = m.SchedSim.objects.filter(
-            scenario=self.scenario).values_list('description', flat=True).distinct()
+        baf = self.get_baf()
+        oredrive_list = self.get_scenario_drives()
         for oredrive in oredrive_list:
-            sched_by_drive = m.SchedSim.objects.filter(
-                scenario=self.scenario, description=oredrive).order_by('start_date')
+            sched_by_drive = self.get_scenario_items(oredrive)
             # set mining direction
-            first_block = sched_by_drive.first().bogging_block
+            first_block = sched_by_drive[0].bogging_block
             self.mining_direction = self.mining_dir_successor_method(
                 first_block)
 
@@ -355,7 +405,7 @@ class ScheduleFileHandler():
 
             for sched_item in sched_by_drive:
                 sched_item.last_drill_block = current_drilled
-                sched_item.save()
+                self.save_sched(sched_item)
                 if sched_item.last_charge_block:
                     self.add_min_drilling(sched_item)
                     eod = baf.get_last_block_in_drive(
@@ -365,7 +415,7 @@ class ScheduleFileHandler():
                     self.interfere_with_others(sched_item)
 
     def add_min_drilling(self, sched_item):
-        baf = BlockAdjacencyFunctions()
+        baf = self.get_baf()
         if sched_item.last_charge_block:
             min_drill = baf.step_dist(
                 sched_item.last_charge_block, self.mining_direction, self.min_amount_drilled)
@@ -373,17 +423,17 @@ class ScheduleFileHandler():
                 if sched_item.last_drill_block:
                     if baf.is_in_general_mining_direction(sched_item.last_drill_block, min_drill, self.mining_direction):
                         sched_item.last_drill_block = min_drill
-                        sched_item.save()
+                        self.save_sched(sched_item)
                 else:
                     sched_item.last_drill_block = min_drill
-                    sched_item.save()
+                    self.save_sched(sched_item)
             else:
                 # no min drill means we have exceeded eod
                 sched_item.last_drill_block = None
-                sched_item.save()
+                self.save_sched(sched_item)
 
     def interference_from_others(self, sched_item, eod):
-        baf = BlockAdjacencyFunctions()
+        baf = self.get_baf()
         adj_drives = baf.get_adjacent_drives(sched_item.last_drill_block)
         for adj_drive in adj_drives:
             # if no adj charged then no interference
@@ -399,42 +449,23 @@ class ScheduleFileHandler():
                         # get interfered with
                         next_block = baf.step_next_block(
                             drill, self.mining_direction)
-                        if next_block:
-                            drill = next_block
+                        if not next_block:
+                            break
+                        drill = next_block
+                        dist = baf.get_dist_to_block(drill, adj_charged)
                     sched_item.last_drill_block = drill
-                    sched_item.save()
+                    self.save_sched(sched_item)
 
     def interfere_with_others(self, sched_item):
         # now for the fun stuff
-        baf = BlockAdjacencyFunctions()
+        baf = self.get_baf()
 
-        # get adjacent blocks not in same oredrive
-        adjacent_blocks = (
-            pcm.BlockAdjacency.objects
-            .filter(block=sched_item.last_charge_block)  # Get adjacent blocks
-            # Exclude current oredrive
-            .exclude(adjacent_block__description=sched_item.last_charge_block.description)
-        )
-
-        # Get distinct oredrives with at least one block from each
-        distinct_adjacent_blocks = (
-            adjacent_blocks
-            # Group by oredrive description
-            .values('adjacent_block__description')
-            # Pick the smallest ID as a representative
-            .annotate(block_id=Min('adjacent_block__location_id'))
-        )
-
-        # Get the actual block objects using the selected block IDs
-        selected_blocks = pcm.BlockAdjacency.objects.filter(
-            id__in=[desc['block_id'] for desc in distinct_adjacent_blocks]
-        )
+        # one adjacent block from each other oredrive
+        selected_blocks = self.get_adjacent_drive_blocks(
+            sched_item.last_charge_block)
 
         # If no adjacent blocks exist, return None
-        selected_blocks = list(
-            selected_blocks) if selected_blocks.exists() else None
-
-        if selected_blocks is None:
+        if not selected_blocks:
             return None
 
         for sb in selected_blocks:
@@ -467,7 +498,7 @@ class ScheduleFileHandler():
                 if bogging_block:
                     blastsolid = bogging_block.blastsolids_id
                 # might have nothing, needs drilling
-                adj_schedsim = m.SchedSim.objects.create(
+                adj_schedsim = self.create_sched(
                     bogging_block=bogging_block,
                     last_charge_block=charged_block,
                     last_drill_block=drill,
@@ -478,15 +509,14 @@ class ScheduleFileHandler():
                     blastsolids_id=blastsolid,
                     json={},
                 )
-                adj_schedsim.save()
 
                 adj_schedsim.last_charge_block = self.calc_last_charged_block(
                     adj_schedsim)
-                adj_schedsim.save()
+                self.save_sched(adj_schedsim)
 
             if adj_schedsim.bogging_block == drill or adj_schedsim.last_charge_block == drill:
                 adj_schedsim.last_drill_block = None
-                adj_schedsim.save()
+                self.save_sched(adj_schedsim)
                 drill = None
 
             # compare with what is existing
@@ -494,10 +524,10 @@ class ScheduleFileHandler():
                 if adj_schedsim.last_drill_block and drill:
                     if baf.is_in_general_mining_direction(adj_schedsim.last_drill_block, drill, adj_mining_dir):
                         adj_schedsim.last_drill_block = drill
-                        adj_schedsim.save()
+                        self.save_sched(adj_schedsim)
                 else:
                     adj_schedsim.last_drill_block = drill
-                    adj_schedsim.save()
+                    self.save_sched(adj_schedsim)
             else:
                 if adj_schedsim.last_drill_block and drill:
                     in_mining_dir = baf.is_in_general_mining_direction(
@@ -505,7 +535,7 @@ class ScheduleFileHandler():
                     if adj_schedsim.last_drill_block and in_mining_dir:
                         drill = adj_schedsim.last_drill_block
 
-                m.SchedSim.objects.create(
+                self.create_sched(
                     bogging_block=adj_schedsim.bogging_block,
                     production_ring=adj_schedsim.production_ring,
                     last_charge_block=adj_schedsim.last_charge_block,
@@ -524,6 +554,14 @@ class ScheduleFileHandler():
 
         Output: The last scheduled item in the drive on or before date
         '''
+        if self.in_memory:
+            last_sched_item = None
+            for sched in self.sched_items:
+                if sched.description == description and sched.start_date and sched_item.start_date \
+                        and sched.start_date <= sched_item.start_date:
+                    if not last_sched_item or sched.start_date > last_sched_item.start_date:
+                        last_sched_item = sched
+            return last_sched_item
 
         last_sched_item = (m.SchedSim.objects
                            .filter(description=description, start_date__lte=sched_item.start_date)
@@ -535,15 +573,13 @@ class ScheduleFileHandler():
     # ============== COUNTING METHODS =====================
 
     def calculate_drill_sums(self):
-        baf = BlockAdjacencyFunctions()
-        drives = m.SchedSim.objects.filter(scenario=self.scenario).values_list(
-            'description', flat=True).distinct()
+        baf = self.get_baf()
+        drives = self.get_scenario_drives()
 
         for drive in drives:
-            drive_schedule = m.SchedSim.objects.filter(
-                scenario=self.scenario, description=drive).order_by('start_date')
+            drive_schedule = self.get_scenario_items(drive)
             # set mining direction
-            md = pcm.MiningDirection.objects.filter(description=drive).first()
+            md = self.get_mining_direction(drive)
             if md:
                 self.mining_direction = md.mining_direction
             else:
@@ -575,7 +611,7 @@ class ScheduleFileHandler():
 
     def get_blocks_between(self, start_block, sched_item, count_first=False):
         # if start of drive 'Start_block' is None.
-        baf = BlockAdjacencyFunctions()
+        baf = self.get_baf()
         self.ring_count = 0
         self.meter_count = 0
 
@@ -613,11 +649,10 @@ class ScheduleFileHandler():
 
         sched_item.sum_drill_rings_from_prev = self.ring_count
         sched_item.sum_drill_mtrs_from_prev = self.meter_count
-        sched_item.save()
+        self.save_sched(sched_item)
 
     def tally(self, current_block):
-        rings_in_block = pam.ProductionRing.objects.filter(
-            is_active=True, concept_ring=current_block)
+        rings_in_block = self.get_rings_in_block(current_block)
         if rings_in_block:
             for ring in rings_in_block:
                 self.ring_count += 1
@@ -627,13 +662,104 @@ class ScheduleFileHandler():
             self.meter_count += self.assumed_mtrs_in_concept_ring
 
     def check_designed(self, sched):
-        baf = BlockAdjacencyFunctions()
+        baf = self.get_baf()
         if self.last_designed_block:
             self.is_designed = (sched.last_drill_block == self.last_designed_block or baf.is_in_general_mining_direction(
                 sched.last_drill_block, self.last_designed_block, self.mining_direction))
         else:
             self.is_designed = False
 
+    # =============== DATA ACCESS ===================
+    # In memory mode these read self.sched_items and self.snapshot,
+    # otherwise they run the original queries
+
+    def create_sched(self, **fields):
+        if self.in_memory:
+            sched = m.SchedSim(**fields)
+            self.sched_items.append(sched)
+            return sched
+        return m.SchedSim.objects.create(**fields)
+
+    def save_sched(self, sched):
+        if not self.in_memory:
+            sched.save()
+
+    def persist_schedule(self):
+        if self.in_memory:
+            m.SchedSim.objects.bulk_create(
+                self.sched_items, batch_size=BULK_BATCH_SIZE)
+
+    def get_scenario_items(self, description=None):
+        '''
+        All the scenario's SchedSim rows, or a drive's rows by start date
+        '''
+        if not self.in_memory:
+            items = m.SchedSim.objects.filter(scenario=self.scenario)
+            if description is None:
+                return items
+            return items.filter(description=description).order_by('start_date')
+
+        if description is None:
+            return list(self.sched_items)
+        items = [s for s in self.sched_items if s.description == description]
+        # Undated rows first, as the database sorts NULLs
+        return sorted(items, key=lambda s: (s.start_date is not None, s.start_date or datetime.min.date()))
+
+    def get_scenario_drives(self):
+        if not self.in_memory:
+            return m.SchedSim.objects.filter(
+                scenario=self.scenario).values_list('description', flat=True).distinct()
+        return list(dict.fromkeys(s.description for s in self.sched_items))
+
+    def get_mining_direction(self, description):
+        if self.snapshot:
+            return self.snapshot.mining_direction(description)
+        return pcm.MiningDirection.objects.filter(description=description).first()
+
+    def get_block_links(self, block):
+        if self.snapshot:
+            return self.snapshot.block_links(block)
+        return [(link.direction, link.linked) for link in pcm.BlockLink.objects.filter(block=block)]
+
+    def get_rings_with_status(self, description, status):
+        if self.snapshot:
+            return self.snapshot.rings_with_status(description, status)
+        rings = pam.ProductionRing.objects.filter(
+            is_active=True, status=status, concept_ring__description=description)
+        if not rings:
+            # could be using alias
+            rings = pam.ProductionRing.objects.filter(
+                is_active=True, status=status, description=description)
+        return rings
+
+    def get_rings_in_drive(self, description):
+        if self.snapshot:
+            return self.snapshot.rings_in_drive(description)
+        return pam.ProductionRing.objects.filter(
+            is_active=True, concept_ring__description=description)
+
+    def get_rings_in_block(self, block):
+        if self.snapshot:
+            return self.snapshot.rings_in_block(block)
+        return pam.ProductionRing.objects.filter(is_active=True, concept_ring=block)
+
+    def get_adjacent_drive_blocks(self, block):
+        '''
+        For every other drive next to the block, the adjacent block in
+        that drive with the lowest location_id
+        '''
+        if self.snapshot:
+            return self.snapshot.adjacent_drive_blocks(block)
+        distinct_adjacent_blocks = (
+            pcm.BlockAdjacency.objects
+            .filter(block=block)
+            .exclude(adjacent_block__description=block.description)
+            .values('adjacent_block__description')
+            .annotate(block_id=Min('adjacent_block__location_id'))
+        )
+        return list(pcm.FlowModelConceptRing.objects.filter(
+            location_id__in=[desc['block_id'] for desc in distinct_adjacent_blocks]).order_by('location_id'))
+
     # =============== REPORTING ===================
 
     def generate_schedule_csv(self):
@@ -759,7 +885,7 @@ class ScheduleFileHandler():
     # ================ TESTING ====================
 
     def test_drive_seq(self):
-        baf = BlockAdjacencyFunctions()
+        baf = self.get_baf()
         drives = m.SchedSim.objects.filter(level=1200).values_list(
             'description', flat=True).distinct()
 
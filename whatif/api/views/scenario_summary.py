@@ -0,0 +1,42 @@
+from rest_framework import status
+from rest_framework.views import APIView
+from rest_framework.response import Response
+
+import whatif.models as m
+
+from whatif.api.functions.scenario_summary import ScenarioSummaries
+
+
+def not_found(scenario_id):
+    return Response({'msg': {'body': f'Scenario {scenario_id} not found', 'type': 'error'}},
+                    status=status.HTTP_404_NOT_FOUND)
+
+
+class ScenarioSummaryView(APIView):
+    """
+    Drilling per drive per month and charged block positions of a scenario,
+    cached until the scenario or its charged blocks change.
+    """
+
+    def get(self, request, scenario_id, *args, **kwargs):
+        scenario = m.Scenario.objects.filter(scenario=scenario_id).first()
+        if not scenario:
+            return not_found(scenario_id)
+
+        return Response(ScenarioSummaries().get(scenario), status=status.HTTP_200_OK)
+
+
+class ScenarioCompareView(APIView):
+    """
+    Differences between the summaries of two scenarios, b - a.
+    """
+
+    def get(self, request, scenario_a, scenario_b, *args, **kwargs):
+        scenarios = {s.pk: s for s in m.Scenario.objects.filter(
+            scenario__in=[scenario_a, scenario_b])}
+        for scenario_id in (scenario_a, scenario_b):
+            if scenario_id not in scenarios:
+                return not_found(scenario_id)
+
+        diff = ScenarioSummaries().compare(scenarios[scenario_a], scenarios[scenario_b])
+        return Response(diff, status=status.HTTP_200_OK)
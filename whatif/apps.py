@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class WhatifConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'whatif'
+
+    def ready(self):
+        import whatif.signals
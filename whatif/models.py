@@ -67,3 +67,16 @@ class SchedSim(models.Model):
     json = JSONField(blank=True, null=True)
     level = models.SmallIntegerField()
     description = models.CharField(max_length=50, blank=True, null=True)
+
+
+class ScenarioSummary(models.Model):
+    # Cached summary tables of a scenario, see ScenarioSummaries
+    scenario = models.ForeignKey(
+        Scenario, on_delete=models.CASCADE, related_name='summaries')
+    # hash of the SchedSim rows the summary was built from
+    input_hash = models.CharField(max_length=64)
+    summary = JSONField()
+    datetime_stamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('scenario', 'input_hash')
@@ -0,0 +1,45 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+import whatif.models as m
+
+from common.functions.constants import BULK_BATCH_SIZE
+from common.signals import in_bulk_write, production_data_changed
+from prod_concept.models import FlowModelConceptRing
+
+
+def clear_summaries_showing(block_ids):
+    '''
+    Drops the summaries of the scenarios whose last charged blocks are
+    among block_ids, the only ring data a summary shows besides SchedSim.
+    A deleted block nulls the SchedSim rows, which changes the input hash.
+    '''
+    block_ids = list(block_ids)
+    for i in range(0, len(block_ids), BULK_BATCH_SIZE):
+        scenarios = m.SchedSim.objects.filter(
+            last_charge_block_id__in=block_ids[i:i + BULK_BATCH_SIZE]).values('scenario_id')
+        m.ScenarioSummary.objects.filter(scenario_id__in=scenarios).delete()
+
+
+@receiver(production_data_changed)
+def clear_summaries_of_blocks(sender, block_ids=None, **kwargs):
+    if block_ids:
+        clear_summaries_showing(block_ids)
+
+
+@receiver(post_save, sender=FlowModelConceptRing)
+def clear_summaries_of_block(sender, instance, **kwargs):
+    if not in_bulk_write():
+        clear_summaries_showing([instance.pk])
+
+
+@receiver(post_save, sender=m.Scenario)
+@receiver(post_save, sender=m.SchedSim)
+@receiver(post_delete, sender=m.SchedSim)
+def clear_summaries_of_scenario(sender, instance, **kwargs):
+    # A scenario run writes its rows in bulk_write() and clears once at the end
+    if in_bulk_write():
+        return
+    scenario_id = instance.pk if sender is m.Scenario else instance.scenario_id
+    if scenario_id:
+        m.ScenarioSummary.objects.filter(scenario_id=scenario_id).delete()
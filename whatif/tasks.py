@@ -0,0 +1,16 @@
+from django_tasks import task
+
+from common.functions.jobs import run_job
+
+
+@task()
+def run_schedule(job_id):
+    def work(tracker):
+        from whatif.api.views.drilling_scenario import ScheduleFileHandler
+
+        sfh = ScheduleFileHandler()
+        sfh.job = tracker
+        with tracker.open_file('file') as file:
+            return sfh.handle_schedule_file(tracker.user, file, tracker.params.get('scenario_name'))
+
+    return run_job(job_id, work)